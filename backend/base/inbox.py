@@ -0,0 +1,115 @@
+from collections import defaultdict
+
+from django.apps import apps
+
+from lms.versions import bump, model_scope
+
+from .models import Notification, NotificationReceipt
+
+# Version scope of every inbox, bumped when a notification's content changes;
+# each user's receipts have a scope of their own (see ``inbox_scopes``).
+NOTIFICATIONS = model_scope(Notification)
+
+
+def receipts_scope(user_id):
+    return model_scope(NotificationReceipt, 'user', user_id)
+
+
+def inbox_scopes(user_id):
+    """The version scopes a user's inbox listing depends on."""
+    return [NOTIFICATIONS, receipts_scope(user_id)]
+
+
+def recipient_ids(notification):
+    """
+    Users who should receive ``notification``: students enrolled in its course,
+    narrowed to its batches when any are set.
+    """
+    Student = apps.get_model('users', 'Student')
+    students = Student.objects.filter(course=notification.course_id)
+    batches = notification.batch.all()
+    if batches.exists():
+        students = students.filter(batch__in=batches)
+    return set(students.values_list('user_id', flat=True))
+
+
+def sync_recipients(notification):
+    """
+    Create and remove receipts so they match the current audience. Returns
+    the ids of users who were newly added.
+    """
+    wanted = recipient_ids(notification)
+    existing = set(
+        NotificationReceipt.objects.filter(notification=notification).values_list('user_id', flat=True))
+
+    stale = existing - wanted
+    if stale:
+        NotificationReceipt.objects.filter(notification=notification, user_id__in=stale).delete()
+    added = wanted - existing
+    NotificationReceipt.objects.bulk_create([
+        NotificationReceipt(notification=notification, user_id=user_id, date_posted=notification.date_posted)
+        for user_id in added
+    ], batch_size=500, ignore_conflicts=True)
+    bump(receipts_scope(user_id) for user_id in stale | added)
+    return added
+
+
+def sync_users(user_ids):
+    """
+    Create and remove the receipts of ``user_ids`` so they match the
+    notifications now addressed to them; for when students' enrollments or
+    batches change rather than a notification's audience. Runs a fixed
+    handful of queries however many users are given.
+    """
+    Student = apps.get_model('users', 'Student')
+    Enrollment = apps.get_model('courses', 'Course').student.through
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    batches = dict(Student.objects.filter(pk__in=user_ids).values_list('pk', 'batch_id'))
+    enrolled = defaultdict(set)
+    for course_id, student_id in Enrollment.objects.filter(student_id__in=batches).values_list(
+            'course_id', 'student_id'):
+        enrolled[course_id].add(student_id)
+    notifications = list(Notification.objects.filter(course_id__in=enrolled).values_list(
+        'pk', 'course_id', 'date_posted'))
+    audiences = defaultdict(set)
+    for notification_id, batch_id in Notification.batch.through.objects.filter(
+            notification_id__in=[pk for pk, _, _ in notifications]).values_list('notification_id', 'batch_id'):
+        audiences[notification_id].add(batch_id)
+
+    wanted = {}
+    for pk, course_id, date_posted in notifications:
+        for student_id in enrolled[course_id]:
+            # Same rule as recipient_ids.
+            if not audiences[pk] or batches[student_id] in audiences[pk]:
+                wanted[student_id, pk] = date_posted
+
+    existing = set(NotificationReceipt.objects.filter(user_id__in=user_ids).values_list('user_id', 'notification_id'))
+    stale = defaultdict(list)
+    for user_id, notification_id in existing - wanted.keys():
+        stale[user_id].append(notification_id)
+    for user_id, notification_ids in stale.items():
+        NotificationReceipt.objects.filter(user_id=user_id, notification_id__in=notification_ids).delete()
+    added = wanted.keys() - existing
+    NotificationReceipt.objects.bulk_create([
+        NotificationReceipt(notification_id=pk, user_id=user_id, date_posted=wanted[user_id, pk])
+        for user_id, pk in added
+    ], batch_size=500, ignore_conflicts=True)
+    bump(receipts_scope(user_id) for user_id in stale.keys() | {user_id for user_id, _ in added})
+
+
+def unread_count(user):
+    return NotificationReceipt.objects.filter(user_id=user.pk, is_read=False).count()
+
+
+def mark_read(user, notification_ids=None):
+    """Mark the given notifications (or the whole inbox) read; returns rows changed."""
+    receipts = NotificationReceipt.objects.filter(user_id=user.pk, is_read=False)
+    if notification_ids is not None:
+        receipts = receipts.filter(notification_id__in=notification_ids)
+    updated = receipts.update(is_read=True)
+    if updated:
+        bump([receipts_scope(user.pk)])
+    return updated
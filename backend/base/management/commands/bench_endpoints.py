@@ -0,0 +1,215 @@
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from forum.models import Post
+from lms import synthetic
+from users.models import User
+
+Endpoint = namedtuple('Endpoint', 'name method path user data')
+
+
+def sample_rows():
+    """A student with a batch, a teacher with classes and the longest thread."""
+    student = User.objects.filter(user_type=User.STUDENT, student__batch__isnull=False).select_related(
+        'student__batch').order_by('pk').first()
+    teacher = User.objects.filter(teacher__teacher_timetables__isnull=False).order_by('pk').first()
+    post = Post.objects.order_by('-comment_count', 'pk').first()
+    if student is None or teacher is None or post is None:
+        raise CommandError('Nothing to benchmark; run generate_institution first.')
+    return student, teacher, post
+
+
+def endpoints(password):
+    student, teacher, post = sample_rows()
+    batch = student.student.batch.name
+    return [
+        Endpoint('login', 'POST', '/api/users/token/', None,
+                 {'enrollment_number': student.enrollment_number, 'password': password}),
+        Endpoint('user_detail', 'GET', f'/api/users/{student.enrollment_number}', student, None),
+        Endpoint('announcements', 'GET', '/api/announcements/', None, None),
+        Endpoint('notifications', 'GET', '/api/notifications/', student, None),
+        Endpoint('unread_count', 'GET', '/api/notifications/unread-count', student, None),
+        Endpoint('legacy_timetable', 'GET', f'/api/time-table/{batch}?day=1', None, None),
+        Endpoint('courses', 'GET', '/api/courses/', None, None),
+        Endpoint('my_courses', 'GET', '/api/courses/mine/', student, None),
+        Endpoint('timetable', 'GET', f'/api/courses/time-table/{batch}/', None, None),
+        Endpoint('timetable_week', 'GET', f'/api/courses/time-table/{batch}/week/', None, None),
+        Endpoint('teacher_timetable', 'GET', '/api/courses/time-table/teacher/', teacher, None),
+        Endpoint('forum_feed', 'GET', '/api/forum/', None, None),
+        Endpoint('forum_feed_activity', 'GET', '/api/forum/?sort=activity', None, None),
+        Endpoint('forum_search', 'GET', '/api/forum/search?q=synthetic', None, None),
+        Endpoint('forum_thread', 'GET', f'/api/forum/{post.pk}', None, None),
+        Endpoint('forum_comments', 'GET', f'/api/forum/{post.pk}/comments', None, None),
+    ]
+
+
+class InProcessTarget:
+    """Requests through Django's test client; counts the queries each one runs."""
+    name = 'in-process'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def send(self, endpoint, headers):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = APIClient()
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        if endpoint.data is not None:
+            headers = {**headers, 'format': 'json'}
+        with connection.execute_wrapper(count):
+            response = getattr(client, endpoint.method.lower())(endpoint.path, endpoint.data, **headers)
+        return response.status_code, len(response.content), len(queries)
+
+
+class HTTPTarget:
+    """Requests to a running server; query counts are not visible from here."""
+
+    def __init__(self, base_url):
+        self.name = self.base_url = base_url.rstrip('/')
+
+    def send(self, endpoint, headers):
+        data = json.dumps(endpoint.data).encode() if endpoint.data else None
+        request = urllib.request.Request(self.base_url + endpoint.path, data=data, method=endpoint.method)
+        if data:
+            request.add_header('Content-Type', 'application/json')
+        if 'HTTP_AUTHORIZATION' in headers:
+            request.add_header('Authorization', headers['HTTP_AUTHORIZATION'])
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, len(response.read()), None
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read()), None
+
+
+def percentile(quantiles, n):
+    return round(quantiles[n - 1], 2)
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the API against the current database (see generate_institution): '
+            'p50/p95/p99 latency, throughput and queries per request for every endpoint. '
+            'Save the --output of each release and pass it as --baseline to the next.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=1, help='Requests in flight at once.')
+        parser.add_argument('--endpoint', action='append', dest='names', help='Only these endpoints.')
+        parser.add_argument('--base-url', help='Benchmark a running server instead of the in-process client.')
+        parser.add_argument('--password', default=synthetic.PASSWORD, help='Password of the sampled student.')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--baseline', help='Compare with a report written by an earlier run.')
+        parser.add_argument('--json', action='store_true', dest='as_json', help='Print the report as JSON.')
+
+    def handle(self, requests=200, warmup=10, concurrency=1, names=None, base_url=None,
+               password=synthetic.PASSWORD, cold=False, output=None, baseline=None, as_json=False, **options):
+        selected = endpoints(password)
+        if names:
+            unknown = set(names) - {endpoint.name for endpoint in selected}
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+            selected = [endpoint for endpoint in selected if endpoint.name in names]
+        if cold and base_url:
+            raise CommandError("--cold can't clear the cache of a separate server.")
+
+        target = HTTPTarget(base_url) if base_url else InProcessTarget()
+        report = {
+            'target': target.name,
+            'database': connection.vendor,
+            'concurrency': concurrency,
+            'requests_per_endpoint': requests,
+            'cold_cache': cold,
+            'endpoints': {
+                endpoint.name: self.run(target, endpoint, requests, warmup, concurrency, cold)
+                for endpoint in selected
+            },
+        }
+
+        if output:
+            with open(output, 'w') as stream:
+                json.dump(report, stream, indent=2)
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_table(report, self.load(baseline) if baseline else None)
+
+    def run(self, target, endpoint, requests, warmup, concurrency, cold):
+        headers = {}
+        if endpoint.user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(endpoint.user)}'
+
+        def send(_):
+            if cold:
+                cache.clear()
+            started = time.perf_counter()
+            status, size, queries = target.send(endpoint, headers)
+            return (time.perf_counter() - started) * 1000, status, size, queries
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, range(warmup)))
+            started = time.perf_counter()
+            results = list(pool.map(send, range(requests)))
+            elapsed = time.perf_counter() - started
+
+        timings = [timing for timing, _, _, _ in results]
+        errors = sum(1 for _, status, _, _ in results if status >= 400)
+        quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+        queries = [count for _, _, _, count in results if count is not None]
+        return {
+            'method': endpoint.method,
+            'path': endpoint.path,
+            'requests': len(results),
+            'errors': errors,
+            'p50_ms': percentile(quantiles, 50),
+            'p95_ms': percentile(quantiles, 95),
+            'p99_ms': percentile(quantiles, 99),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'requests_per_second': round(len(results) / max(elapsed, 1e-9), 1),
+            'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+            'bytes': results[-1][2],
+        }
+
+    def load(self, path):
+        try:
+            with open(path) as stream:
+                return json.load(stream)['endpoints']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Can't read baseline {path}: {e}")
+
+    def print_table(self, report, baseline=None):
+        self.stdout.write(
+            f'{report["target"]} on {report["database"]}, concurrency {report["concurrency"]}, '
+            f'{report["requests_per_endpoint"]} requests per endpoint')
+        self.stdout.write(f'{"endpoint":22} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"queries":>8} {"bytes":>8}')
+        for name, row in report['endpoints'].items():
+            queries = '-' if row['queries_per_request'] is None else f'{row["queries_per_request"]:g}'
+            line = (f'{name:22} {row["p50_ms"]:8.2f} {row["p95_ms"]:8.2f} {row["p99_ms"]:8.2f} '
+                    f'{row["requests_per_second"]:8.1f} {queries:>8} {row["bytes"]:8}')
+            if row['errors']:
+                line += f'  {row["errors"]} errors'
+            old = (baseline or {}).get(name)
+            if old:
+                change = (row['p95_ms'] - old['p95_ms']) / max(old['p95_ms'], 1e-9) * 100
+                line += f'  p95 {change:+.0f}%'
+                if row['queries_per_request'] != old.get('queries_per_request'):
+                    line += f', queries {old.get("queries_per_request")} -> {row["queries_per_request"]}'
+            self.stdout.write(line)
@@ -0,0 +1,71 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from lms import renderers, synthetic
+
+from .bench_endpoints import endpoints
+
+
+def available_renderers():
+    found = {'json': JSONRenderer()}
+    if renderers.orjson is not None:
+        found['orjson'] = renderers.ORJSONRenderer()
+    if renderers.msgpack is not None:
+        found['msgpack'] = renderers.MessagePackRenderer()
+    return found
+
+
+class Command(BaseCommand):
+    help = ('Compare encode time and size of the API renderers on real endpoint payloads '
+            '(see generate_institution). Renderers whose package is missing are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=200, help='Encodes per payload and renderer.')
+        parser.add_argument('--json', action='store_true', dest='as_json', help='Print the report as JSON.')
+
+    def handle(self, rounds=200, as_json=False, **options):
+        found = available_renderers()
+        report = {}
+        for endpoint in endpoints(synthetic.PASSWORD):
+            if endpoint.method != 'GET':
+                continue
+            data = self.payload(endpoint)
+            stock = found['json'].render(data)
+            row = {}
+            for name, renderer in found.items():
+                encoded = renderer.render(data)
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    renderer.render(data)
+                row[name] = {
+                    'encode_us': round((time.perf_counter() - started) / rounds * 1e6, 1),
+                    'bytes': len(encoded),
+                }
+                if name != 'msgpack':
+                    row[name]['identical'] = encoded == stock
+            report[endpoint.name] = row
+
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        names = list(found)
+        self.stdout.write(f'{"endpoint":22}' + ''.join(f'{name + " us":>14}{"bytes":>9}' for name in names))
+        for endpoint, row in report.items():
+            line = f'{endpoint:22}' + ''.join(
+                f'{row[name]["encode_us"]:14.1f}{row[name]["bytes"]:9}' for name in names)
+            if 'orjson' in row:
+                line += f'  x{row["json"]["encode_us"] / max(row["orjson"]["encode_us"], 1e-9):.1f}'
+                if not row['orjson']['identical']:
+                    line += ' (differs)'
+            self.stdout.write(line)
+
+    def payload(self, endpoint):
+        client = APIClient()
+        if endpoint.user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(endpoint.user)}')
+        return client.get(endpoint.path).data
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lms import synthetic
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Fill an empty database with a synthetic institution for load testing '
+            '(see bench_endpoints). Every generated student and teacher has the password given by --password; '
+            'the admin account only has one if --admin-password is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiply every count below; 10 gives 20000 students.')
+        parser.add_argument('--batches', type=int, default=20)
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--teachers', type=int, default=100)
+        parser.add_argument('--courses', type=int, default=60)
+        parser.add_argument('--courses-per-student', type=int, default=5)
+        parser.add_argument('--timetable-rows', type=int, default=1200)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--notifications', type=int, default=200)
+        parser.add_argument('--announcements', type=int, default=30)
+        parser.add_argument('--password', default=synthetic.PASSWORD)
+        parser.add_argument('--admin-password', help='Password of the A0000000 superuser; unusable if not given.')
+        parser.add_argument('--force', action='store_true', help='Generate even if the database already has users.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; equal seeds give equal data.')
+
+    def handle(self, scale=1.0, courses_per_student=5, password=synthetic.PASSWORD, admin_password=None, seed=0,
+               force=False, **options):
+        if User.objects.filter(enrollment_number=synthetic.FIRST_STUDENT).exists():
+            raise CommandError('This database already holds a generated institution; use an empty one.')
+        if not force and User.objects.exists():
+            raise CommandError('This database already has users; use an empty one or pass --force.')
+
+        counts = {
+            name: max(int(options[name] * scale), 1)
+            for name in ('batches', 'students', 'teachers', 'courses', 'timetable_rows',
+                         'posts', 'comments', 'notifications', 'announcements')
+        }
+        # Batch names are four characters: B000 to B999.
+        counts['batches'] = min(counts['batches'], 1000)
+
+        def progress(stage, count, seconds):
+            self.stdout.write(f'{seconds:7.1f}s  {count:>9,} {stage}')
+
+        synthetic.generate(
+            courses_per_student=courses_per_student,
+            password=password,
+            admin_password=admin_password,
+            random_seed=seed,
+            progress=progress,
+            **counts,
+        )
+        admin = f'A0000000 (admin) with password {admin_password!r}' if admin_password else 'no admin'
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated; log in as S0000000 (student) or T0000000 (teacher) with password {password!r}, '
+            f'or as {admin}.'))
@@ -0,0 +1,65 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_receipts(apps, schema_editor):
+    Notification = apps.get_model('base', 'Notification')
+    NotificationReceipt = apps.get_model('base', 'NotificationReceipt')
+    Student = apps.get_model('users', 'Student')
+
+    for notification in Notification.objects.iterator():
+        students = Student.objects.filter(course=notification.course_id)
+        batches = notification.batch.all()
+        if batches.exists():
+            students = students.filter(batch__in=batches)
+        NotificationReceipt.objects.bulk_create([
+            NotificationReceipt(
+                notification=notification,
+                user_id=user_id,
+                is_read=notification.isSeen,
+                date_posted=notification.date_posted,
+            )
+            for user_id in students.values_list('user_id', flat=True).distinct()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('base', '0016_rename_announcements_announcement'),
+        ('courses', '0003_timetable'),
+        ('users', '0002_alter_student_options_alter_teacher_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False)),
+                ('date_posted', models.DateTimeField()),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='base.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date_posted', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificationreceipt',
+            index=models.Index(fields=['user', '-date_posted', '-id'], name='base_receipt_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationreceipt',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user'], name='base_receipt_unread_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationreceipt',
+            constraint=models.UniqueConstraint(fields=('notification', 'user'), name='base_receipt_unique'),
+        ),
+        migrations.RunPython(create_receipts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0017_notificationreceipt'),
+        ('courses', '0005_merge_base_timetable'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='TimeTable',
+        ),
+    ]
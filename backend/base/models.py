@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 class Batch(models.Model):
@@ -13,60 +14,6 @@ class Batch(models.Model):
         return self.name
 
 
-class TimeTable(models.Model):
-    course = models.ForeignKey('courses.course', on_delete=models.CASCADE)
-
-    LECTURE = 'lecture'
-    LAB = 'lab'
-
-    class_type_choices = [
-        (LECTURE, 'Lecture'),
-        (LAB, 'Lab'),
-    ]
-
-    class_type = models.CharField(
-        max_length=7,
-        choices=class_type_choices,
-    )
-
-    SUNDAY = 0
-    MONDAY = 1
-    TUESDAY = 2
-    WEDNESDAY = 3
-    THURSDAY = 4
-    FRIDAY = 5
-    SATURDAY = 6
-
-    day_choices = [
-        (SUNDAY, 'Sunday'),
-        (MONDAY, 'Monday'),
-        (TUESDAY, 'Tuesday'),
-        (WEDNESDAY, 'Wednesday'),
-        (THURSDAY, 'Thursday'),
-        (FRIDAY, 'Friday'),
-        (SATURDAY, 'Saturday'),
-    ]
-
-    day = models.PositiveSmallIntegerField(
-        choices=day_choices,
-        blank=False
-    )
-
-    start_time = models.TimeField()
-    end_time = models.TimeField()
-
-    batch = models.ManyToManyField(Batch)
-
-    teacher = models.ForeignKey(
-        'users.Teacher', on_delete=models.SET_NULL, null=True)
-
-    class Meta:
-        verbose_name_plural = "time table"
-
-    def __str__(self) -> str:
-        return f'{self.course} {self.class_type} on {self.day_choices[self.day - 1][1]} at {self.start_time}'
-
-
 class Announcement(models.Model):
     title = models.CharField(max_length=100, blank=False)
     text = models.TextField(max_length=300)
@@ -89,4 +36,30 @@ class Notification(models.Model):
         verbose_name_plural = "notifications"
 
     def __str__(self) -> str:
-        return f'{self.title}'
\ No newline at end of file
+        return f'{self.title}'
+
+
+class NotificationReceipt(models.Model):
+    """
+    One row per (notification, recipient): the user's inbox entry and its
+    read state. ``date_posted`` is copied from the notification so an inbox
+    page is a range scan on a single index.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_receipts')
+    is_read = models.BooleanField(default=False)
+    date_posted = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-date_posted', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'user'], name='base_receipt_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-date_posted', '-id'], name='base_receipt_inbox_idx'),
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='base_receipt_unread_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.notification} for {self.user_id}'
\ No newline at end of file
@@ -0,0 +1,54 @@
+from operator import attrgetter
+
+from courses.projections import COURSE_COLUMNS, TimeTableProjection, represent_course
+from lms.projections import ProjectionSerializer, format_datetime, format_time, group_related
+from users.projections import represent_user
+
+from .models import Batch
+
+
+class LegacyTimeTableProjection(TimeTableProjection):
+    """``serializers2.TimeTableSerializer`` output: batches as primary keys."""
+
+    def prepare(self, rows):
+        self.batches = group_related(
+            Batch.objects.filter(batch_timetables__in=[row.id for row in rows]), 'batch_timetables', 'id')
+
+    def to_representation(self, row):
+        return {
+            'id': row.id,
+            'course': represent_course(*self.course(row)),
+            'teacher': None if row.teacher_id is None else {'user': represent_user(*self.teacher_user(row))},
+            'class_type': row.class_type,
+            'day': row.day,
+            'start_time': format_time(row.start_time),
+            'end_time': format_time(row.end_time),
+            'batch': [batch_id for batch_id, in self.batches.get(row.id, ())],
+        }
+
+
+class NotificationReceiptProjection(ProjectionSerializer):
+    """
+    ``NotificationReceiptSerializer`` output. The receipt's own ``id`` and
+    ``date_posted`` lead the row so ``KeysetPagination`` can page the
+    projection.
+    """
+    course_columns = tuple(f'notification__{column}' for column in COURSE_COLUMNS)
+    columns = ('id', 'date_posted', 'is_read', 'notification_id', 'notification__title', 'notification__text',
+               'notification__date_posted') + course_columns
+    course = attrgetter(*course_columns)
+
+    def prepare(self, rows):
+        self.batches = group_related(
+            Batch.objects.filter(notification__in=[row.notification_id for row in rows]), 'notification', 'id')
+
+    def to_representation(self, row):
+        return {
+            'id': row.notification_id,
+            'title': row.notification__title,
+            'text': row.notification__text,
+            'isSeen': row.is_read,
+            'date_posted': format_datetime(row.notification__date_posted),
+            'course': represent_course(*self.course(row)),
+            'batch': [batch_id for batch_id, in self.batches.get(row.notification_id, ())],
+        }
@@ -1,5 +1,5 @@
 from rest_framework.serializers import ModelSerializer
-from .models import Announcement, Batch, Notification
+from .models import Announcement, Batch, Notification, NotificationReceipt
 
 class BatchSerialzer(ModelSerializer):
     class Meta:
@@ -20,4 +20,19 @@ class NotificationSerializer(ModelSerializer):
         from courses.serializers import CourseSerializer  # Import here to avoid circular import
         data = super().to_representation(instance)
         data['course'] = CourseSerializer(instance.course).data
-        return data
\ No newline at end of file
+        return data
+
+
+class NotificationReceiptSerializer(ModelSerializer):
+    """
+    A notification as seen in one user's inbox: the ``NotificationSerializer``
+    shape with ``isSeen`` taken from the user's receipt.
+    """
+    class Meta:
+        model = NotificationReceipt
+        fields = ['is_read']
+
+    def to_representation(self, instance):
+        data = NotificationSerializer(instance.notification).data
+        data['isSeen'] = instance.is_read
+        return data
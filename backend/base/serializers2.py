@@ -2,15 +2,16 @@
 
 from rest_framework.serializers import ModelSerializer
 
-from .models import TimeTable
 from users.serializers import TeacherSerializer
+from courses.models import TimeTable
 from courses.serializers import CourseSerializer
 
 
 class TimeTableSerializer(ModelSerializer):
+    """The response shape of the old ``base.TimeTable`` model, kept for /api/time-table/."""
     course = CourseSerializer()
     teacher = TeacherSerializer()
 
     class Meta:
         model = TimeTable
-        fields = '__all__'
+        fields = ['id', 'course', 'teacher', 'class_type', 'day', 'start_time', 'end_time', 'batch']
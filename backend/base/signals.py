@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from courses.models import Course
+from lms.events import get_broker
+from lms.versions import bump, model_scope
+from users.models import Student
+
+from .inbox import NOTIFICATIONS, sync_recipients, sync_users
+from .models import Announcement, Notification, NotificationReceipt
+from .serializers import AnnouncementSerializer, NotificationSerializer
+
+
+def fan_out(notification):
+    added = sync_recipients(notification)
+    if not added:
+        return
+
+    def publish():
+        # The admin saves a notification before setting its batches, so the
+        # audience is only final once the transaction commits.
+        users = added & set(NotificationReceipt.objects.filter(
+            notification=notification).values_list('user_id', flat=True))
+        if users:
+            get_broker().publish('notification', NotificationSerializer(notification).data, users)
+
+    transaction.on_commit(publish)
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    if not created:
+        # Already in inboxes; a new one only reaches the receipts fan_out adds.
+        bump([NOTIFICATIONS])
+    fan_out(instance)
+
+
+@receiver(post_delete, sender=Notification)
+@receiver(post_save, sender=Course)
+def notifications_changed(sender, **kwargs):
+    # Inbox entries show the course and are gone with their notification.
+    bump([NOTIFICATIONS])
+
+
+@receiver(m2m_changed, sender=Notification.batch.through)
+def notification_batches_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            # Inbox entries list their batches.
+            bump([NOTIFICATIONS])
+            fan_out(instance)
+        return
+
+    # ``instance`` is a Batch; every notification it was added to or removed
+    # from needs its audience recomputed.
+    if action == 'pre_clear':
+        instance._cleared_notifications = list(instance.notification_set.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_notifications', [])
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if pk_set:
+        bump([NOTIFICATIONS])
+    for notification in Notification.objects.filter(pk__in=pk_set):
+        fan_out(notification)
+
+
+@receiver(m2m_changed, sender=Course.student.through)
+def enrollments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # ``instance`` is a Student.
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            sync_users([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_students = list(instance.student.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        sync_users(instance.__dict__.pop('_cleared_students', []))
+    elif action in ('post_add', 'post_remove'):
+        sync_users(pk_set)
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, created, **kwargs):
+    # A new student has no enrollments yet; a moved one may have left or
+    # joined the audience of batch-narrowed notifications.
+    if not created:
+        sync_users([instance.pk])
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def announcements_changed(sender, **kwargs):
+    bump([model_scope(Announcement)])
+
+
+@receiver(post_save, sender=Announcement)
+def announcement_saved(sender, instance, created, **kwargs):
+    if created:
+        data = AnnouncementSerializer(instance).data
+        transaction.on_commit(lambda: get_broker().publish('announcement', data))
@@ -0,0 +1,142 @@
+"""
+Server-sent events endpoint, served directly over ASGI (see lms/asgi.py).
+
+Clients connect with ``EventSource('/api/events/?token=<access token>')`` and
+receive ``notification`` and ``announcement`` events for their own inbox.
+Browsers send ``Last-Event-ID`` when reconnecting; missed events are replayed
+from the broker, or a ``resync`` event tells the client to refetch over REST.
+
+The token is checked like the REST API checks it, active user and revocation
+included, but only on connect; so the stream ends with a ``resync`` once the
+token expires, and the client reconnects with a fresh one.
+"""
+import asyncio
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from lms.events import get_broker
+from users.authentication import is_revoked
+from users.models import User
+
+PATH = '/api/events/'
+
+RESYNC = b'event: resync\ndata: {}\n\n'
+HEARTBEAT = b': heartbeat\n\n'
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _authenticate(scope, query):
+    raw = query.get('token', [None])[0]
+    authorization = _header(scope, b'authorization')
+    if raw is None and authorization and authorization.startswith('Bearer '):
+        raw = authorization[len('Bearer '):]
+    if not raw:
+        return None
+    try:
+        token = AccessToken(raw)
+    except TokenError:
+        return None
+    return token if api_settings.USER_ID_CLAIM in token else None
+
+
+@sync_to_async
+def _may_connect(token):
+    user_id = token[api_settings.USER_ID_CLAIM]
+    if is_revoked(user_id, token.get('iat')):
+        return False
+    return User.objects.filter(pk=user_id, is_active=True).exists()
+
+
+def _last_event_id(scope, query):
+    raw = _header(scope, b'last-event-id') or query.get('lastEventId', [None])[0]
+    try:
+        return int(raw) if raw else None
+    except ValueError:
+        return None
+
+
+async def _reject(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def application(scope, receive, send):
+    query = parse_qs(scope.get('query_string', b'').decode())
+    token = _authenticate(scope, query)
+    if token is None:
+        await _reject(send, 401, b'{"detail": "Authentication credentials were not provided."}')
+        return
+    if not await _may_connect(token):
+        await _reject(send, 401, b'{"detail": "Token is invalid or expired"}')
+        return
+    user_id = token[api_settings.USER_ID_CLAIM]
+
+    config = settings.EVENTS
+    broker = get_broker()
+    subscription, backlog = broker.subscribe(
+        user_id, asyncio.get_running_loop(), _last_event_id(scope, query))
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        body = RESYNC if backlog is None else b''.join(event.encode() for event in backlog)
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        while not disconnected.done():
+            remaining = token['exp'] - time.time()
+            if remaining <= 0:
+                await send({'type': 'http.response.body', 'body': RESYNC, 'more_body': False})
+                return
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=min(config['HEARTBEAT'], remaining),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if next_event not in done:
+                next_event.cancel()
+                if not done:
+                    await send({'type': 'http.response.body', 'body': HEARTBEAT, 'more_body': True})
+                continue
+            if subscription.overflowed:
+                # The client could not keep up; make it reconnect and refetch
+                # rather than buffering without bound.
+                await send({'type': 'http.response.body', 'body': RESYNC, 'more_body': False})
+                return
+            await send({'type': 'http.response.body', 'body': next_event.result().encode(), 'more_body': True})
+
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        disconnected.cancel()
+        broker.unsubscribe(subscription)
@@ -1,3 +1,199 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import Client, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from courses.models import Course, TimeTable
+from lms.testing import BudgetTestCase
+from users.authentication import revoke_tokens
+from users.models import Student, User
+
+from . import stream
+from .models import Announcement, Batch, Notification, NotificationReceipt
+from .projections import LegacyTimeTableProjection, NotificationReceiptProjection
+from .serializers import NotificationReceiptSerializer
+from .serializers2 import TimeTableSerializer
+
+
+class EndpointBudgetTests(BudgetTestCase):
+    @override_settings(SHARED_CACHE=True)
+    def test_time_table(self):
+        url = f'/api/time-table/{self.data.batch.name}?day=1'
+        self.assertBudget('GET', url, queries=4, size=10_000)
+        # Served from the cache until the timetable changes.
+        self.assertBudget('GET', url, queries=0, size=10_000)
+        self.assertBudget('GET', f'/api/time-table/{self.data.batch.name}?day=x', queries=0, size=100, status=400)
+        self.assertBudget('GET', f'/api/time-table/{self.data.batch.name}?day=7', queries=0, size=100, status=404)
+        self.assertBudget('GET', '/api/time-table/ZZZZ?day=1', queries=0, size=100, status=404)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_announcements(self):
+        response = self.assertBudget('GET', '/api/announcements/', queries=1, size=8_000)
+        client = self.client_for()
+        client.credentials(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertBudget('GET', '/api/announcements/', queries=0, size=0, client=client, status=304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.create(title='New', text='Text')
+        self.assertBudget('GET', '/api/announcements/', queries=1, size=8_000, client=client)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_notifications_conditional(self):
+        student = self.data.student
+        url = '/api/notifications/?page_size=5'
+        response = self.assertBudget('GET', url, queries=4, size=12_000, user=student)
+        client = self.client_for()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(student)}',
+                           HTTP_IF_NONE_MATCH=response['ETag'])
+        # Only the user lookup of the token authentication.
+        self.assertBudget('GET', url, queries=1, size=0, client=client, status=304)
+
+        self.assertBudget('POST', '/api/notifications/mark-all-read', queries=2, size=100, user=student, data={})
+        response = self.assertBudget('GET', url, queries=4, size=12_000, client=client)
+        self.assertEqual(response.data['unread_count'], 0)
+
+    def test_notifications(self):
+        url = '/api/notifications/?page_size=5'
+        response = self.assertBudget('GET', url, queries=4, size=12_000, user=self.data.student)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertBudget('GET', response.data['next'], queries=4, size=12_000, user=self.data.student)
+
+    def test_unread_count(self):
+        self.assertBudget('GET', '/api/notifications/unread-count', queries=2, size=100, user=self.data.student)
+
+    def test_mark_read(self):
+        ids = list(NotificationReceipt.objects.filter(user=self.data.student).values_list(
+            'notification_id', flat=True)[:5])
+        self.assertBudget('POST', '/api/notifications/mark-read', queries=3, size=100,
+                          user=self.data.student, data={'ids': ids})
+        self.assertBudget('POST', '/api/notifications/mark-all-read', queries=2, size=100,
+                          user=self.data.student, data={})
+
+    def test_traces(self):
+        self.assertBudget('GET', '/api/debug/traces/', queries=1, size=200_000, user=self.data.admin)
+
+    def test_projections(self):
+        TimeTable.objects.filter(pk=TimeTable.objects.order_by('pk').values('pk')[:1]).update(teacher=None)
+        timetables = TimeTable.objects.order_by('pk')
+        self.assertSameRepresentation(
+            LegacyTimeTableProjection(timetables, many=True),
+            TimeTableSerializer(
+                timetables.select_related('course', 'teacher__user').prefetch_related('batch'), many=True))
+        receipts = NotificationReceipt.objects.filter(user=self.data.student)
+        self.assertTrue(receipts)
+        self.assertSameRepresentation(
+            NotificationReceiptProjection(receipts, many=True),
+            NotificationReceiptSerializer(
+                receipts.select_related('notification__course').prefetch_related('notification__batch'), many=True))
+
+
+class AdminBudgetTests(BudgetTestCase):
+    def test_changelists(self):
+        client = Client()
+        client.force_login(self.data.admin)
+        pages = [
+            '/admin/',
+            '/admin/users/user/',
+            '/admin/users/student/',
+            '/admin/users/teacher/',
+            '/admin/base/batch/',
+            '/admin/base/announcement/',
+            '/admin/base/notification/',
+            '/admin/courses/course/',
+            '/admin/courses/timetable/',
+            '/admin/forum/post/',
+            '/admin/forum/comment/',
+        ]
+        for url in pages:
+            with self.subTest(url=url):
+                # One page of 100 rows plus filters, whatever the table size.
+                self.assertBudget('GET', url, queries=10, size=200_000, client=client)
+
+
+class InboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a, cls.b = Batch.objects.create(name='A1'), Batch.objects.create(name='B1')
+        cls.course = Course.objects.create(name='Physics', code='PH101')
+        cls.first = Student.objects.create(
+            user=User.objects.create_user('S1', 'First', 'x'), batch=cls.a)
+        cls.second = Student.objects.create(
+            user=User.objects.create_user('S2', 'Second', 'x'), batch=cls.b)
+        cls.everyone = Notification.objects.create(title='Everyone', text='Text', course=cls.course)
+        cls.only_a = Notification.objects.create(title='Only A', text='Text', course=cls.course)
+        cls.only_a.batch.add(cls.a)
+
+    def inbox(self, student):
+        return set(NotificationReceipt.objects.filter(user_id=student.pk).values_list('notification__title', flat=True))
+
+    def test_enrolling_fills_the_inbox(self):
+        self.course.student.add(self.first, self.second)
+        self.assertEqual(self.inbox(self.first), {'Everyone', 'Only A'})
+        self.assertEqual(self.inbox(self.second), {'Everyone'})
+
+        self.course.student.remove(self.second)
+        self.assertEqual(self.inbox(self.second), set())
+        self.second.course_set.add(self.course)
+        self.assertEqual(self.inbox(self.second), {'Everyone'})
+
+        self.course.student.clear()
+        self.assertEqual(self.inbox(self.first) | self.inbox(self.second), set())
+
+    def test_moving_batch_updates_the_inbox(self):
+        self.course.student.add(self.first, self.second)
+        self.second.batch = self.a
+        self.second.save()
+        self.assertEqual(self.inbox(self.second), {'Everyone', 'Only A'})
+        self.first.batch = self.b
+        self.first.save()
+        self.assertEqual(self.inbox(self.first), {'Everyone'})
+
+    def test_mark_read_rejects_bad_ids(self):
+        self.course.student.add(self.first)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.first.user)}')
+        for ids in (['1'], [1.0], [True], 'all', None):
+            with self.subTest(ids=ids):
+                response = client.post('/api/notifications/mark-read', {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+        response = client.post('/api/notifications/mark-read', {'ids': [self.everyone.pk]}, format='json')
+        self.assertEqual(response.data, {'updated': 1, 'unread_count': 1})
+
+
+class StreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('S1', 'First', 'x')
+
+    def connect(self, token):
+        """Run the stream until it ends, returning the messages it sent."""
+        messages = []
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'path': stream.PATH, 'query_string': f'token={token}'.encode(), 'headers': []}
+        async_to_sync(stream.application)(scope, receive, send)
+        return messages
+
+    def test_rejects_inactive_users(self):
+        token = AccessToken.for_user(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.connect(token)[0]['status'], 401)
+
+    def test_rejects_revoked_tokens(self):
+        token = AccessToken.for_user(self.user)
+        revoke_tokens(self.user.pk)
+        self.assertEqual(self.connect(token)[0]['status'], 401)
+
+    def test_ends_when_the_token_expires(self):
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=timedelta(seconds=1))
+        messages = self.connect(token)
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(messages[-1], {'type': 'http.response.body', 'body': stream.RESYNC, 'more_body': False})
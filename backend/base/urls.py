@@ -6,4 +6,8 @@ urlpatterns = [
     path('time-table/<batch>', views.timeTableList),
     path('announcements/', views.announcementsList),
     path('notifications/', views.notificationsList),
+    path('notifications/unread-count', views.unreadNotificationsCount),
+    path('notifications/mark-read', views.markNotificationsRead),
+    path('notifications/mark-all-read', views.markAllNotificationsRead),
+    path('debug/traces/', views.tracesList),
 ]
\ No newline at end of file
@@ -1,29 +1,98 @@
+from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
-from .models import Batch, Notification, TimeTable, Announcement
-from .serializers import AnnouncementSerializer, NotificationSerializer
-from .serializers2 import TimeTableSerializer
+from courses.cache import DAYS, LEGACY, batch_exists, batch_key, cached_response
+from courses.models import TimeTable
+from lms import tracing
+from lms.pagination import KeysetPagination
+from lms.replicas import read_replica
+from lms.versions import model_scope, versioned_response
+
+from . import inbox
+from .models import Batch, NotificationReceipt, Announcement
+from .projections import LegacyTimeTableProjection, NotificationReceiptProjection
+from .serializers import AnnouncementSerializer
 
 
 @api_view(['GET'])
+@read_replica
 def timeTableList(request, batch):
-    batch = Batch.objects.filter(name=batch.upper()).first()
+    name = batch.upper()
     day = request.GET.get('day')
-    timeTable = TimeTable.objects.filter(batch=batch).filter(day=day)
-    serialzer = TimeTableSerializer(timeTable, many=True)
-    return Response(serialzer.data)
+    if day is not None:
+        try:
+            day = int(day)
+        except ValueError:
+            return Response({"detail": "Invalid day parameter"}, status=status.HTTP_400_BAD_REQUEST)
+        if day not in DAYS:
+            return Response({"detail": "Unknown day"}, status=status.HTTP_404_NOT_FOUND)
+    if not batch_exists(name):
+        return Response({"detail": "Unknown batch"}, status=status.HTTP_404_NOT_FOUND)
+
+    def build():
+        batch = Batch.objects.filter(name=name).first()
+        timeTable = TimeTable.objects.filter(batch=batch).filter(day=day)
+        serialzer = LegacyTimeTableProjection(timeTable, many=True)
+        return serialzer.data
+
+    return cached_response(request, batch_key(LEGACY, name, day), build)
 
 
 @api_view(['GET'])
+@read_replica
 def announcementsList(request):
-    announcements = Announcement.objects.all()
-    serialzer = AnnouncementSerializer(announcements, many=True)
-    return Response(serialzer.data)
+    def build():
+        announcements = Announcement.objects.all()
+        serialzer = AnnouncementSerializer(announcements, many=True)
+        return serialzer.data
+
+    return versioned_response(request, [model_scope(Announcement)], build)
 
 
 @api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
 def notificationsList(request):
-    notifications = Notification.objects.all()
-    serialzer = NotificationSerializer(notifications, many=True)
-    return Response(serialzer.data)
+    def build():
+        receipts = NotificationReceiptProjection.project(NotificationReceipt.objects.filter(user_id=request.user.pk))
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(receipts, request)
+        serialzer = NotificationReceiptProjection(page, many=True)
+        data = paginator.get_paginated_data(serialzer.data)
+        data['unread_count'] = inbox.unread_count(request.user)
+        return data
+
+    return versioned_response(request, inbox.inbox_scopes(request.user.pk), build)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
+def unreadNotificationsCount(request):
+    return versioned_response(
+        request, inbox.inbox_scopes(request.user.pk), lambda: {'unread_count': inbox.unread_count(request.user)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def markNotificationsRead(request):
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not all(type(pk) is int for pk in ids):
+        return Response({'detail': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+    updated = inbox.mark_read(request.user, ids)
+    return Response({'updated': updated, 'unread_count': inbox.unread_count(request.user)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def markAllNotificationsRead(request):
+    updated = inbox.mark_read(request.user)
+    return Response({'updated': updated, 'unread_count': 0})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def tracesList(request):
+    return Response(tracing.recent_traces())
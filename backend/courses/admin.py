@@ -1,4 +1,89 @@
-from django.contrib import admin
-from .models import Course
+import io
 
-admin.site.register(Course)
\ No newline at end of file
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .models import Course, TimeTable
+from .timetable_io import FORMATS, TimetableImporter, export_rows, read_rows, write_rows
+
+
+class TeacherListFilter(admin.RelatedFieldListFilter):
+    def field_choices(self, field, request, model_admin):
+        # Teachers are named after their user; load both in one query.
+        teachers = field.related_model.objects.select_related('user').order_by('user__first_name')
+        return [(teacher.pk, str(teacher)) for teacher in teachers]
+
+
+class TimeTableAdmin(admin.ModelAdmin):
+    list_display = ('course', 'class_type', 'day', 'start_time', 'end_time', 'teacher')
+    list_filter = ('course', 'day', ('teacher', TeacherListFilter))
+    list_select_related = ('course', 'teacher__user')
+    fieldsets = (
+        (None, {'fields': ('course', 'class_type', 'batch', 'teacher')}),
+        ('Timings', {'fields': ('day', ('start_time', 'end_time'))}),
+    )
+    ordering = ('day', 'start_time')
+    change_list_template = 'admin/courses/timetable/change_list.html'
+    actions = ['export_csv', 'export_json']
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='courses_timetable_import'),
+        ] + super().get_urls()
+
+    def _export(self, queryset, format, content_type):
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="timetable.{format}"'
+        write_rows(export_rows(queryset), response, format)
+        return response
+
+    @admin.action(description='Export selected as CSV')
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv', 'text/csv')
+
+    @admin.action(description='Export selected as JSON')
+    def export_json(self, request, queryset):
+        return self._export(queryset, 'json', 'application/json')
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:courses_timetable_changelist')
+
+        if request.method == 'POST' and request.FILES.get('file'):
+            upload = request.FILES['file']
+            format = upload.name.rsplit('.', 1)[-1].lower()
+            replace = bool(request.POST.get('replace'))
+            if format not in FORMATS:
+                messages.error(request, f'Unsupported file type; use one of {", ".join(FORMATS)}.')
+            elif replace and not self.has_delete_permission(request):
+                messages.error(request, 'Replacing the timetable needs permission to delete timetable rows.')
+            else:
+                importer = TimetableImporter(
+                    replace=replace,
+                    allow_conflicts=bool(request.POST.get('allow_conflicts')),
+                )
+                stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+                try:
+                    created = importer.run(read_rows(stream, format))
+                except ValidationError as e:
+                    for message in e.messages[:50]:
+                        messages.error(request, message)
+                else:
+                    messages.success(request, f'Imported {created} timetable rows.')
+                    return redirect('admin:courses_timetable_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import timetable',
+            'formats': FORMATS,
+        }
+        return TemplateResponse(request, 'admin/courses/timetable/import_form.html', context)
+
+
+admin.site.register(Course)
+admin.site.register(TimeTable, TimeTableAdmin)
\ No newline at end of file
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from base.models import Batch
+from lms import versions
+from lms.replicas import use_primary
+from users.models import User
+
+DAYS = range(7)
+
+# Cache key for a whole week when the client does not filter on ``day``.
+ALL_DAYS = 'all'
+# Cache key for the week grouped by day, as served by the week endpoints.
+WEEK = 'week'
+
+# Every view serializing timetables in its own shape caches under its own
+# namespace; invalidation drops the matching keys in all of them.
+COURSES = 'courses'
+LEGACY = 'base'
+VIEWS = (COURSES, LEGACY)
+
+
+# The names of every batch, checked before a key is built from a batch name.
+BATCH_NAMES = 'timetable:batch-names'
+
+
+def _day_keys(days):
+    return {str(day) for day in days if day is not None} | {ALL_DAYS, WEEK}
+
+
+def batch_key(view, batch_name, day=None):
+    day = ALL_DAYS if day is None else day
+    return f'timetable:{view}:batch:{batch_name}:{day}'
+
+
+def teacher_key(view, teacher_id, day=None):
+    day = ALL_DAYS if day is None else day
+    return f'timetable:{view}:teacher:{teacher_id}:{day}'
+
+
+def user_courses_key(user_id, user_type):
+    return f'courses:user:{user_type}:{user_id}'
+
+
+def get_or_build(key, build):
+    """
+    Return the cached payload under ``key``, calling ``build`` to produce
+    (and cache) it on a miss.
+
+    Each entry is stored with the key's version (see ``lms.versions``) as it
+    was before ``build`` ran, and only served while that is still current: an
+    ``invalidate`` that commits while the payload is being built bumps the
+    version, so the stale entry written afterwards is never read. Without
+    ``SHARED_CACHE`` nothing is cached, since ``invalidate`` would only reach
+    the cache of the process that handled the write.
+    """
+    if not settings.SHARED_CACHE:
+        return build()
+    version_key = versions.PREFIX + key
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key)
+    if version is None:
+        [version] = versions.get_versions([key])
+    entry = cached.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    # Build from the primary: the cache outlives replication lag, and a
+    # replica could still be missing the write that invalidated the key.
+    with use_primary():
+        data = build()
+    cache.set(key, (version, data), settings.TIMETABLE_CACHE_TIMEOUT)
+    return data
+
+
+def batch_exists(name):
+    """
+    Whether a batch is called ``name``. Keys are only built for existing
+    batches, so names made up by clients cannot fill the cache.
+    """
+    if not settings.SHARED_CACHE:
+        return Batch.objects.filter(name=name).exists()
+    return name in get_or_build(BATCH_NAMES, lambda: set(Batch.objects.values_list('name', flat=True)))
+
+
+def cached_response(request, key, build):
+    """
+    ``get_or_build(key, build)`` as a response, or a 304 while the key's
+    version (bumped by ``invalidate``) matches the client's validators.
+    """
+    return versions.versioned_response(request, [key], lambda: get_or_build(key, build))
+
+
+def keys_for(batch_names=(), teacher_ids=(), days=()):
+    days = _day_keys(days)
+    keys = set()
+    for view in VIEWS:
+        for name in batch_names:
+            keys.update(batch_key(view, name, day) for day in days)
+        for teacher_id in teacher_ids:
+            if teacher_id is not None:
+                keys.update(teacher_key(view, teacher_id, day) for day in days)
+    # A teacher's course list is derived from their timetable rows.
+    return keys | keys_for_users(teacher_ids)
+
+
+def keys_for_users(user_ids):
+    """The course list keys of ``user_ids``, whichever their user type."""
+    return {
+        user_courses_key(user_id, user_type)
+        for user_id in user_ids if user_id is not None
+        for user_type, _ in User.USER_TYPE_CHOICES
+    }
+
+
+def keys_for_timetables(queryset):
+    """
+    Every cache key that may contain one of the timetable rows in ``queryset``,
+    resolved with a single query over the batch through table.
+    """
+    keys = set()
+    for day, teacher_id, batch_name in queryset.values_list('day', 'teacher_id', 'batch__name'):
+        batch_names = [batch_name] if batch_name is not None else []
+        keys |= keys_for(batch_names, [teacher_id], [day])
+    return keys
+
+
+def invalidate(keys):
+    """
+    Drop ``keys`` once the surrounding transaction (if any) has committed.
+    Every key is also a version scope (see ``lms.versions``), bumped after the
+    payload is gone.
+    """
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+        versions.bump(keys)
@@ -0,0 +1,20 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from courses.timetable_io import FORMATS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Export every timetable row as CSV, JSON or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Output file; defaults to stdout.')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+
+    def handle(self, path=None, format='csv', **options):
+        if path is None:
+            write_rows(export_rows(), sys.stdout, format)
+            return
+        with open(path, 'w', newline='') as stream:
+            write_rows(export_rows(), stream, format)
@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.timetable_io import FORMATS, TimetableImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import timetable rows from a CSV, JSON or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format; defaults to the file extension.')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete every existing timetable row first.')
+        parser.add_argument('--allow-conflicts', action='store_true',
+                            help='Import even if teacher or batch slots overlap.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, path, format=None, replace=False, allow_conflicts=False, batch_size=1000, **options):
+        format = format or os.path.splitext(path)[1].lstrip('.').lower()
+        if format not in FORMATS:
+            raise CommandError(f'Cannot infer format from {path!r}; pass --format')
+
+        importer = TimetableImporter(replace=replace, allow_conflicts=allow_conflicts, batch_size=batch_size)
+        started = time.perf_counter()
+        try:
+            with open(path, newline='', encoding='utf-8') as stream:
+                created = importer.run(read_rows(stream, format))
+        except ValidationError as e:
+            raise CommandError('Import aborted, nothing was written:\n' + '\n'.join(e.messages))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} timetable rows in {elapsed:.2f}s ({created / max(elapsed, 1e-9):.0f} rows/s)'))
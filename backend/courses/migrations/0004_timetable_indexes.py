@@ -0,0 +1,21 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_timetable'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['day', 'start_time'], name='courses_tt_day_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['teacher', 'day', 'start_time'], name='courses_tt_teacher_day_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def merge_base_timetable(apps, schema_editor):
+    """
+    Copy every base.TimeTable row into courses.TimeTable. Rows describing the
+    same class (course, teacher, type, day and times) are merged into one
+    row carrying the union of their batches.
+    """
+    BaseTimeTable = apps.get_model('base', 'TimeTable')
+    TimeTable = apps.get_model('courses', 'TimeTable')
+
+    for old in BaseTimeTable.objects.prefetch_related('batch'):
+        timetable = TimeTable.objects.filter(
+            course_id=old.course_id,
+            teacher_id=old.teacher_id,
+            class_type=old.class_type,
+            day=old.day,
+            start_time=old.start_time,
+            end_time=old.end_time,
+        ).first()
+        if timetable is None:
+            timetable = TimeTable.objects.create(
+                course_id=old.course_id,
+                teacher_id=old.teacher_id,
+                class_type=old.class_type,
+                day=old.day,
+                start_time=old.start_time,
+                end_time=old.end_time,
+            )
+        timetable.batch.add(*old.batch.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0017_notificationreceipt'),
+        ('courses', '0004_timetable_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_base_timetable, migrations.RunPython.noop),
+    ]
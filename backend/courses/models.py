@@ -56,15 +56,14 @@ class TimeTable(models.Model):
     class Meta:
         ordering = ['day', 'start_time']
         verbose_name_plural = "time table"
+        indexes = [
+            models.Index(fields=['day', 'start_time'], name='courses_tt_day_start_idx'),
+            models.Index(fields=['teacher', 'day', 'start_time'], name='courses_tt_teacher_day_idx'),
+        ]
 
     def __str__(self):
         return f'{self.course} {self.class_type} on {self.get_day_display()} at {self.start_time}'
 
-    def clean(self):
-        from django.core.exceptions import ValidationError
-        if self.start_time >= self.end_time:
-            raise ValidationError('End time must be after start time')
-
     def clean(self):
         from django.core.exceptions import ValidationError
         
@@ -72,8 +71,9 @@ class TimeTable(models.Model):
         if self.start_time and self.end_time and self.start_time >= self.end_time:
             raise ValidationError({'end_time': 'End time must be after start time'})
         
-        # Validate batch is not empty
-        if not self.batch.exists():
+        # Validate batch is not empty. Batches can only be attached once the
+        # row has been saved, so new rows (and bulk imports) skip this check.
+        if self.pk and not self.batch.exists():
             raise ValidationError({'batch': 'At least one batch must be selected'})
         
     def save(self, *args, **kwargs):
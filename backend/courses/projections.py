@@ -0,0 +1,48 @@
+from operator import attrgetter
+
+from base.models import Batch
+from lms.projections import ProjectionSerializer, format_time, group_related
+from users.projections import represent_user, user_columns
+
+COURSE_COLUMNS = ('course__id', 'course__name', 'course__code')
+TEACHER_COLUMNS = user_columns('teacher__user')
+
+
+def represent_course(course_id, name, code):
+    return {'id': course_id, 'name': name, 'code': code}
+
+
+class CourseProjection(ProjectionSerializer):
+    """``CourseSerializer`` output."""
+    columns = ('id', 'name', 'code')
+
+    def to_representation(self, row):
+        return represent_course(*row)
+
+
+class TimeTableProjection(ProjectionSerializer):
+    """``TimeTableSerializer`` output: the teacher's user and the batches inline."""
+    columns = ('id',) + COURSE_COLUMNS + ('teacher_id',) + TEACHER_COLUMNS + (
+        'day', 'start_time', 'end_time', 'class_type')
+    course = attrgetter(*COURSE_COLUMNS)
+    teacher_user = attrgetter(*TEACHER_COLUMNS)
+
+    def prepare(self, rows):
+        # The same join prefetch_related('batch') runs, so batches keep its order.
+        self.batches = group_related(
+            Batch.objects.filter(batch_timetables__in=[row.id for row in rows]), 'batch_timetables', 'id', 'name')
+
+    def to_representation(self, row):
+        teacher = None
+        if row.teacher_id is not None:
+            teacher = {'id': row.teacher_id, 'user': represent_user(*self.teacher_user(row))}
+        return {
+            'id': row.id,
+            'course': represent_course(*self.course(row)),
+            'teacher': teacher,
+            'batch': [{'id': batch_id, 'name': name} for batch_id, name in self.batches.get(row.id, ())],
+            'day': row.day,
+            'start_time': format_time(row.start_time),
+            'end_time': format_time(row.end_time),
+            'class_type': row.class_type,
+        }
@@ -19,7 +19,7 @@ class TimeTableSerializer(ModelSerializer):
         # Manually serialize teacher data
         if instance.teacher:
             data['teacher'] = {
-                'id': instance.teacher.id,
+                'id': instance.teacher.pk,
                 'user': {
                     'id': instance.teacher.user.id,
                     'enrollment_number': instance.teacher.user.enrollment_number,
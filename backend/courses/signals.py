@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from base.models import Batch
+from lms.versions import bump, model_scope
+from users.models import Student, Teacher, User
+
+from .cache import BATCH_NAMES, DAYS, invalidate, keys_for, keys_for_timetables, keys_for_users
+from .models import Course, TimeTable
+
+_bulk_delete = ContextVar('courses_timetable_bulk_delete', default=False)
+
+
+@contextmanager
+def bulk_timetable_delete():
+    """
+    Skip the per-row cache invalidation of timetable rows deleted in the
+    enclosed block; the caller invalidates their keys once instead.
+    """
+    token = _bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        _bulk_delete.reset(token)
+
+
+@receiver(pre_save, sender=TimeTable)
+def remember_timetable_slot(sender, instance, **kwargs):
+    # The row may be moving to another day or teacher; the entries it is
+    # leaving have to be dropped as well as the ones it lands in.
+    instance._timetable_cache_keys = set()
+    if instance.pk:
+        instance._timetable_cache_keys = keys_for_timetables(TimeTable.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=TimeTable)
+def timetable_saved(sender, instance, **kwargs):
+    keys = getattr(instance, '_timetable_cache_keys', set())
+    invalidate(keys | keys_for_timetables(TimeTable.objects.filter(pk=instance.pk)))
+
+
+@receiver(pre_delete, sender=TimeTable)
+def timetable_deleted(sender, instance, **kwargs):
+    if _bulk_delete.get():
+        return
+    invalidate(keys_for_timetables(TimeTable.objects.filter(pk=instance.pk)))
+
+
+@receiver(m2m_changed, sender=TimeTable.batch.through)
+def timetable_batches_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # ``instance`` is a Batch and ``pk_set`` holds timetable ids.
+        timetables = TimeTable.objects.filter(batch=instance)
+        if pk_set is not None:
+            timetables = TimeTable.objects.filter(pk__in=pk_set)
+        batch_names = [instance.name]
+    else:
+        timetables = TimeTable.objects.filter(pk=instance.pk)
+        batches = instance.batch.all() if pk_set is None else model.objects.filter(pk__in=pk_set)
+        batch_names = list(batches.values_list('name', flat=True))
+
+    slots = list(timetables.values_list('day', 'teacher_id'))
+    invalidate(keys_for(
+        batch_names,
+        [teacher_id for _, teacher_id in slots],
+        [day for day, _ in slots],
+    ))
+
+
+def enrolled_ids(course):
+    return Course.student.through.objects.filter(course=course).values_list('student_id', flat=True)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate(
+            keys_for_timetables(TimeTable.objects.filter(course=instance)) | keys_for_users(enrolled_ids(instance)))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_list_changed(sender, instance, **kwargs):
+    bump([model_scope(Course)])
+
+
+@receiver(pre_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    # Enrollments are removed by the cascade, which sends no m2m_changed;
+    # teachers are covered by the cascade deleting their timetable rows.
+    invalidate(keys_for_users(enrolled_ids(instance)))
+
+
+@receiver(m2m_changed, sender=Course.student.through)
+def enrollments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # ``instance`` is a Student and ``pk_set`` holds course ids.
+        student_ids = [instance.pk]
+    elif pk_set is None:
+        student_ids = enrolled_ids(instance)
+    else:
+        student_ids = pk_set
+    invalidate(keys_for_users(student_ids))
+
+
+@receiver(pre_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    invalidate(keys_for_users([instance.pk]))
+
+
+@receiver(post_save, sender=User)
+def teacher_user_saved(sender, instance, created, **kwargs):
+    if not created and instance.user_type == User.TEACHER:
+        invalidate(keys_for_timetables(TimeTable.objects.filter(teacher_id=instance.pk)))
+
+
+@receiver(pre_delete, sender=Teacher)
+def teacher_deleted(sender, instance, **kwargs):
+    # Timetable rows are detached with SET_NULL, which sends no save signals.
+    invalidate(keys_for_timetables(TimeTable.objects.filter(teacher_id=instance.pk)))
+
+
+@receiver(pre_save, sender=Batch)
+def remember_batch_name(sender, instance, **kwargs):
+    instance._timetable_previous_name = None
+    if instance.pk:
+        instance._timetable_previous_name = sender.objects.filter(
+            pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Batch)
+@receiver(pre_delete, sender=Batch)
+def batch_changed(sender, instance, **kwargs):
+    names = {instance.name, getattr(instance, '_timetable_previous_name', None)} - {None}
+    invalidate(
+        keys_for_timetables(TimeTable.objects.filter(batch=instance)) | keys_for(names, days=DAYS) | {BATCH_NAMES}
+    )
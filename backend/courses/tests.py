@@ -1,3 +1,351 @@
-from django.test import TestCase
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from base.models import Batch
+from lms import versions
+from lms.testing import BudgetTestCase
+from users.models import Teacher, User
+
+from .cache import COURSES, WEEK, batch_key, get_or_build, invalidate
+from .models import Course, TimeTable
+from .projections import CourseProjection, TimeTableProjection
+from .serializers import CourseSerializer, TimeTableSerializer
+from .timetable_io import TimetableImporter, export_rows, find_conflicts, read_rows
+
+
+class EndpointBudgetTests(BudgetTestCase):
+    def test_courses(self):
+        self.assertBudget('GET', '/api/courses/', queries=1, size=5_000)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_courses_conditional(self):
+        response = self.assertBudget('GET', '/api/courses/', queries=1, size=5_000)
+        client = self.client_for()
+        client.credentials(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertBudget('GET', '/api/courses/', queries=0, size=0, client=client, status=304)
+        since = self.client_for()
+        since.credentials(HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertBudget('GET', '/api/courses/', queries=0, size=0, client=since, status=304)
+
+        course = Course.objects.order_by('pk').first()
+        course.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+        response = self.assertBudget('GET', '/api/courses/', queries=1, size=5_000, client=client)
+        self.assertEqual(response.data[0]['name'], 'Renamed')
+
+    def test_courses_without_shared_cache(self):
+        # Versions in a per-process cache could miss other workers' writes,
+        # so the ETag is a hash of the payload, built every time.
+        response = self.assertBudget('GET', '/api/courses/', queries=1, size=5_000)
+        self.assertFalse(response.has_header('Last-Modified'))
+        client = self.client_for()
+        client.credentials(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertBudget('GET', '/api/courses/', queries=1, size=0, client=client, status=304)
+        since = self.client_for()
+        since.credentials(HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertBudget('GET', '/api/courses/', queries=1, size=5_000, client=since)
+
+        Course.objects.filter(pk=Course.objects.order_by('pk').first().pk).update(name='Renamed')
+        response = self.assertBudget('GET', '/api/courses/', queries=1, size=5_000, client=client)
+        self.assertEqual(response.data[0]['name'], 'Renamed')
+
+    @override_settings(SHARED_CACHE=True)
+    def test_my_courses(self):
+        for user in (self.data.student, self.data.teacher):
+            with self.subTest(user=user):
+                response = self.assertBudget('GET', '/api/courses/mine/', queries=2, size=2_000, user=user)
+                self.assertTrue(response.data)
+                self.assertBudget('GET', '/api/courses/mine/', queries=1, size=2_000, user=user)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_my_courses_follow_enrollments(self):
+        student = self.data.student
+        response = self.assertBudget('GET', '/api/courses/mine/', queries=2, size=2_000, user=student)
+        course = Course.objects.get(pk=response.data[0]['id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            course.student.remove(student.pk)
+        response = self.assertBudget('GET', '/api/courses/mine/', queries=2, size=2_000, user=student)
+        self.assertNotIn(course.pk, [entry['id'] for entry in response.data])
+
+    def test_my_courses_without_shared_cache(self):
+        student = self.data.student
+        response = self.assertBudget('GET', '/api/courses/mine/', queries=2, size=2_000, user=student)
+        # Unenrolled on a worker whose invalidation cleared only its own cache.
+        course_id = response.data[0]['id']
+        Course.student.through.objects.filter(course_id=course_id, student_id=student.pk).delete()
+        response = self.assertBudget('GET', '/api/courses/mine/', queries=2, size=2_000, user=student)
+        self.assertNotIn(course_id, [entry['id'] for entry in response.data])
+
+    @override_settings(SHARED_CACHE=True)
+    def test_batch_timetable(self):
+        batch = self.data.batch.name
+        # One more query on the first request for the batch names.
+        self.assertBudget('GET', f'/api/courses/time-table/{batch}/', queries=3, size=60_000)
+        self.assertBudget('GET', f'/api/courses/time-table/{batch}/', queries=0, size=60_000)
+        self.assertBudget('GET', f'/api/courses/time-table/{batch}/?day=1', queries=2, size=15_000)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_batch_timetable_unknown_scope(self):
+        batch = self.data.batch.name
+        for url in ('/api/courses/time-table/ZZZZ/', '/api/courses/time-table/ZZZZ/week/',
+                    f'/api/courses/time-table/{batch}/?day=7', f'/api/courses/time-table/{batch}/?day=-1'):
+            with self.subTest(url=url):
+                self.assertBudget('GET', url, queries=1, size=100, status=404)
+        # Nothing was cached or versioned for the made-up scopes.
+        keys = [batch_key(COURSES, 'ZZZZ'), batch_key(COURSES, 'ZZZZ', WEEK), batch_key(COURSES, batch, 7)]
+        self.assertEqual(cache.get_many(keys + [versions.PREFIX + key for key in keys]), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Batch.objects.create(name='ZZZZ')
+        self.assertBudget('GET', '/api/courses/time-table/ZZZZ/', queries=3, size=100)
+
+    def test_batch_timetable_without_shared_cache(self):
+        url = f'/api/courses/time-table/{self.data.batch.name}/?day=1'
+        response = self.assertBudget('GET', url, queries=3, size=15_000)
+        # A write whose invalidation only reached another worker's cache.
+        timetable = TimeTable.objects.filter(batch=self.data.batch, day=1).first()
+        class_type = TimeTable.LAB if timetable.class_type == TimeTable.LECTURE else TimeTable.LECTURE
+        TimeTable.objects.filter(pk=timetable.pk).update(class_type=class_type)
+        response = self.assertBudget('GET', url, queries=3, size=15_000)
+        entry = next(entry for entry in response.data if entry['id'] == timetable.pk)
+        self.assertEqual(entry['class_type'], class_type)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_batch_timetable_conditional(self):
+        url = f'/api/courses/time-table/{self.data.batch.name}/?day=1'
+        response = self.assertBudget('GET', url, queries=3, size=15_000)
+        client = self.client_for()
+        client.credentials(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertBudget('GET', url, queries=0, size=0, client=client, status=304)
+
+        timetable = TimeTable.objects.filter(batch=self.data.batch, day=1).first()
+        timetable.class_type = TimeTable.LAB if timetable.class_type == TimeTable.LECTURE else TimeTable.LECTURE
+        with self.captureOnCommitCallbacks(execute=True):
+            timetable.save()
+        response = self.assertBudget('GET', url, queries=2, size=15_000, client=client)
+        entry = next(entry for entry in response.data if entry['id'] == timetable.pk)
+        self.assertEqual(entry['class_type'], timetable.class_type)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_batch_week(self):
+        url = f'/api/courses/time-table/{self.data.batch.name}/week/'
+        response = self.assertBudget('GET', url, queries=3, size=60_000)
+        client = self.client_for()
+        client.credentials(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertBudget('GET', url, queries=0, size=0, client=client, status=304)
+
+    def test_week_without_shared_cache(self):
+        teacher = self.data.teacher
+        weeks = (
+            (f'/api/courses/time-table/{self.data.batch.name}/week/', {}, {'batch': self.data.batch}),
+            ('/api/courses/time-table/teacher/week/',
+             {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(teacher)}'}, {'teacher_id': teacher.pk}),
+        )
+        for url, credentials, rows in weeks:
+            with self.subTest(url=url):
+                client = self.client_for()
+                client.credentials(**credentials)
+                response = self.assertBudget('GET', url, queries=3, size=60_000, client=client)
+                etag = response['ETag']
+                client.credentials(**credentials, HTTP_IF_NONE_MATCH=etag)
+                self.assertBudget('GET', url, queries=3, size=0, client=client, status=304)
+
+                timetable = TimeTable.objects.filter(**rows).first()
+                TimeTable.objects.filter(pk=timetable.pk).update(day=timetable.day % 7 + 1)
+                response = self.assertBudget('GET', url, queries=3, size=60_000, client=client)
+                self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_teacher_timetable(self):
+        teacher = self.data.teacher
+        self.assertBudget('GET', '/api/courses/time-table/teacher/', queries=3, size=10_000, user=teacher)
+        self.assertBudget('GET', '/api/courses/time-table/teacher/', queries=1, size=10_000, user=teacher)
+        self.assertBudget('GET', '/api/courses/time-table/teacher/week/', queries=3, size=10_000, user=teacher)
+
+    def test_teacher_timetable_needs_a_teacher(self):
+        for url in ('/api/courses/time-table/teacher/', '/api/courses/time-table/teacher/week/'):
+            with self.subTest(url=url):
+                self.assertBudget('GET', url, queries=0, size=200, status=401)
+                self.assertBudget('GET', url, queries=1, size=200, user=self.data.student, status=403)
+
+    def test_projections(self):
+        TimeTable.objects.filter(pk=TimeTable.objects.order_by('pk').values('pk')[:1]).update(teacher=None)
+        courses = Course.objects.order_by('pk')
+        self.assertSameRepresentation(CourseProjection(courses, many=True), CourseSerializer(courses, many=True))
+        timetables = TimeTable.objects.order_by('pk')
+        self.assertSameRepresentation(
+            TimeTableProjection(timetables, many=True),
+            TimeTableSerializer(
+                timetables.select_related('course', 'teacher__user').prefetch_related('batch'), many=True))
+
+
+class FindConflictsTests(TestCase):
+    def test_overlaps(self):
+        slots = [
+            ('t1', 1, 9, 10, 'a'),
+            ('t1', 1, 10, 11, 'b'),  # touching is fine
+            ('t1', 1, 9, 12, 'c'),  # overlaps a and b
+            ('t1', 2, 9, 10, 'd'),  # another day
+            ('t2', 1, 9, 10, 'e'),  # another resource
+        ]
+        self.assertEqual(sorted(find_conflicts(slots)), [('t1', 1, 'a', 'c'), ('t1', 1, 'c', 'b')])
+
+    def test_no_overlaps(self):
+        self.assertEqual(find_conflicts([('t1', 1, 9, 10, 'a'), ('t1', 1, 10, 11, 'b')]), [])
+
+
+class TimetableImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(name='Physics', code='PH101')
+        Batch.objects.create(name='A1')
+        Batch.objects.create(name='A2')
+        Teacher.objects.create(user=User.objects.create_user('T1', 'Teacher', 'x', user_type=User.TEACHER))
+
+    def row(self, **fields):
+        return {'course': 'PH101', 'class_type': 'lecture', 'day': 1, 'start_time': '09:00',
+                'end_time': '10:00', 'teacher': 'T1', 'batches': ['A1'], **fields}
+
+    def test_import_and_export(self):
+        rows = [self.row(), self.row(day='Tuesday', batches=['A1', 'A2'], teacher=None)]
+        self.assertEqual(TimetableImporter().run(rows), 2)
+        exported = list(export_rows())
+        self.assertEqual([row['batches'] for row in exported], [['A1'], ['A1', 'A2']])
+        self.assertEqual([row['day'] for row in exported], [1, 2])
+        self.assertEqual(exported[0]['start_time'], '09:00:00')
+
+    def test_backend_without_returned_pks(self):
+        TimetableImporter().run([self.row()])
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            rows = [self.row(day=2), self.row(day=2, batches=['A2'], teacher=None), self.row(day=3)]
+            self.assertEqual(TimetableImporter().run(rows), 3)
+        self.assertEqual(
+            list(TimeTable.objects.order_by('pk').values_list('day', 'batch__name'))[1:],
+            [(2, 'A1'), (2, 'A2'), (3, 'A1')])
+
+    def test_duplicate_batches(self):
+        self.assertEqual(TimetableImporter().run([self.row(batches=['A1', 'A1'])]), 1)
+        self.assertEqual(TimeTable.batch.through.objects.count(), 1)
+
+    def test_bad_rows(self):
+        rows = [self.row(), ['PH101'], self.row(batches='A1'), self.row(course='XX'), self.row(end_time='08:00')]
+        with self.assertRaises(ValidationError) as raised:
+            TimetableImporter().run(rows)
+        self.assertEqual([message.split(':')[0] for message in raised.exception.messages],
+                         ['row 2', 'row 3', 'row 4', 'row 5'])
+        self.assertFalse(TimeTable.objects.exists())
+
+    def test_unreadable_input(self):
+        stream = io.StringIO('{"course": "PH101"}\n{"course": \n')
+        with self.assertRaises(ValidationError) as raised:
+            TimetableImporter().run(read_rows(stream, 'jsonl'))
+        self.assertEqual([message.split(':')[0] for message in raised.exception.messages], ['row 1', 'row 2'])
+        self.assertIn('unreadable input', raised.exception.messages[1])
+
+        stream = io.TextIOWrapper(io.BytesIO(b'course,day\n\xff,1\n'), encoding='utf-8', newline='')
+        with self.assertRaises(ValidationError) as raised:
+            TimetableImporter().run(read_rows(stream, 'csv'))
+        self.assertIn('row 1: unreadable input', raised.exception.messages[0])
+
+    def test_conflicts(self):
+        TimetableImporter().run([self.row()])
+        with self.assertRaises(ValidationError) as raised:
+            TimetableImporter().run([self.row(start_time='09:30', end_time='10:30', teacher=None)])
+        self.assertIn('batch A1 on Monday', raised.exception.messages[0])
+        self.assertEqual(TimeTable.objects.count(), 1)
+        self.assertEqual(TimetableImporter(allow_conflicts=True).run([self.row(start_time='09:30')]), 1)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_replace(self):
+        TimetableImporter().run([self.row()])
+        key = batch_key(COURSES, 'A1')
+        get_or_build(key, lambda: ['cached'])
+        with self.captureOnCommitCallbacks(execute=True):
+            TimetableImporter(replace=True).run([self.row(day=3, batches=['A2'])])
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(list(TimeTable.objects.values_list('day', 'batch__name')), [(3, 'A2')])
+        self.assertEqual(TimeTable.batch.through.objects.count(), 1)
+
+    def test_replace_queries(self):
+        TimetableImporter().run([self.row(day=day) for day in range(7)])
+        importer = TimetableImporter(replace=True)
+        # The replaced rows' keys are found once, not once per deleted row.
+        with self.assertNumQueries(8):
+            importer.run([self.row()])
+        self.assertEqual(TimeTable.objects.count(), 1)
+
+    def test_admin_replace_needs_delete_permission(self):
+        TimetableImporter().run([self.row()])
+        staff = User.objects.create_user('STAFF', 'Staff', 'x', is_staff=True)
+        staff.user_permissions.add(*Permission.objects.filter(codename__in=['add_timetable', 'view_timetable']))
+        self.client.force_login(staff)
+
+        def upload():
+            return self.client.post('/admin/courses/timetable/import/', {
+                'file': SimpleUploadedFile('timetable.jsonl', b'{"course": "PH101", "class_type": "lecture", '
+                                           b'"day": 3, "start_time": "09:00", "end_time": "10:00", "batches": ["A2"]}'),
+                'replace': 'on',
+            })
+
+        response = upload()
+        self.assertIn('needs permission to delete', str(list(response.context['messages'])[0]))
+        self.assertEqual(TimeTable.objects.count(), 1)
+
+        staff.user_permissions.add(Permission.objects.get(codename='delete_timetable'))
+        self.assertRedirects(upload(), '/admin/courses/timetable/')
+        self.assertEqual(list(TimeTable.objects.values_list('day', flat=True)), [3])
+
+    def test_admin_unreadable_file(self):
+        self.client.force_login(User.objects.create_superuser('ADMIN', 'Admin', 'x'))
+        response = self.client.post('/admin/courses/timetable/import/', {
+            'file': SimpleUploadedFile('timetable.json', b'[{"course": '),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('row 1: unreadable input', str(list(response.context['messages'])[0]))
+
+
+class TimetableCacheTests(TestCase):
+    key = batch_key(COURSES, 'A1')
+
+    def setUp(self):
+        cache.clear()
+
+    def builds(self):
+        count = 0
+
+        def build():
+            nonlocal count
+            count += 1
+            return count
+        return build
+
+    def test_uncached_without_shared_cache(self):
+        build = self.builds()
+        self.assertEqual([get_or_build(self.key, build) for _ in range(2)], [1, 2])
+
+    @override_settings(SHARED_CACHE=True)
+    def test_cached_until_invalidated(self):
+        build = self.builds()
+        self.assertEqual([get_or_build(self.key, build) for _ in range(2)], [1, 1])
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate([self.key])
+        self.assertEqual(get_or_build(self.key, build), 2)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_invalidation_during_build(self):
+        def build():
+            # The rows were read; a write commits before the payload is cached.
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate([self.key])
+            return 'stale'
+        self.assertEqual(get_or_build(self.key, build), 'stale')
+        self.assertEqual(get_or_build(self.key, lambda: 'fresh'), 'fresh')
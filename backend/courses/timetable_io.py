@@ -0,0 +1,275 @@
+"""
+Bulk timetable import and export.
+
+Rows are flat records identifying related objects by natural key::
+
+    course,class_type,day,start_time,end_time,teacher,batches
+    CS101,lecture,1,09:00,10:00,T00000001,A1;A2
+
+``teacher`` is the teacher's enrollment number and ``batches`` a ``;``
+separated list of batch names (a list in JSON). Imports are validated and
+checked for overlapping slots up front, then written with ``bulk_create`` in a
+single transaction.
+"""
+import csv
+import json
+from collections import defaultdict
+from datetime import time
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from base.models import Batch
+from users.models import Teacher
+
+from .cache import invalidate, keys_for, keys_for_timetables
+from .models import Course, TimeTable
+from .signals import bulk_timetable_delete
+
+FIELDS = ['course', 'class_type', 'day', 'start_time', 'end_time', 'teacher', 'batches']
+FORMATS = ('csv', 'json', 'jsonl')
+
+DAYS = {label.lower(): value for value, label in TimeTable.DAY_CHOICES}
+CLASS_TYPES = {value for value, _ in TimeTable.CLASS_TYPE_CHOICES}
+
+
+def read_rows(stream, format):
+    """Yield row dicts from a text stream without loading CSV/JSONL input whole."""
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            row['batches'] = [name.strip() for name in (row.get('batches') or '').split(';') if name.strip()]
+            yield row
+    elif format == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif format == 'json':
+        yield from json.load(stream)
+    else:
+        raise ValueError(f'Unknown format {format!r}')
+
+
+def export_rows(queryset=None):
+    """Yield every timetable row in ``queryset`` using two queries in total."""
+    if queryset is None:
+        queryset = TimeTable.objects.all()
+
+    batches = defaultdict(list)
+    through = TimeTable.batch.through.objects.filter(timetable__in=queryset)
+    for timetable_id, name in through.values_list('timetable_id', 'batch__name'):
+        batches[timetable_id].append(name)
+
+    rows = queryset.order_by('day', 'start_time', 'pk').values_list(
+        'pk', 'course__code', 'class_type', 'day', 'start_time', 'end_time', 'teacher__user__enrollment_number')
+    for pk, course, class_type, day, start_time, end_time, teacher in rows.iterator():
+        yield {
+            'course': course,
+            'class_type': class_type,
+            'day': day,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'teacher': teacher,
+            'batches': sorted(batches[pk]),
+        }
+
+
+def write_rows(rows, stream, format):
+    if format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'batches': ';'.join(row['batches']), 'teacher': row['teacher'] or ''})
+    elif format == 'jsonl':
+        for row in rows:
+            stream.write(json.dumps(row) + '\n')
+    elif format == 'json':
+        json.dump(list(rows), stream, indent=2)
+    else:
+        raise ValueError(f'Unknown format {format!r}')
+
+
+def find_conflicts(slots):
+    """
+    Find overlapping intervals among ``(resource, day, start, end, label)``
+    slots, where a resource is a teacher or a batch.
+
+    Slots are grouped per resource and day, then swept in start order while
+    tracking the slot that ends last so far; anything starting before that end
+    overlaps it. This is O(n log n) rather than a pairwise comparison.
+    """
+    grouped = defaultdict(list)
+    for resource, day, start, end, label in slots:
+        grouped[(resource, day)].append((start, end, label))
+
+    conflicts = []
+    for (resource, day), intervals in grouped.items():
+        intervals.sort(key=lambda interval: (interval[0], interval[1]))
+        latest_end = latest_label = None
+        for start, end, label in intervals:
+            if latest_end is not None and start < latest_end:
+                conflicts.append((resource, day, latest_label, label))
+            if latest_end is None or end > latest_end:
+                latest_end, latest_label = end, label
+    return conflicts
+
+
+def _parse_time(value):
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(str(value).strip())
+
+
+def _parse_day(value):
+    value = str(value).strip()
+    if value.lower() in DAYS:
+        return DAYS[value.lower()]
+    day = int(value)
+    if day not in DAYS.values():
+        raise ValueError(f'invalid day {value!r}')
+    return day
+
+
+class TimetableImporter:
+    def __init__(self, replace=False, allow_conflicts=False, batch_size=1000):
+        self.replace = replace
+        self.allow_conflicts = allow_conflicts
+        self.batch_size = batch_size
+        self.courses = dict(Course.objects.values_list('code', 'pk'))
+        self.teachers = dict(Teacher.objects.values_list('user__enrollment_number', 'pk'))
+        self.batches = dict(Batch.objects.values_list('name', 'pk'))
+        self.course_codes = {pk: code for code, pk in self.courses.items()}
+        self.teacher_numbers = {pk: number for number, pk in self.teachers.items()}
+
+    def build(self, row):
+        if not isinstance(row, dict):
+            raise ValueError(f'expected an object, got {type(row).__name__}')
+        course = self.courses.get(row.get('course'))
+        if course is None:
+            raise ValueError(f'unknown course {row.get("course")!r}')
+
+        teacher = None
+        if row.get('teacher'):
+            teacher = self.teachers.get(row['teacher'])
+            if teacher is None:
+                raise ValueError(f'unknown teacher {row["teacher"]!r}')
+
+        class_type = row.get('class_type')
+        if class_type not in CLASS_TYPES:
+            raise ValueError(f'invalid class_type {class_type!r}')
+
+        batch_names = row.get('batches') or []
+        if not isinstance(batch_names, list):
+            raise ValueError('batches must be a list of batch names')
+        # Listing a batch twice would insert the same through row twice.
+        batch_names = list(dict.fromkeys(batch_names))
+        if not batch_names:
+            raise ValueError('at least one batch is required')
+        unknown = [name for name in batch_names if name not in self.batches]
+        if unknown:
+            raise ValueError(f'unknown batches {", ".join(unknown)}')
+
+        start_time = _parse_time(row.get('start_time'))
+        end_time = _parse_time(row.get('end_time'))
+        if start_time >= end_time:
+            raise ValueError('end_time must be after start_time')
+
+        timetable = TimeTable(
+            course_id=course,
+            teacher_id=teacher,
+            class_type=class_type,
+            day=_parse_day(row.get('day')),
+            start_time=start_time,
+            end_time=end_time,
+        )
+        return timetable, batch_names
+
+    def slots(self, entries):
+        for line, (timetable, batch_names) in entries:
+            label = f'row {line} ({self.course_codes[timetable.course_id]} {timetable.start_time}-{timetable.end_time})'
+            if timetable.teacher_id is not None:
+                teacher = self.teacher_numbers[timetable.teacher_id]
+                yield ('teacher', teacher), timetable.day, timetable.start_time, timetable.end_time, label
+            for name in batch_names:
+                yield ('batch', name), timetable.day, timetable.start_time, timetable.end_time, label
+
+        if self.replace:
+            return
+        # One row per (timetable, batch); a timetable's teacher slot must only
+        # be counted once or it would overlap itself.
+        seen = set()
+        existing = TimeTable.objects.values_list(
+            'pk', 'course__code', 'day', 'start_time', 'end_time', 'teacher__user__enrollment_number', 'batch__name')
+        for pk, course, day, start_time, end_time, teacher, batch_name in existing.iterator():
+            label = f'existing #{pk} ({course} {start_time}-{end_time})'
+            if teacher is not None and pk not in seen:
+                seen.add(pk)
+                yield ('teacher', teacher), day, start_time, end_time, label
+            if batch_name is not None:
+                yield ('batch', batch_name), day, start_time, end_time, label
+
+    def run(self, rows):
+        """
+        Validate, conflict-check and insert ``rows``; returns the number of
+        timetable rows created. Raises ``ValidationError`` listing every bad
+        row or overlapping slot, in which case nothing is written. Input that
+        cannot be parsed at all is reported the same way.
+        """
+        entries, errors = [], []
+        line = 0
+        try:
+            for line, row in enumerate(rows, start=1):
+                try:
+                    entries.append((line, self.build(row)))
+                except (ValueError, TypeError) as e:
+                    errors.append(f'row {line}: {e}')
+        except (json.JSONDecodeError, UnicodeDecodeError, csv.Error) as e:
+            # Raised by read_rows while reading the row after the last one.
+            raise ValidationError(errors + [f'row {line + 1}: unreadable input: {e}'])
+        if errors:
+            raise ValidationError(errors)
+
+        conflicts = find_conflicts(self.slots(entries))
+        if conflicts and not self.allow_conflicts:
+            raise ValidationError([
+                f'{kind} {name} on {TimeTable.DAY_CHOICES[day][1]}: {first} overlaps {second}'
+                for (kind, name), day, first, second in conflicts
+            ])
+
+        Through = TimeTable.batch.through
+        with transaction.atomic():
+            if self.replace:
+                # The keys of every replaced row are found with one query,
+                # rather than one per row by the pre_delete receiver.
+                replaced = TimeTable.objects.all()
+                keys = keys_for_timetables(replaced)
+                with bulk_timetable_delete():
+                    replaced.delete()
+                invalidate(keys)
+
+            timetables = [timetable for _, (timetable, _) in entries]
+            returns_pks = connections[router.db_for_write(TimeTable)].features.can_return_rows_from_bulk_insert
+            if not returns_pks:
+                last_pk = TimeTable.objects.aggregate(last=Max('pk'))['last'] or 0
+            TimeTable.objects.bulk_create(timetables, batch_size=self.batch_size)
+            if not returns_pks:
+                # Not every backend returns primary keys from bulk inserts and
+                # timetable rows have no natural key to find them by. Those
+                # that don't (SQLite before 3.35) hold the write lock until
+                # commit and never reuse ids, so the new rows are the ones
+                # after last_pk, numbered in insertion order.
+                new_pks = TimeTable.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)
+                for timetable, pk in zip(timetables, new_pks):
+                    timetable.pk = pk
+            Through.objects.bulk_create([
+                Through(timetable_id=timetable.pk, batch_id=self.batches[name])
+                for _, (timetable, batch_names) in entries
+                for name in batch_names
+            ], batch_size=self.batch_size)
+
+            invalidate(keys_for(
+                {name for _, (_, batch_names) in entries for name in batch_names},
+                {timetable.teacher_id for timetable in timetables},
+                {timetable.day for timetable in timetables},
+            ))
+        return len(timetables)
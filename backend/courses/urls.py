@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('', views.courseList),
+    path('mine/', views.myCourses, name='my_courses'),
+    path('time-table/teacher/', views.get_teacher_timetable, name='teacher_timetable'),
+    path('time-table/teacher/week/', views.get_teacher_week_timetable, name='teacher_week_timetable'),
     path('time-table/<str:batch>/', views.get_timetable, name='timetable'),
-      path('time-table/teacher/', views.get_teacher_timetable, name='teacher_timetable'),
+    path('time-table/<str:batch>/week/', views.get_week_timetable, name='week_timetable'),
 ]
\ No newline at end of file
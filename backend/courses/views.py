@@ -1,89 +1,164 @@
+import logging
+
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes 
 from rest_framework import status
-# from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated
+
+from lms import tracing
+from lms.replicas import read_replica
+from lms.versions import model_scope, versioned_response
 
-from .serializers import CourseSerializer, TimeTableSerializer
+from users.models import User
+
+from .cache import COURSES, DAYS, WEEK, batch_exists, batch_key, cached_response, teacher_key, user_courses_key
 from .models import Course, TimeTable
+from .projections import CourseProjection, TimeTableProjection
+
+logger = logging.getLogger(__name__)
+
+
+def build_week(queryset):
+    """Serialize a whole week from one queryset, grouped by day."""
+    days = {str(day): [] for day, _ in TimeTable.DAY_CHOICES}
+    with tracing.span('serialize'):
+        entries = TimeTableProjection(queryset, many=True).data
+    for entry in entries:
+        days[str(entry['day'])].append(entry)
+    return days
+
+
+def not_a_teacher():
+    return Response({"detail": "Not a teacher account"}, status=status.HTTP_403_FORBIDDEN)
+
+
+def unknown_day():
+    return Response({"detail": "Unknown day"}, status=status.HTTP_404_NOT_FOUND)
+
+
+def unknown_batch():
+    return Response({"detail": "Unknown batch"}, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['GET'])
 # @permission_classes([IsAuthenticated])
+@read_replica
 def courseList(request):
    user = request.user
-   courses = Course.objects.all()
-   serializer = CourseSerializer(courses, many=True)
-   return Response(serializer.data)
+   return versioned_response(
+       request, [model_scope(Course)], lambda: CourseProjection(Course.objects.all(), many=True).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
+def myCourses(request):
+    user = request.user
+
+    def build():
+        if user.user_type == User.TEACHER:
+            courses = Course.objects.filter(course_timetables__teacher_id=user.pk).distinct()
+        else:
+            # A student shares its primary key with its user, so this is a
+            # lookup on the enrollment table's student index.
+            courses = Course.objects.filter(student=user.pk)
+        return CourseProjection(courses.order_by('code', 'pk'), many=True).data
+
+    return cached_response(request, user_courses_key(user.pk, user.user_type), build)
 
 @api_view(['GET'])
+@read_replica
 def get_timetable(request, batch):
     try:
         day = request.GET.get('day')
-        print(f"\n--- Timetable Request ---")
-        print(f"Batch requested: {batch}")
-        print(f"Day requested: {day}")
-        
-        # Debug: Print all batches in system
-        all_batches = Batch.objects.all()
-        print("\nAll batches in system:")
-        for b in all_batches:
-            print(f"- {b.name}")
-        
-        # Get timetables
-        queryset = TimeTable.objects.filter(batch__name=batch)
-        print(f"\nFound {queryset.count()} timetable entries for batch {batch}")
-        
+        tracing.annotate(batch=batch, day=day)
+
         if day is not None:
             try:
                 day = int(day)
-                queryset = queryset.filter(day=day)
-                print(f"After day filter: {queryset.count()} entries")
             except ValueError:
                 return Response(
                     {"detail": "Invalid day parameter"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-        
-        # Debug: Print found timetables
-        print("\nMatching timetables:")
-        for tt in queryset:
-            print(f"- {tt.course.name} ({tt.class_type}) on {tt.get_day_display()} at {tt.start_time}-{tt.end_time}")
-        
-        serializer = TimeTableSerializer(queryset, many=True)
-        return Response(serializer.data)
+            if day not in DAYS:
+                return unknown_day()
+        if not batch_exists(batch):
+            return unknown_batch()
+
+        def build():
+            queryset = TimeTable.objects.filter(batch__name=batch)
+            if day is not None:
+                queryset = queryset.filter(day=day)
+            with tracing.span('serialize'):
+                return TimeTableProjection(queryset, many=True).data
+
+        return cached_response(request, batch_key(COURSES, batch, day), build)
 
     except Exception as e:
-        print(f"Error in get_timetable: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_timetable")
         return Response(
             {"detail": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 @api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
 def get_teacher_timetable(request):
+   if request.user.user_type != User.TEACHER:
+       return not_a_teacher()
    try:
        day = request.GET.get('day')
-       teacher = request.user.teacher
-       
-       queryset = TimeTable.objects.filter(teacher=teacher)
-       
+       tracing.annotate(day=day)
+
        if day is not None:
            try:
                day = int(day)
-               queryset = queryset.filter(day=day)
            except ValueError:
                return Response(
                    {"detail": "Invalid day parameter"},
                    status=status.HTTP_400_BAD_REQUEST
                )
-       
-       serializer = TimeTableSerializer(queryset, many=True)
-       return Response(serializer.data)
+           if day not in DAYS:
+               return unknown_day()
+
+       def build():
+           queryset = TimeTable.objects.filter(teacher_id=request.user.pk)
+           if day is not None:
+               queryset = queryset.filter(day=day)
+           with tracing.span('serialize'):
+               return TimeTableProjection(queryset, many=True).data
+
+       # A teacher shares its primary key with its user, so neither the cache
+       # nor the query needs the teacher row.
+       return cached_response(request, teacher_key(COURSES, request.user.pk, day), build)
 
    except Exception as e:
-       print(f"Error in get_teacher_timetable: {str(e)}")
+       logger.exception("Error in get_teacher_timetable")
        return Response(
            {"detail": str(e)},
            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-       )
\ No newline at end of file
+       )
+
+@api_view(['GET'])
+@read_replica
+def get_week_timetable(request, batch):
+    if not batch_exists(batch):
+        return unknown_batch()
+    return cached_response(
+        request,
+        batch_key(COURSES, batch, WEEK),
+        lambda: build_week(TimeTable.objects.filter(batch__name=batch)),
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
+def get_teacher_week_timetable(request):
+    if request.user.user_type != User.TEACHER:
+        return not_a_teacher()
+    return cached_response(
+        request,
+        teacher_key(COURSES, request.user.pk, WEEK),
+        lambda: build_week(TimeTable.objects.filter(teacher_id=request.user.pk)),
+    )
\ No newline at end of file
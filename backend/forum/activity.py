@@ -0,0 +1,62 @@
+"""
+Denormalized ``Post.comment_count`` and ``Post.last_activity_at``.
+
+Both are changed with single ``UPDATE`` statements from the comment signal
+handlers, so they commit or roll back together with the comment itself and
+concurrent comments never overwrite each other's counts. ``reconcile``
+recomputes them from the comments table to repair any drift (rows changed
+with raw SQL or ``QuerySet.update``, for instance).
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Post
+
+
+def _comments():
+    return Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+
+
+def _activity():
+    """A post's last activity: its newest comment, or the post itself."""
+    latest = Subquery(_comments().annotate(latest=Max('date_posted')).values('latest')[:1])
+    return Greatest(F('date_posted'), Coalesce(latest, F('date_posted')))
+
+
+def comment_added(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=F('comment_count') + 1,
+        last_activity_at=Greatest(F('last_activity_at'), Value(comment.date_posted)),
+    )
+
+
+def comment_removed(comment):
+    # A drifted count stays at 0, but the activity is recomputed regardless.
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, Value(0)),
+        last_activity_at=_activity(),
+    )
+
+
+def reconcile(chunk_size=1000):
+    """
+    Recompute both fields for every post, ``chunk_size`` posts per
+    transaction, writing only rows that drifted. Returns how many were fixed.
+    """
+    count = Subquery(_comments().annotate(total=Count('pk')).values('total')[:1])
+    fixed = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            pks = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return fixed
+            drifted = Post.objects.filter(pk__in=pks).annotate(
+                actual_count=Coalesce(count, 0),
+                actual_activity=_activity(),
+            ).filter(~Q(comment_count=F('actual_count')) | ~Q(last_activity_at=F('actual_activity')))
+            for pk, actual_count, actual_activity in drifted.values_list('pk', 'actual_count', 'actual_activity'):
+                Post.objects.filter(pk=pk).update(comment_count=actual_count, last_activity_at=actual_activity)
+                fixed += 1
+        last_pk = pks[-1]
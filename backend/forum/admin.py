@@ -2,4 +2,11 @@ from django.contrib import admin
 from .models import Post, Comment
 
 admin.site.register(Post)
-admin.site.register(Comment)
+
+
+class CommentAdmin(admin.ModelAdmin):
+    # A comment's name includes its author's.
+    list_select_related = ('user',)
+
+
+admin.site.register(Comment, CommentAdmin)
@@ -0,0 +1,95 @@
+"""
+Post likes.
+
+``PostLike`` rows record who liked what, so liking twice or unliking a post
+that was never liked changes nothing. The counter shown to clients is
+``Post.likes``:
+
+* With ``FORUM_LIKE_SHARDS = 0`` each like bumps ``Post.likes`` in place with
+  an ``F()`` expression. Fine for SQLite, which serializes writers anyway.
+* With ``FORUM_LIKE_SHARDS = n`` a like adds to one of ``n`` ``PostLikeDelta``
+  rows picked at random, so a post being liked hundreds of times a second
+  doesn't queue every transaction on its one row. ``fold`` (run by
+  ``manage.py fold_likes``) periodically moves the deltas into ``Post.likes``.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import Post, PostLike, PostLikeDelta
+
+
+def _add(post_id, delta):
+    shards = settings.FORUM_LIKE_SHARDS
+    if not shards:
+        Post.objects.filter(pk=post_id).update(likes=F('likes') + delta)
+        return
+
+    shard = random.randrange(shards)
+    if PostLikeDelta.objects.filter(post_id=post_id, shard=shard).update(delta=F('delta') + delta):
+        return
+    try:
+        with transaction.atomic():
+            PostLikeDelta.objects.create(post_id=post_id, shard=shard, delta=delta)
+    except IntegrityError:
+        # Another like created the shard row first.
+        PostLikeDelta.objects.filter(post_id=post_id, shard=shard).update(delta=F('delta') + delta)
+
+
+def like_count(post_id):
+    """``Post.likes`` including deltas not folded in yet."""
+    likes = Post.objects.filter(pk=post_id).values_list('likes', flat=True).first() or 0
+    if settings.FORUM_LIKE_SHARDS:
+        likes += PostLikeDelta.objects.filter(post_id=post_id).aggregate(total=Sum('delta'))['total'] or 0
+    return likes
+
+
+@transaction.atomic
+def like(post_id, user_id):
+    """Like a post; returns False if the user already liked it."""
+    try:
+        with transaction.atomic():
+            PostLike.objects.create(post_id=post_id, user_id=user_id)
+    except IntegrityError:
+        return False
+    _add(post_id, 1)
+    return True
+
+
+@transaction.atomic
+def unlike(post_id, user_id):
+    """Remove a like; returns False if there was none."""
+    deleted, _ = PostLike.objects.filter(post_id=post_id, user_id=user_id).delete()
+    if not deleted:
+        return False
+    _add(post_id, -1)
+    return True
+
+
+def fold(batch_size=1000):
+    """
+    Move pending deltas into ``Post.likes``, ``batch_size`` delta rows per
+    transaction. Returns the number of posts updated.
+    """
+    updated = 0
+    while True:
+        with transaction.atomic():
+            # Locked, so no like can change them between reading and deleting.
+            rows = list(PostLikeDelta.objects.select_for_update().order_by('pk').values_list(
+                'pk', 'post_id', 'delta')[:batch_size])
+            if not rows:
+                return updated
+            totals = defaultdict(int)
+            for _, post_id, delta in rows:
+                totals[post_id] += delta
+            totals = {post_id: total for post_id, total in totals.items() if total}
+            if totals:
+                Post.objects.filter(pk__in=totals).update(likes=F('likes') + Case(
+                    *(When(pk=post_id, then=Value(total)) for post_id, total in totals.items()),
+                    default=Value(0),
+                ))
+            PostLikeDelta.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+        updated += len(totals)
@@ -0,0 +1,89 @@
+import json
+import statistics
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from forum.models import Comment, Post
+from users.models import User
+
+BENCH_USER = 'BENCHDB01'
+
+
+class Command(BaseCommand):
+    help = ('Measure concurrent write throughput: THREADS workers each create a post with a '
+            'comment in one transaction, like the forum views do. Run it once per DB_ENGINE '
+            'to compare backends. Rows are deleted afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Transactions per thread.')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--json', action='store_true', dest='as_json')
+
+    def handle(self, threads=8, writes=200, database='default', as_json=False, **options):
+        user, _ = User.objects.using(database).get_or_create(
+            enrollment_number=BENCH_USER,
+            defaults={'first_name': 'Bench', 'password': make_password(None)},
+        )
+        try:
+            report = self.run(database, user, threads, writes)
+        finally:
+            user.delete()
+
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f'{report["vendor"]}: {report["transactions"]} transactions from {threads} threads in '
+            f'{report["seconds"]:.2f}s ({report["per_second"]:.0f}/s), p50 {report["p50_ms"]:.1f}ms, '
+            f'p95 {report["p95_ms"]:.1f}ms, {report["errors"]} failed')
+
+    def run(self, database, user, threads, writes):
+        timings, errors = [], []
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def worker():
+            local_timings, local_errors = [], []
+            try:
+                start.wait()
+                for i in range(writes):
+                    began = time.perf_counter()
+                    try:
+                        with transaction.atomic(using=database):
+                            post = Post.objects.using(database).create(user=user, title=f'bench {i}', text='bench')
+                            Comment.objects.using(database).create(user=user, post=post, text='bench')
+                    except OperationalError as e:
+                        local_errors.append(str(e))
+                        continue
+                    local_timings.append((time.perf_counter() - began) * 1000)
+            finally:
+                connections[database].close()
+                with lock:
+                    timings.extend(local_timings)
+                    errors.extend(local_errors)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        began = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else (timings or [0]) * 99
+        return {
+            'vendor': connections[database].vendor,
+            'threads': threads,
+            'transactions': len(timings),
+            'errors': len(errors),
+            'first_error': errors[0] if errors else None,
+            'seconds': round(elapsed, 3),
+            'per_second': round(len(timings) / max(elapsed, 1e-9), 1),
+            'p50_ms': round(quantiles[49], 2),
+            'p95_ms': round(quantiles[94], 2),
+        }
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forum.likes import fold
+
+
+class Command(BaseCommand):
+    help = 'Fold pending sharded like counts into Post.likes (see FORUM_LIKE_SHARDS).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Repeat every INTERVAL seconds instead of exiting.')
+
+    def handle(self, batch_size=1000, interval=0, **options):
+        while True:
+            updated = fold(batch_size)
+            if not interval:
+                self.stdout.write(f'Updated like counts of {updated} posts')
+                return
+            time.sleep(interval)
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forum.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the forum full-text search index from all posts and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, chunk_size=1000, **options):
+        started = time.perf_counter()
+        total = rebuild(chunk_size, progress=lambda done: self.stdout.write(f'{done} rows indexed', ending='\r'))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {total} posts and comments in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s)'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forum.activity import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute every post's comment_count and last_activity_at from its comments, fixing drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, chunk_size=1000, **options):
+        started = time.perf_counter()
+        fixed = reconcile(chunk_size)
+        self.stdout.write(f'Fixed {fixed} posts in {time.perf_counter() - started:.2f}s')
@@ -0,0 +1,80 @@
+from django.db import migrations
+
+# Frozen copies of forum.search's DDL and document ids as of this migration;
+# later changes to forum.search must not change what this migration does.
+CREATE_SQL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE forum_search USING fts5("
+        "title, body, kind UNINDEXED, object_id UNINDEXED, post_id UNINDEXED, "
+        "tokenize = 'porter unicode61')",
+    ],
+    'postgresql': [
+        "CREATE TABLE forum_search ("
+        "doc_id bigint PRIMARY KEY, kind varchar(7) NOT NULL, object_id bigint NOT NULL, "
+        "post_id bigint NOT NULL, title text NOT NULL, body text NOT NULL, "
+        "document tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', title), 'A') || "
+        "setweight(to_tsvector('english', body), 'B')) STORED)",
+        'CREATE INDEX forum_search_document_idx ON forum_search USING GIN (document)',
+    ],
+}
+
+INSERT_SQL = {
+    'sqlite': 'INSERT INTO forum_search (rowid, kind, object_id, post_id, title, body) '
+              'VALUES (%s, %s, %s, %s, %s, %s)',
+    'postgresql': 'INSERT INTO forum_search (doc_id, kind, object_id, post_id, title, body) '
+                  'VALUES (%s, %s, %s, %s, %s, %s)',
+}
+
+CHUNK_SIZE = 1000
+
+
+def create_index(apps, schema_editor):
+    # Other databases search without a table (forum.search.FallbackIndex).
+    for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE IF EXISTS forum_search')
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('forum', 'Post')
+    Comment = apps.get_model('forum', 'Comment')
+    connection = schema_editor.connection
+    if connection.vendor not in INSERT_SQL:
+        return
+    alias = connection.alias
+    sources = [
+        (Post.objects.using(alias).order_by('pk').values_list('pk', 'title', 'text'),
+         lambda pk, title, text: (pk * 2, 'post', pk, pk, title, text or '')),
+        (Comment.objects.using(alias).order_by('pk').values_list('pk', 'post_id', 'text'),
+         lambda pk, post_id, text: (pk * 2 + 1, 'comment', pk, post_id, '', text or '')),
+    ]
+    for queryset, make_row in sources:
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+            if not chunk:
+                break
+            with connection.cursor() as cursor:
+                cursor.executemany(INSERT_SQL[connection.vendor], [make_row(*values) for values in chunk])
+            last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+    """
+    The search table is FTS5 on SQLite and tsvector + GIN on PostgreSQL, so it
+    is created with backend specific SQL (mirroring forum.search) rather than
+    as a model.
+    """
+
+    dependencies = [
+        ('forum', '0006_post_likes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
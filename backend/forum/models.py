@@ -1,17 +1,41 @@
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
 from users.models import User
 
 
+def feed_preview(comment_limit):
+    """Comments among their post's latest ``comment_limit``, newest first."""
+    latest = Comment.objects.filter(
+        post=OuterRef('post')
+    ).order_by('-date_posted', '-id').values('pk')[:comment_limit]
+    return Comment.objects.filter(pk__in=Subquery(latest)).order_by('-date_posted', '-id')
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200, blank=False)
     text = models.TextField(max_length=500, blank=True)
     likes = models.PositiveIntegerField(default=0)
-    date_posted = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so save() can start last_activity_at at the same instant.
+    date_posted = models.DateTimeField(default=timezone.now, editable=False, blank=True)
+    # Maintained from comment signals (forum/activity.py); repaired by the
+    # reconcile_post_activity command.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user")
 
     class Meta:
         ordering = ['-date_posted']
+        indexes = [
+            models.Index(fields=['-date_posted', '-id'], name='forum_post_feed_idx'),
+            models.Index(fields=['-last_activity_at', '-id'], name='forum_post_activity_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.last_activity_at = self.date_posted
+        super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return f'{self.title[:40]}{"..." if (len(self.title) > 40) else ""}'
@@ -25,6 +49,37 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-date_posted']
+        indexes = [
+            models.Index(fields=['post', '-date_posted', '-id'], name='forum_comment_post_date_idx'),
+        ]
 
     def __str__(self) -> str:
-        return f'{self.text[:40]}{"..." if (len(self.text) > 40) else ""} by {self.user.first_name}'
\ No newline at end of file
+        return f'{self.text[:40]}{"..." if (len(self.text) > 40) else ""} by {self.user.first_name}'
+
+
+class PostLike(models.Model):
+    """One user's like of a post; the unique constraint makes liking idempotent."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='like_set')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='post_likes')
+    date_liked = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'], name='forum_postlike_unique'),
+        ]
+
+
+class PostLikeDelta(models.Model):
+    """
+    Pending change to ``Post.likes``, spread over ``FORUM_LIKE_SHARDS`` rows
+    per post so concurrent likes of one post lock different rows. Folded into
+    ``Post.likes`` by ``forum.likes.fold``.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='like_deltas')
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'shard'], name='forum_postlikedelta_unique'),
+        ]
@@ -0,0 +1,85 @@
+from operator import attrgetter
+
+from lms.projections import ProjectionSerializer, format_datetime, group_related
+from users.projections import represent_user, user_columns
+
+from .models import PostLike, feed_preview
+
+POST_COLUMNS = ('id',) + user_columns('user') + (
+    'title', 'text', 'likes', 'date_posted', 'comment_count', 'last_activity_at')
+
+COMMENT_COLUMNS = ('id',) + user_columns('user') + ('text', 'date_posted', 'post_id')
+
+
+def represent_comment(comment_id, user_id, enrollment_number, first_name, last_name, text, date_posted, post_id):
+    return {
+        'id': comment_id,
+        'user': represent_user(user_id, enrollment_number, first_name, last_name),
+        'text': text,
+        'date_posted': format_datetime(date_posted),
+        'post': post_id,
+    }
+
+
+class PostProjection(ProjectionSerializer):
+    """
+    ``PostSerializer`` output. Given the ``reader`` (``request.user``), each
+    post also says whether they ``liked`` it.
+    """
+    columns = POST_COLUMNS
+    user = attrgetter(*user_columns('user'))
+
+    def __init__(self, instance, many=False, reader=None):
+        super().__init__(instance, many)
+        self.reader = reader
+
+    def prepare(self, rows):
+        self.liked = set()
+        if self.reader is not None and self.reader.is_authenticated:
+            self.liked = set(PostLike.objects.filter(
+                user_id=self.reader.pk, post_id__in=[row.id for row in rows]).values_list('post_id', flat=True))
+
+    def to_representation(self, row):
+        data = {
+            'id': row.id,
+            'user': represent_user(*self.user(row)),
+            'title': row.title,
+            'text': row.text,
+            'likes': row.likes,
+            'date_posted': format_datetime(row.date_posted),
+            'comment_count': row.comment_count,
+            'last_activity_at': format_datetime(row.last_activity_at),
+        }
+        if self.reader is not None:
+            data['liked'] = row.id in self.liked
+        return data
+
+
+class PostFeedProjection(PostProjection):
+    """
+    ``PostSerializer`` output with each post's latest ``comment_limit``
+    comments, as ``CommentSerializer`` renders them, in ``latest_comments``.
+    A page's previews are read with one query.
+    """
+
+    def __init__(self, instance, many=False, comment_limit=None, reader=None):
+        super().__init__(instance, many, reader)
+        self.comment_limit = comment_limit
+
+    def prepare(self, rows):
+        super().prepare(rows)
+        self.comments = group_related(
+            feed_preview(self.comment_limit).filter(post__in=[row.id for row in rows]), 'post_id', *COMMENT_COLUMNS)
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        data['latest_comments'] = [represent_comment(*comment) for comment in self.comments.get(row.id, ())]
+        return data
+
+
+class CommentProjection(ProjectionSerializer):
+    """``CommentSerializer`` output."""
+    columns = COMMENT_COLUMNS
+
+    def to_representation(self, row):
+        return represent_comment(*row)
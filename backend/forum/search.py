@@ -0,0 +1,265 @@
+"""
+Full-text search over forum posts and comments.
+
+Every post and comment has one row in the ``forum_search`` table, kept up to
+date by signal handlers in the same transaction as the write (see
+``forum/signals.py``). On SQLite the table is an FTS5 virtual table ranked
+with bm25; on PostgreSQL it is a plain table with a weighted ``tsvector``
+column under a GIN index, ranked with ``ts_rank``. ``manage.py
+rebuild_search_index`` refills it from scratch. Other databases have no
+table; their searches scan posts and comments with ``icontains``, newest
+first.
+
+Queries are reduced to words: every word must match and the last one also
+matches as a prefix, so results narrow as the user types.
+"""
+import html
+import re
+
+from django.db import connection, connections, router, transaction
+from django.db.models import Q
+
+from .models import Comment, Post
+
+TABLE = 'forum_search'
+POST = 'post'
+COMMENT = 'comment'
+
+# Highlight markers; chosen so they can't occur in user text, then replaced
+# with <mark> after the text around them has been HTML-escaped.
+START, STOP = '\x02', '\x03'
+
+WORD = re.compile(r'\w+')
+
+
+def _doc_id(kind, object_id):
+    return object_id * 2 + (kind == COMMENT)
+
+
+def _highlight(text):
+    return html.escape(text or '').replace(START, '<mark>').replace(STOP, '</mark>')
+
+
+class SQLiteIndex:
+    def create_sql(self):
+        return [
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+            f"title, body, kind UNINDEXED, object_id UNINDEXED, post_id UNINDEXED, "
+            f"tokenize = 'porter unicode61')",
+        ]
+
+    def drop_sql(self):
+        return [f'DROP TABLE IF EXISTS {TABLE}']
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, kind, object_id, post_id, title, body) '
+            f'VALUES (%s, %s, %s, %s, %s, %s)', rows)
+
+    def delete(self, cursor, doc_ids):
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(doc_id,) for doc_id in doc_ids])
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {TABLE}')
+
+    def match(self, words):
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, cursor, words, limit, offset):
+        cursor.execute(
+            f"SELECT kind, object_id, post_id, "
+            f"highlight({TABLE}, 0, %s, %s), snippet({TABLE}, 1, %s, %s, '…', 24), "
+            f"bm25({TABLE}, 10.0, 1.0) AS rank "
+            f"FROM {TABLE} WHERE {TABLE} MATCH %s ORDER BY rank, rowid DESC LIMIT %s OFFSET %s",
+            [START, STOP, START, STOP, self.match(words), limit, offset])
+        # bm25 is lower for better matches; report higher-is-better.
+        return [row[:5] + (-row[5],) for row in cursor.fetchall()]
+
+
+class PostgresIndex:
+    def create_sql(self):
+        return [
+            f"CREATE TABLE {TABLE} ("
+            f"doc_id bigint PRIMARY KEY, kind varchar(7) NOT NULL, object_id bigint NOT NULL, "
+            f"post_id bigint NOT NULL, title text NOT NULL, body text NOT NULL, "
+            f"document tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('english', title), 'A') || "
+            f"setweight(to_tsvector('english', body), 'B')) STORED)",
+            f'CREATE INDEX {TABLE}_document_idx ON {TABLE} USING GIN (document)',
+        ]
+
+    def drop_sql(self):
+        return [f'DROP TABLE IF EXISTS {TABLE}']
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (doc_id, kind, object_id, post_id, title, body) '
+            f'VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (doc_id) DO UPDATE SET '
+            f'title = EXCLUDED.title, body = EXCLUDED.body, post_id = EXCLUDED.post_id', rows)
+
+    def delete(self, cursor, doc_ids):
+        cursor.execute(f'DELETE FROM {TABLE} WHERE doc_id = ANY(%s)', [list(doc_ids)])
+
+    def clear(self, cursor):
+        # Not TRUNCATE: its exclusive lock would block searches until the
+        # rebuild commits, where a DELETE leaves them reading the old rows.
+        cursor.execute(f'DELETE FROM {TABLE}')
+
+    def match(self, words):
+        terms = list(words)
+        terms[-1] += ':*'
+        return ' & '.join(terms)
+
+    def search(self, cursor, words, limit, offset):
+        options = f'StartSel="{START}", StopSel="{STOP}"'
+        cursor.execute(
+            f"SELECT kind, object_id, post_id, "
+            f"ts_headline('english', title, query, %s), "
+            f"ts_headline('english', body, query, %s), "
+            f"ts_rank(document, query) AS rank "
+            f"FROM {TABLE}, to_tsquery('english', %s) query "
+            f"WHERE document @@ query ORDER BY rank DESC, doc_id DESC LIMIT %s OFFSET %s",
+            [options + ', HighlightAll=true', options + ', MaxWords=35, MinWords=15',
+             self.match(words), limit, offset])
+        return cursor.fetchall()
+
+
+class FallbackIndex:
+    """Nothing is indexed; every search scans the posts and comments tables."""
+
+    def create_sql(self):
+        return []
+
+    def drop_sql(self):
+        return []
+
+    def upsert(self, cursor, rows):
+        pass
+
+    def delete(self, cursor, doc_ids):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def search(self, cursor, words, limit, offset):
+        posts = Post.objects.all()
+        comments = Comment.objects.all()
+        for word in words:
+            posts = posts.filter(Q(title__icontains=word) | Q(text__icontains=word))
+            comments = comments.filter(text__icontains=word)
+        # Each source's first offset + limit hits hold the merged page.
+        end = offset + limit
+        hits = [
+            (date_posted, pk * 2, POST, pk, pk, title, text)
+            for pk, title, text, date_posted in posts.order_by('-date_posted', '-pk').values_list(
+                'pk', 'title', 'text', 'date_posted')[:end]
+        ] + [
+            (date_posted, pk * 2 + 1, COMMENT, pk, post_id, '', text)
+            for pk, post_id, text, date_posted in comments.order_by('-date_posted', '-pk').values_list(
+                'pk', 'post_id', 'text', 'date_posted')[:end]
+        ]
+        hits.sort(key=lambda hit: hit[:2], reverse=True)
+        mark = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+
+        def highlight(text):
+            return mark.sub(lambda match: START + match.group() + STOP, text or '')
+        return [
+            (kind, object_id, post_id, highlight(title), highlight(text), 0.0)
+            for _, _, kind, object_id, post_id, title, text in hits[offset:end]
+        ]
+
+
+def get_index(conn=None):
+    vendor = (conn or connection).vendor
+    if vendor == 'sqlite':
+        return SQLiteIndex()
+    if vendor == 'postgresql':
+        return PostgresIndex()
+    return FallbackIndex()
+
+
+def _post_row(post_id, title, text):
+    return (_doc_id(POST, post_id), POST, post_id, post_id, title, text or '')
+
+
+def _comment_row(comment_id, post_id, text):
+    return (_doc_id(COMMENT, comment_id), COMMENT, comment_id, post_id, '', text or '')
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        get_index().upsert(cursor, [_post_row(post.pk, post.title, post.text)])
+
+
+def index_comment(comment):
+    with connection.cursor() as cursor:
+        get_index().upsert(cursor, [_comment_row(comment.pk, comment.post_id, comment.text)])
+
+
+def unindex(kind, object_id):
+    with connection.cursor() as cursor:
+        get_index().delete(cursor, [_doc_id(kind, object_id)])
+
+
+def rebuild(chunk_size=1000, progress=None):
+    """
+    Refill the index from every post and comment, reading ``chunk_size`` rows
+    at a time. The whole refill is one transaction, so searches running
+    meanwhile keep seeing the old index rather than an empty or partial one.
+    Returns the number of rows indexed.
+    """
+    index = get_index()
+    sources = [
+        (Post.objects.order_by('pk').values_list('pk', 'title', 'text'), _post_row),
+        (Comment.objects.order_by('pk').values_list('pk', 'post_id', 'text'), _comment_row),
+    ]
+    total = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            index.clear(cursor)
+        for queryset, make_row in sources:
+            last_pk = 0
+            while True:
+                chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+                if not chunk:
+                    break
+                with connection.cursor() as cursor:
+                    index.upsert(cursor, [make_row(*values) for values in chunk])
+                last_pk = chunk[-1][0]
+                total += len(chunk)
+                if progress:
+                    progress(total)
+    return total
+
+
+def search(query, limit, offset=0):
+    """
+    Ranked hits for ``query`` as dicts with HTML-escaped ``title`` and
+    ``snippet`` in which matches are wrapped in ``<mark>``. Comments carry
+    the title of their post.
+    """
+    words = WORD.findall(query.lower())
+    if not words:
+        return []
+    # Reads may go to a replica (see lms.replicas) like ORM queries do.
+    conn = connections[router.db_for_read(Post) or 'default']
+    with conn.cursor() as cursor:
+        rows = get_index(conn).search(cursor, words, limit, offset)
+
+    comment_posts = {post_id for kind, _, post_id, _, _, _ in rows if kind == COMMENT}
+    titles = dict(Post.objects.filter(pk__in=comment_posts).values_list('pk', 'title')) if comment_posts else {}
+    return [
+        {
+            'kind': kind,
+            'id': object_id,
+            'post': post_id,
+            'title': _highlight(title) if kind == POST else html.escape(titles.get(post_id, '')),
+            'snippet': _highlight(snippet),
+            'rank': rank,
+        }
+        for kind, object_id, post_id, title, snippet, rank in rows
+    ]
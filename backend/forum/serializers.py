@@ -13,10 +13,12 @@ class CommentSerializer(ModelSerializer):
 
 
 class PostSerializer(ModelSerializer):
+    """A post without its comments; those are paginated separately."""
 
     user = UserSerializer()
-    comment_set = CommentSerializer(many=True)
 
     class Meta:
         model = Post
-        fields = ['id', 'user', 'title', 'text', 'likes', 'date_posted', 'comment_set']
+        fields = ['id', 'user', 'title', 'text', 'likes', 'date_posted', 'comment_count', 'last_activity_at']
+
+
@@ -1,3 +1,260 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from lms.testing import BudgetTestCase
+from users.models import User
+
+from . import activity, likes, search
+from .models import Comment, Post, PostLike, PostLikeDelta
+from .projections import CommentProjection, PostFeedProjection, PostProjection
+from .serializers import CommentSerializer, PostSerializer
+
+
+class EndpointBudgetTests(BudgetTestCase):
+    def test_feed(self):
+        response = self.assertBudget('GET', '/api/forum/', queries=2, size=25_000)
+        self.assertBudget('GET', response.data['next'], queries=2, size=25_000)
+        # Two more: the authenticated user and their likes on the page.
+        self.assertBudget('GET', '/api/forum/', queries=4, size=25_000, user=self.data.student)
+        # The most active threads come first, each with its comment previews.
+        self.assertBudget('GET', '/api/forum/?sort=activity', queries=2, size=40_000)
+
+    def test_search(self):
+        response = self.assertBudget('GET', '/api/forum/search?q=synthetic', queries=2, size=10_000)
+        self.assertTrue(response.data['results'])
+
+    def test_thread(self):
+        post = self.data.post
+        self.assertGreater(post.comment_count, 100)
+        response = self.assertBudget('GET', f'/api/forum/{post.pk}', queries=2, size=10_000)
+        next_url = response.data['comments']['next']
+        self.assertBudget('GET', next_url, queries=2, size=10_000)
+
+    def test_create(self):
+        user = self.data.student
+        self.assertBudget('POST', '/api/forum/', queries=5, size=1_000, user=user,
+                          data={'title': 'Title', 'text': 'Text', 'user': user.pk})
+        self.assertBudget('POST', f'/api/forum/{self.data.post.pk}/comment', queries=8, size=1_000, user=user,
+                          data={'text': 'Text', 'user': user.pk})
+
+    def test_like(self):
+        url = f'/api/forum/{self.data.post.pk}/like'
+        self.assertBudget('POST', url, queries=9, size=100, user=self.data.student, data={})
+        self.assertBudget('DELETE', url, queries=7, size=100, user=self.data.student)
+
+    def test_projections(self):
+        posts = Post.objects.order_by('-date_posted', '-id')[:100]
+        self.assertSameRepresentation(PostProjection(posts, many=True), PostSerializer(posts, many=True))
+        limit = settings.FORUM_FEED_COMMENT_PREVIEW
+        feed = PostFeedProjection(posts, many=True, comment_limit=limit).data
+        for entry, post in zip(feed, PostProjection(posts, many=True).data):
+            previews = Comment.objects.filter(post_id=post['id']).order_by('-date_posted', '-id')[:limit]
+            self.assertEqual(entry, {
+                **post, 'latest_comments': CommentSerializer(previews.select_related('user'), many=True).data})
+        comments = Comment.objects.filter(post=self.data.post).order_by('date_posted', 'id')
+        self.assertSameRepresentation(
+            CommentProjection(comments, many=True), CommentSerializer(comments.select_related('user'), many=True))
+
+
+class LikeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'S{index}', 'First', 'secret') for index in range(3)]
+        cls.post = Post.objects.create(title='Title', text='Text', user=cls.users[0])
+
+    def stored_likes(self):
+        return Post.objects.values_list('likes', flat=True).get(pk=self.post.pk)
+
+    def test_like_and_unlike_are_idempotent(self):
+        user = self.users[1]
+        self.assertTrue(likes.like(self.post.pk, user.pk))
+        self.assertFalse(likes.like(self.post.pk, user.pk))
+        self.assertEqual(self.stored_likes(), 1)
+        self.assertEqual(PostLike.objects.count(), 1)
+
+        self.assertTrue(likes.unlike(self.post.pk, user.pk))
+        self.assertFalse(likes.unlike(self.post.pk, user.pk))
+        self.assertEqual(self.stored_likes(), 0)
+        self.assertFalse(PostLike.objects.exists())
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        url = f'/api/forum/{self.post.pk}/like'
+        for _ in range(2):
+            self.assertEqual(client.post(url).json(), {'liked': True, 'likes': 1})
+        for _ in range(2):
+            self.assertEqual(client.delete(url).json(), {'liked': False, 'likes': 0})
+        self.assertEqual(client.post('/api/forum/0/like').status_code, 404)
+
+    def test_feed_and_detail_say_whether_the_reader_liked(self):
+        likes.like(self.post.pk, self.users[1].pk)
+        detail = f'/api/forum/{self.post.pk}'
+        for user, liked in ((self.users[1], True), (self.users[2], False)):
+            client = APIClient()
+            client.force_authenticate(user)
+            self.assertEqual([post['liked'] for post in client.get('/api/forum/').json()['results']], [liked])
+            self.assertEqual(client.get(detail).json()['liked'], liked)
+        self.assertFalse(APIClient().get(detail).json()['liked'])
+
+    @override_settings(FORUM_LIKE_SHARDS=2)
+    def test_sharded_counts_fold(self):
+        for user in self.users:
+            self.assertTrue(likes.like(self.post.pk, user.pk))
+        self.assertFalse(likes.like(self.post.pk, self.users[0].pk))
+        self.assertTrue(likes.unlike(self.post.pk, self.users[2].pk))
+
+        self.assertEqual(self.stored_likes(), 0)
+        self.assertLessEqual(PostLikeDelta.objects.count(), 2)
+        self.assertEqual(likes.like_count(self.post.pk), 2)
+
+        likes.fold(batch_size=1)
+        self.assertEqual(self.stored_likes(), 2)
+        self.assertFalse(PostLikeDelta.objects.exists())
+        self.assertEqual(likes.like_count(self.post.pk), 2)
+
+    @override_settings(FORUM_LIKE_SHARDS=2)
+    def test_fold(self):
+        likes.like(self.post.pk, self.users[1].pk)
+        self.assertEqual(likes.fold(), 1)
+        self.assertEqual(self.stored_likes(), 1)
+        self.assertEqual(likes.fold(), 0)
+
+    @override_settings(FORUM_LIKE_SHARDS=2)
+    def test_fold_drops_deltas_that_cancel_out(self):
+        likes.like(self.post.pk, self.users[1].pk)
+        likes.unlike(self.post.pk, self.users[1].pk)
+        self.assertEqual(likes.fold(), 0)
+        self.assertFalse(PostLikeDelta.objects.exists())
+        self.assertEqual(self.stored_likes(), 0)
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('S1', 'First', 'secret')
+
+    def hits(self, query):
+        return [(hit['kind'], hit['id']) for hit in search.search(query, limit=10)]
+
+    def test_posts(self):
+        post = Post.objects.create(title='Quantum mechanics', text='Waves and particles', user=self.user)
+        self.assertEqual(self.hits('quantum'), [('post', post.pk)])
+        self.assertEqual(self.hits('partic'), [('post', post.pk)])
+
+        post.title = 'Thermodynamics'
+        post.save()
+        self.assertEqual(self.hits('quantum'), [])
+        self.assertEqual(self.hits('thermodynamics'), [('post', post.pk)])
+
+        post.delete()
+        self.assertEqual(self.hits('thermodynamics'), [])
+        self.assertEqual(self.hits('particles'), [])
+
+    def test_comments(self):
+        post = Post.objects.create(title='Exam schedule', text='', user=self.user)
+        comment = Comment.objects.create(post=post, user=self.user, text='Is the <b>lab</b> exam moved?')
+        [hit] = search.search('lab', limit=10)
+        self.assertEqual((hit['kind'], hit['id'], hit['post']), ('comment', comment.pk, post.pk))
+        self.assertEqual(hit['title'], 'Exam schedule')
+        self.assertEqual(hit['snippet'], 'Is the &lt;b&gt;<mark>lab</mark>&lt;/b&gt; exam moved?')
+
+        comment.text = 'Never mind'
+        comment.save()
+        self.assertEqual(self.hits('lab'), [])
+
+        comment.delete()
+        self.assertEqual(self.hits('mind'), [])
+
+        Comment.objects.create(post=post, user=self.user, text='Lab exam is on Friday')
+        post.delete()
+        self.assertEqual(self.hits('friday'), [])
+
+    def test_rebuild(self):
+        post = Post.objects.create(title='Library hours', text='', user=self.user)
+        comment = Comment.objects.create(post=post, user=self.user, text='Library closes early')
+        self.assertEqual(search.rebuild(chunk_size=1), 2)
+        self.assertEqual(sorted(self.hits('library')), [('comment', comment.pk), ('post', post.pk)])
+
+    def test_failed_rebuild_keeps_the_old_index(self):
+        post = Post.objects.create(title='Library hours', text='', user=self.user)
+        Comment.objects.create(post=post, user=self.user, text='Library closes early')
+        index = search.get_index()
+        with mock.patch.object(type(index), 'upsert', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                search.rebuild(chunk_size=1)
+        self.assertEqual(len(self.hits('library')), 2)
+
+    def test_equal_ranks_page_stably(self):
+        posts = [Post.objects.create(title='Same title', text='Same text', user=self.user) for _ in range(6)]
+        pages = [search.search('same', limit=2, offset=offset) for offset in range(0, 6, 2)]
+        self.assertEqual([hit['id'] for page in pages for hit in page], [post.pk for post in reversed(posts)])
+
+    def test_fallback(self):
+        post = Post.objects.create(title='Quantum mechanics', text='Waves', user=self.user)
+        comment = Comment.objects.create(post=post, user=self.user, text='Is the <b>quantum</b> lab moved?')
+        Post.objects.create(title='Thermodynamics', text='', user=self.user)
+        with mock.patch.object(search, 'get_index', return_value=search.FallbackIndex()):
+            hits = search.search('quant', limit=10)
+            self.assertEqual([(hit['kind'], hit['id']) for hit in hits], [('comment', comment.pk), ('post', post.pk)])
+            self.assertEqual(hits[0]['title'], 'Quantum mechanics')
+            self.assertEqual(hits[0]['snippet'], 'Is the &lt;b&gt;<mark>quant</mark>um&lt;/b&gt; lab moved?')
+            self.assertEqual(hits[1]['title'], '<mark>Quant</mark>um mechanics')
+            self.assertEqual([hit['id'] for hit in search.search('quantum', limit=1, offset=1)], [post.pk])
+            self.assertEqual(search.search('quantum waves lab', limit=10), [])
+
+
+class PostActivityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('S1', 'First', 'secret')
+
+    def setUp(self):
+        self.post = Post.objects.create(title='Title', text='Text', user=self.user)
+
+    def activity(self, post=None):
+        return Post.objects.values_list('comment_count', 'last_activity_at').get(pk=(post or self.post).pk)
+
+    def comment(self):
+        return Comment.objects.create(post=self.post, user=self.user, text='Text')
+
+    def test_comments_update_activity(self):
+        self.assertEqual(self.activity(), (0, self.post.date_posted))
+        first, second = self.comment(), self.comment()
+        self.assertEqual(self.activity(), (2, second.date_posted))
+
+        second.delete()
+        self.assertEqual(self.activity(), (1, first.date_posted))
+        first.delete()
+        self.assertEqual(self.activity(), (0, self.post.date_posted))
+
+    def test_deleting_an_older_comment_keeps_the_latest(self):
+        first, second = self.comment(), self.comment()
+        first.delete()
+        self.assertEqual(self.activity(), (1, second.date_posted))
+
+    def test_deleting_with_a_drifted_count(self):
+        first, second = self.comment(), self.comment()
+        Post.objects.filter(pk=self.post.pk).update(comment_count=0)
+        second.delete()
+        self.assertEqual(self.activity(), (0, first.date_posted))
+
+    def test_reconcile(self):
+        other = Post.objects.create(title='Other', text='', user=self.user)
+        comment = self.comment()
+        Comment.objects.filter(pk=comment.pk).update(date_posted=comment.date_posted + timedelta(hours=1))
+        Post.objects.filter(pk=other.pk).update(comment_count=3)
+
+        self.assertEqual(activity.reconcile(chunk_size=1), 2)
+        self.assertEqual(self.activity(), (1, comment.date_posted + timedelta(hours=1)))
+        self.assertEqual(self.activity(other), (0, other.date_posted))
+
+        out = StringIO()
+        call_command('reconcile_post_activity', stdout=out)
+        self.assertTrue(out.getvalue().startswith('Fixed 0 posts'))
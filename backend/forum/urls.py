@@ -4,6 +4,9 @@ from . import views
 
 urlpatterns = [
     path('', views.postsList),
+    path('search', views.searchPosts),
     path('<int:pk>', views.postDetail),
+    path('<int:post_id>/comments', views.postComments, name='post_comments'),
     path('<int:post_id>/comment', views.addComment),
+    path('<int:post_id>/like', views.likePost),
 ]
\ No newline at end of file
@@ -1,17 +1,39 @@
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.urls import replace_query_param
 
+from lms.pagination import KeysetPagination
+from lms.replicas import read_replica
+
+from . import likes, search
 from .models import Post, Comment
+from .projections import CommentProjection, PostFeedProjection, PostProjection
 from .serializers import PostSerializer, CommentSerializer
 
 
 @api_view(['GET', 'POST'])
+@read_replica
 def postsList(request):
     if request.method == 'GET':
-        posts = Post.objects.all()
-        serializer = PostSerializer(
-            posts, context={'request': request}, many=True)
-        return Response(serializer.data)
+        posts = PostFeedProjection.project(Post.objects.all())
+        # ?sort=activity lists threads by their latest comment.
+        ordering_field = 'last_activity_at' if request.query_params.get('sort') == 'activity' else 'date_posted'
+        paginator = KeysetPagination(
+            page_size=settings.FORUM_FEED_PAGE_SIZE,
+            max_page_size=settings.FORUM_FEED_MAX_PAGE_SIZE,
+            ordering_field=ordering_field,
+        )
+        page = paginator.paginate_queryset(posts, request)
+        serializer = PostFeedProjection(
+            page, many=True, comment_limit=settings.FORUM_FEED_COMMENT_PREVIEW, reader=request.user)
+        return paginator.get_paginated_response(serializer.data)
     elif request.method == 'POST':
         data = request.data
         post = Post.objects.create(
@@ -24,21 +46,80 @@ def postsList(request):
         return Response(serializer.data)
 
 
+def comments_page(request, post_id):
+    """
+    One keyset page of a post's comments, oldest first, as
+    ``{'next', 'results'}`` with ``next`` pointing at ``postComments``.
+    """
+    paginator = KeysetPagination(
+        page_size=settings.FORUM_COMMENTS_PAGE_SIZE,
+        max_page_size=settings.FORUM_FEED_MAX_PAGE_SIZE,
+        descending=False,
+    )
+    comments = CommentProjection.project(Comment.objects.filter(post_id=post_id))
+    page = paginator.paginate_queryset(comments, request)
+    url = request.build_absolute_uri(reverse('post_comments', args=[post_id]))
+    return paginator.get_paginated_data(CommentProjection(page, many=True).data, url)
+
+
 @api_view(['GET'])
+@read_replica
 def postDetail(request, pk):
-    post = Post.objects.get(pk=pk)
-    postSerializer = PostSerializer(post)
-    return Response(postSerializer.data)
+    post = get_object_or_404(PostProjection.project(Post.objects), pk=pk)
+    postSerializer = PostProjection(post, reader=request.user)
+    return Response({**postSerializer.data, 'comments': comments_page(request, post.id)})
+
+
+@api_view(['GET'])
+@read_replica
+def postComments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise NotFound()
+    return Response(comments_page(request, post_id))
 
 
 @api_view(['POST'])
 def addComment(request, post_id):
     data = request.data
-    comment = Comment.objects.create(
-        text=data['text'],
-        user_id=data['user'],
-        post_id=post_id,
-    )
+    # The post's comment_count and last_activity_at are updated by a signal
+    # handler; commit them together with the comment.
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            text=data['text'],
+            user_id=data['user'],
+            post_id=post_id,
+        )
     serializer = CommentSerializer(comment)
 
     return Response(serializer.data)
+
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def likePost(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'POST':
+        likes.like(post.pk, request.user.pk)
+        liked = True
+    else:
+        likes.unlike(post.pk, request.user.pk)
+        liked = False
+    return Response({'liked': liked, 'likes': likes.like_count(post.pk)})
+
+
+@api_view(['GET'])
+@read_replica
+def searchPosts(request):
+    query = request.query_params.get('q', '')
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+        page_size = int(request.query_params.get('page_size', settings.FORUM_FEED_PAGE_SIZE))
+    except ValueError:
+        return Response({'detail': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    page_size = min(max(page_size, 1), settings.FORUM_FEED_MAX_PAGE_SIZE)
+
+    hits = search.search(query, limit=page_size + 1, offset=(page - 1) * page_size)
+    next_url = None
+    if len(hits) > page_size:
+        next_url = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+    return Response({'next': next_url, 'results': hits[:page_size]})
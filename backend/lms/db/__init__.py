@@ -0,0 +1,5 @@
+"""
+Database engines used by ``DATABASES`` in settings: thin subclasses of
+Django's SQLite and PostgreSQL backends that add connection tuning Django 4.0
+does not offer itself.
+"""
@@ -0,0 +1,31 @@
+"""
+PostgreSQL with connection health checks.
+
+With ``CONN_MAX_AGE`` connections outlive a request, and one the server or a
+pooler has dropped in the meantime would fail the next request. When the
+database settings have ``CONN_HEALTH_CHECKS`` set, a reused connection is
+checked with ``SELECT 1`` the first time it is used in each request and
+replaced if it is dead (what Django 4.1 does natively).
+"""
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and self.settings_dict.get('CONN_HEALTH_CHECKS') and not self.in_atomic_block):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Check the connection again when the next request first uses it.
+        self.health_check_done = False
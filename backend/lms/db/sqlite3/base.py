@@ -0,0 +1,41 @@
+"""
+SQLite tuned for concurrent writers.
+
+Extra ``OPTIONS`` (all optional):
+
+* ``journal_mode`` - ``'WAL'`` lets readers proceed while a write is in
+  progress.
+* ``synchronous`` - ``'NORMAL'`` is durable in WAL mode except on power loss
+  and avoids an fsync per commit.
+* ``immediate`` - start transactions with ``BEGIN IMMEDIATE`` so a writer
+  takes the lock up front and waits on ``timeout``. With the default deferred
+  transactions two writers can deadlock upgrading their read locks, and one
+  fails with "database is locked" without waiting at all.
+
+``timeout`` (seconds) is passed to ``sqlite3.connect`` as the busy timeout.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = ('journal_mode', 'synchronous')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in PRAGMAS + ('immediate',):
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        for pragma in PRAGMAS:
+            if options.get(pragma):
+                conn.execute(f'PRAGMA {pragma} = {options[pragma]}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict['OPTIONS'].get('immediate'):
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
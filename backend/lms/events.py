@@ -0,0 +1,166 @@
+"""
+In-process publish/subscribe used to push server-sent events.
+
+Publishers run in ordinary sync Django code (signal handlers); subscribers are
+SSE connections waiting on an asyncio loop. ``LocalBroker`` delivers within a
+single process. ``RedisBroker`` relays through redis pub/sub so that every
+worker process sees events published by any other one.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data', 'users')
+
+    def __init__(self, id, type, data, users=None):
+        self.id = id
+        self.type = type
+        self.data = data
+        # ``None`` means every connected user receives the event.
+        self.users = users
+
+    def encode(self):
+        return f'id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n'.encode()
+
+
+class Subscription:
+    """One connection's bounded queue of pending events."""
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        # Set when the client fell too far behind; it must resync.
+        self.overflowed = False
+
+    def wants(self, event):
+        return event.users is None or self.user_id in event.users
+
+    def push(self, event):
+        if self.wants(event):
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class LocalBroker:
+    def __init__(self, queue_size=100, replay_size=1000, **options):
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._replay = deque(maxlen=replay_size)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def next_id(self):
+        return next(self._ids)
+
+    def publish(self, type, data, users=None):
+        users = frozenset(users) if users is not None else None
+        self.deliver(Event(self.next_id(), type, data, users))
+
+    def deliver(self, event):
+        with self._lock:
+            self._replay.append(event)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def subscribe(self, user_id, loop, last_event_id=None):
+        """
+        Register a subscription and return it with the events it missed since
+        ``last_event_id``. The backlog is ``None`` when those events are no
+        longer retained and the client has to refetch instead.
+        """
+        subscription = Subscription(user_id, loop, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            replay = list(self._replay)
+
+        if last_event_id is None:
+            return subscription, []
+        if not replay or replay[0].id > last_event_id + 1 or replay[-1].id < last_event_id:
+            return subscription, None
+        return subscription, [
+            event for event in replay if event.id > last_event_id and subscription.wants(event)
+        ]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Publishes through a redis channel; each process runs one listener thread
+    that hands incoming events to its local subscriptions. Event ids come
+    from a shared redis counter so ``Last-Event-ID`` works across workers.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', channel='lms:events', **options):
+        super().__init__(**options)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker requires the "redis" package')
+        self.redis = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listener = None
+
+    def next_id(self):
+        return self.redis.incr(f'{self.channel}:id')
+
+    def publish(self, type, data, users=None):
+        self.redis.publish(self.channel, json.dumps({
+            'id': self.next_id(),
+            'type': type,
+            'data': data,
+            'users': sorted(users) if users is not None else None,
+        }))
+
+    def subscribe(self, user_id, loop, last_event_id=None):
+        self._start_listener()
+        return super().subscribe(user_id, loop, last_event_id)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            payload = json.loads(message['data'])
+            users = frozenset(payload['users']) if payload['users'] is not None else None
+            self.deliver(Event(payload['id'], payload['type'], payload['data'], users))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = settings.EVENTS
+            _broker = import_string(config['BROKER'])(
+                queue_size=config['QUEUE_SIZE'],
+                replay_size=config['REPLAY_SIZE'],
+                **config.get('OPTIONS', {}),
+            )
+    return _broker
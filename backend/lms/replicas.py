@@ -0,0 +1,96 @@
+"""
+Read replica routing.
+
+Views decorated with ``read_replica`` run their safe-method (GET/HEAD/OPTIONS)
+requests against one of ``settings.READ_REPLICAS``, picked once per request so
+all of a response's rows come from the same replica and agree with each other
+however far the replicas lag; everything else, and every write, uses the
+primary. After a client's successful write,
+``ReplicaPinningMiddleware`` sets a short-lived cookie that keeps that
+client's reads on the primary for ``READ_REPLICA_STICKY_SECONDS``, so a user
+sees their own new post or comment even while the replicas lag.
+
+With no replicas configured the router and middleware do nothing.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'db_primary'
+
+# The replica reads go to, or None for the primary.
+_replica = ContextVar('lms_replica', default=None)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """
+    Send reads in the enclosed block to the replica already in use, or to one
+    picked at random.
+    """
+    replica = None
+    if enabled and settings.READ_REPLICAS:
+        replica = _replica.get() or random.choice(settings.READ_REPLICAS)
+    token = _replica.set(replica)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def use_primary():
+    """Force reads in the enclosed block onto the primary."""
+    return use_replica(False)
+
+
+def is_pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+def read_replica(view):
+    """Serve the view's safe-method requests from a read replica."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method in SAFE_METHODS and settings.READ_REPLICAS and not is_pinned(request):
+            with use_replica():
+                return view(request, *args, **kwargs)
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.READ_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (settings.READ_REPLICAS and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.READ_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
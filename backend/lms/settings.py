@@ -1,8 +1,11 @@
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
 import os
 import dotenv
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,12 +57,75 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'lms.tracing.RequestTracingMiddleware',
+    'lms.replicas.ReplicaPinningMiddleware',
 ]
 
+# Per-request query/SQL/serialization tracing, see lms/tracing.py. Disabled
+# by default; when enabled, SAMPLE_RATE is the fraction of requests traced.
+REQUEST_TRACING = {
+    'ENABLED': os.environ.get('REQUEST_TRACING', '') == '1',
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_TRACING_SAMPLE_RATE', 1.0)),
+    'BUFFER_SIZE': int(os.environ.get('REQUEST_TRACING_BUFFER_SIZE', 500)),
+}
+
+# Server-sent events (base/stream.py, served by lms.asgi). Set
+# EVENTS_BROKER=lms.events.RedisBroker and EVENTS_REDIS_URL when running
+# more than one ASGI worker.
+EVENTS = {
+    'BROKER': os.environ.get('EVENTS_BROKER', 'lms.events.LocalBroker'),
+    'OPTIONS': {'url': os.environ['EVENTS_REDIS_URL']} if 'EVENTS_REDIS_URL' in os.environ else {},
+    # Seconds between keep-alive comments on an idle stream.
+    'HEARTBEAT': 15,
+    # Events buffered per connection before it is told to resync.
+    'QUEUE_SIZE': 100,
+    # Recent events kept for Last-Event-ID replay.
+    'REPLAY_SIZE': 1000,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'lms.tracing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# JWT_STATELESS_AUTH=1 authenticates API requests from the token's claims
+# instead of loading the user row (see users/authentication.py). Revocations
+# then only reach other workers through the cache, so it needs SHARED_CACHE
+# (checked below).
+JWT_STATELESS_AUTH = os.environ.get('JWT_STATELESS_AUTH', '') == '1'
+
+# API_ORJSON=0 goes back to DRF's own JSON renderer and parser; otherwise
+# orjson is used when installed (see lms/renderers.py). API_MSGPACK=1 also
+# offers MessagePack to clients that ask for it and needs `msgpack`.
+API_ORJSON = os.environ.get('API_ORJSON', '1') == '1' and find_spec('orjson') is not None
+API_MSGPACK = os.environ.get('API_MSGPACK', '') == '1'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'users.authentication.ClaimsJWTAuthentication' if JWT_STATELESS_AUTH
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'lms.renderers.ORJSONRenderer' if API_ORJSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['lms.renderers.MessagePackRenderer'] if API_MSGPACK else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'lms.renderers.ORJSONParser' if API_ORJSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['lms.renderers.MessagePackParser'] if API_MSGPACK else []),
 }
 
 ROOT_URLCONF = 'lms.urls'
@@ -385,13 +451,93 @@ WSGI_APPLICATION = 'lms.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE=postgresql for anything with concurrent writers; SQLite allows a
+# single writer at a time. With a pooler such as pgbouncer in transaction mode
+# in front of PostgreSQL, point DB_HOST/DB_PORT at it and set DB_POOLER=1.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'lms.db.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'lms'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+            # Server-side cursors don't survive transaction pooling.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER', '') == '1',
+        }
+    }
+elif DB_ENGINE == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'lms.db.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': float(os.environ.get('DB_SQLITE_TIMEOUT', 20)),
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'immediate': True,
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'Unsupported DB_ENGINE {DB_ENGINE!r}')
+
+# Read replicas (PostgreSQL): DB_REPLICA_HOSTS is a comma separated list of
+# hosts with the primary's credentials. Views marked with
+# lms.replicas.read_replica read from them; a client that just wrote reads
+# from the primary for DB_REPLICA_STICKY_SECONDS.
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+
+READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+READ_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10))
+
+DATABASE_ROUTERS = ['lms.replicas.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Use a shared backend (e.g. redis or memcached) when running several workers,
+# otherwise invalidation only reaches the worker that handled the write.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Whether every worker reads and writes the same cache. State one worker
+# writes for the others to trust is only cached when it is: a refresh token
+# not being blacklisted (users/tokens.py), serialized timetables and course
+# lists (courses/cache.py), and the version counters behind ETag/304
+# responses (lms/versions.py; without a shared cache the ETag is a hash of
+# the payload, which has to be built). SHARED_CACHE=1 vouches for a
+# per-process cache when there is only one process.
+SHARED_CACHE = os.environ.get('SHARED_CACHE') == '1' or CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+if JWT_STATELESS_AUTH and not SHARED_CACHE:
+    raise ImproperlyConfigured(
+        'JWT_STATELESS_AUTH needs a shared CACHE_BACKEND (or SHARED_CACHE=1 with a single process): '
+        'otherwise deactivating a user or changing a password only revokes tokens on one worker.')
+
+# Serialized timetables and course lists are invalidated by signals, the
+# timeout only bounds how long an entry nobody reads stays around. They are
+# only cached with SHARED_CACHE, as other workers would miss the invalidation.
+TIMETABLE_CACHE_TIMEOUT = int(os.environ.get('TIMETABLE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# How long a version counter (lms/versions.py) outlives its last change. One
+# that expires restarts at the current time, so clients fetch once more.
+VERSION_TIMEOUT = int(os.environ.get('VERSION_TIMEOUT', 60 * 60 * 24 * 7))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -412,6 +558,38 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.0/topics/auth/passwords/
+# New hashes use PASSWORD_HASHER; the others are kept so existing hashes still
+# verify, and are rehashed with the preferred hasher on the next login.
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'users.hashers.PBKDF2PasswordHasher')
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [hasher for hasher in [
+    'users.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+] if hasher != PASSWORD_HASHER]
+
+# PBKDF2_ITERATIONS: work factor (0 keeps Django's default); measure it with
+# `manage.py bench_hashers --budget-ms ...`. Password checks run on WORKERS
+# threads with at most QUEUE_SIZE logins waiting up to QUEUE_TIMEOUT seconds,
+# beyond which logins get a 503. Checks slower than BUDGET_MS are logged.
+PASSWORD_HASHING = {
+    'PBKDF2_ITERATIONS': int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0)),
+    'BUDGET_MS': float(os.environ.get('PASSWORD_BUDGET_MS', 0)),
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 2)),
+    'QUEUE_SIZE': int(os.environ.get('PASSWORD_HASHING_QUEUE_SIZE', 32)),
+    'QUEUE_TIMEOUT': float(os.environ.get('PASSWORD_HASHING_QUEUE_TIMEOUT', 5)),
+}
+
+# Roster files uploaded in the admin are hashed within the request on
+# PASSWORD_HASHING['WORKERS'] threads, so they are capped at this many rows;
+# import bigger ones with manage.py import_roster.
+ROSTER_ADMIN_MAX_ROWS = int(os.environ.get('ROSTER_ADMIN_MAX_ROWS', 200))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
 
@@ -474,6 +652,23 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Refresh tokens recently seen blacklisted, remembered per process so replayed
+# tokens are rejected without a cache or database lookup.
+TOKEN_BLACKLIST_LRU_SIZE = int(os.environ.get('TOKEN_BLACKLIST_LRU_SIZE', 10000))
+
+# Forum feed: keyset page size and how many of the newest comments are
+# previewed under each post.
+FORUM_FEED_PAGE_SIZE = int(os.environ.get('FORUM_FEED_PAGE_SIZE', 20))
+FORUM_FEED_MAX_PAGE_SIZE = int(os.environ.get('FORUM_FEED_MAX_PAGE_SIZE', 100))
+FORUM_FEED_COMMENT_PREVIEW = int(os.environ.get('FORUM_FEED_COMMENT_PREVIEW', 3))
+# Comments per page on a thread (postDetail and its comments endpoint).
+FORUM_COMMENTS_PAGE_SIZE = int(os.environ.get('FORUM_COMMENTS_PAGE_SIZE', 20))
+
+# 0 updates Post.likes in place on every like. On PostgreSQL, spreading a
+# post's pending likes over a few rows (e.g. 16) avoids lock queues on very
+# popular posts; `manage.py fold_likes --interval 5` then folds them in.
+FORUM_LIKE_SHARDS = int(os.environ.get('FORUM_LIKE_SHARDS', 0))
+
 ALLOWED_HOSTS = ['*']
 
 X_FRAME_OPTIONS = "SAMEORIGIN"
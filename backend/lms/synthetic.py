@@ -0,0 +1,155 @@
+"""
+Synthetic institutions for load tests and benchmarks.
+
+``generate`` fills the database with batches, students, teachers, courses
+with enrollments, timetables, announcements, notifications (fanned out to
+inboxes by the usual signal handlers) and a forum whose threads follow a
+long-tailed size distribution. Rows are written with ``bulk_create``, so a
+few thousand users take seconds; every student and teacher shares one
+password hash. The admin account only gets a password when one is given for
+it, so a generated database never holds a superuser with a known password.
+"""
+import datetime
+import random
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from base.models import Announcement, Batch, Notification
+from courses.cache import BATCH_NAMES, invalidate
+from courses.models import Course, TimeTable
+from forum import search
+from forum.models import Comment, Post
+from users.models import Student, Teacher, User
+
+PASSWORD = 'password'
+
+# Enrollment number of the first generated student; used to detect a
+# database that already holds a generated institution.
+FIRST_STUDENT = 'S0000000'
+
+BATCH_SIZE = 1000
+
+
+def generate(students=2000, teachers=100, batches=20, courses=60, courses_per_student=5,
+             timetable_rows=1200, posts=1000, comments=5000, notifications=200, announcements=30,
+             password=PASSWORD, admin_password=None, random_seed=0, progress=None):
+    """
+    Create an institution of the given size and return its notable rows:
+    ``student``, ``teacher`` and ``admin`` users, the student's ``batch``,
+    and the busiest ``post``. ``progress(stage, count, seconds)`` is called
+    after each kind of row is written.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    started = time.perf_counter()
+
+    def report(stage, count):
+        if progress:
+            progress(stage, count, time.perf_counter() - started)
+
+    with transaction.atomic():
+        batch_rows = Batch.objects.bulk_create([Batch(name=f'B{i:03}') for i in range(batches)])
+        invalidate([BATCH_NAMES])
+        report('batches', len(batch_rows))
+
+        # Hash once; every generated account shares the password.
+        password = make_password(password)
+        users = User.objects.bulk_create(
+            [User(enrollment_number=f'S{i:07}', first_name=f'Student{i}', last_name='Synthetic',
+                  user_type=User.STUDENT, password=password) for i in range(students)]
+            + [User(enrollment_number=f'T{i:07}', first_name=f'Teacher{i}', last_name='Synthetic',
+                    user_type=User.TEACHER, password=password) for i in range(teachers)]
+            + [User(enrollment_number='A0000000', first_name='Admin', user_type=User.TEACHER,
+                    password=make_password(admin_password), is_staff=True, is_superuser=True)],
+            batch_size=BATCH_SIZE,
+        )
+        student_users, teacher_users, admin = users[:students], users[students:-1], users[-1]
+        student_rows = Student.objects.bulk_create(
+            [Student(user=user, batch=batch_rows[i % batches]) for i, user in enumerate(student_users)],
+            batch_size=BATCH_SIZE)
+        teacher_rows = Teacher.objects.bulk_create(
+            [Teacher(user=user) for user in teacher_users], batch_size=BATCH_SIZE)
+        report('users', len(users))
+
+        course_rows = Course.objects.bulk_create(
+            [Course(name=f'Course {i}', code=f'C{i:05}') for i in range(courses)])
+        enrollments = Course.student.through.objects.bulk_create([
+            Course.student.through(course_id=course.pk, student_id=student.pk)
+            for student in student_rows
+            for course in rng.sample(course_rows, min(courses_per_student, courses))
+        ], batch_size=BATCH_SIZE)
+        report('enrollments', len(enrollments))
+
+        timetables = TimeTable.objects.bulk_create([
+            TimeTable(
+                course=rng.choice(course_rows),
+                teacher=rng.choice(teacher_rows),
+                day=rng.randrange(1, 6),
+                start_time=datetime.time(8 + i % 9),
+                end_time=datetime.time(9 + i % 9),
+                class_type=rng.choice([TimeTable.LECTURE, TimeTable.LAB]),
+            )
+            for i in range(timetable_rows)
+        ], batch_size=BATCH_SIZE)
+        TimeTable.batch.through.objects.bulk_create([
+            TimeTable.batch.through(timetable_id=timetable.pk, batch_id=batch.pk)
+            for timetable in timetables
+            for batch in rng.sample(batch_rows, min(2, batches))
+        ], batch_size=BATCH_SIZE)
+        report('timetable rows', len(timetables))
+
+        Announcement.objects.bulk_create([
+            Announcement(title=f'Announcement {i}', text='Synthetic announcement. ' * 5)
+            for i in range(announcements)])
+        for i in range(notifications):
+            # Created one by one so the signal handlers fill every inbox.
+            notification = Notification.objects.create(
+                title=f'Notification {i}', text='Synthetic notification. ' * 10, course=rng.choice(course_rows))
+            if i % 2:
+                # The rest go to everyone taking the course.
+                notification.batch.add(*rng.sample(batch_rows, min(3, batches)))
+        report('notifications', notifications)
+
+        post_rows = Post.objects.bulk_create([
+            Post(
+                user=rng.choice(users),
+                title=f'Post {i}',
+                text='Synthetic post text. ' * 20,
+                date_posted=now - datetime.timedelta(minutes=posts - i),
+                last_activity_at=now - datetime.timedelta(minutes=posts - i),
+            )
+            for i in range(posts)
+        ], batch_size=BATCH_SIZE)
+        # Skewed so a few threads are long, like a real forum.
+        weights = [1 / (rank + 1) for rank in range(posts)]
+        targets = rng.choices(post_rows, weights=weights, k=comments) if posts else []
+        comment_rows = Comment.objects.bulk_create([
+            Comment(post=post, user=rng.choice(users), text='Synthetic comment. ' * 8) for post in targets
+        ], batch_size=BATCH_SIZE)
+        # Bulk inserts skip the handlers of forum.activity; keep its fields in
+        # line with the comments as they would be.
+        counts, latest = {}, {}
+        for comment in comment_rows:
+            counts[comment.post_id] = counts.get(comment.post_id, 0) + 1
+            latest[comment.post_id] = max(latest.get(comment.post_id, comment.date_posted), comment.date_posted)
+        for post in post_rows:
+            post.comment_count = counts.get(post.pk, 0)
+            post.last_activity_at = max(post.date_posted, latest.get(post.pk, post.date_posted))
+        Post.objects.bulk_update(post_rows, ['comment_count', 'last_activity_at'], batch_size=BATCH_SIZE)
+        report('posts', len(post_rows))
+        report('comments', len(targets))
+
+    # Bulk inserts skip the signal handlers that maintain the search index.
+    report('search index', search.rebuild())
+
+    return SimpleNamespace(
+        student=student_users[0] if student_users else None,
+        teacher=teacher_users[0] if teacher_users else None,
+        admin=admin,
+        batch=batch_rows[0] if batch_rows else None,
+        post=post_rows[0] if post_rows else None,
+    )
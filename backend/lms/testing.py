@@ -0,0 +1,61 @@
+"""
+Test helpers: per-request query and size budgets.
+
+``BudgetTestCase`` generates an institution of a few thousand users (see
+``lms.synthetic``) once per class and provides ``assertBudget``, which
+requests a URL and fails when it ran more queries or returned more bytes than
+allowed. The budgets in each app's ``tests.py`` sit a little above what the
+endpoints use today; an N+1 query or an unpaginated list blows through them
+by far.
+
+``assertSameRepresentation`` checks that a projection serializer (see
+``lms.projections``) renders exactly like the model serializer it replaces.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .synthetic import generate
+
+
+class BudgetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = generate()
+
+    def setUp(self):
+        # Cached payloads would hide the queries of a cold request.
+        cache.clear()
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def assertBudget(self, method, url, queries, size, user=None, data=None, status=200, client=None):
+        """
+        Request ``url`` and assert it ran at most ``queries`` queries (on
+        commit hooks included) and returned at most ``size`` bytes.
+        """
+        client = client or self.client_for(user)
+        kwargs = {'format': 'json'} if data is not None else {}
+        with CaptureQueriesContext(connection) as captured, self.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, method.lower())(url, data, **kwargs)
+        self.assertEqual(response.status_code, status, response.content[:500])
+        executed = len(captured.captured_queries)
+        self.assertLessEqual(
+            executed, queries,
+            f'{method} {url} ran {executed} queries:\n'
+            + '\n'.join(query['sql'] for query in captured.captured_queries))
+        self.assertLessEqual(len(response.content), size, f'{method} {url} returned {len(response.content)} bytes')
+        return response
+
+    def assertSameRepresentation(self, projection, serializer):
+        """Assert both serializers render to the same JSON bytes."""
+        render = JSONRenderer().render
+        self.assertEqual(render(projection.data), render(serializer.data))
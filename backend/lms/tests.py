@@ -0,0 +1,215 @@
+import io
+import os
+import runpy
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from forum.activity import reconcile
+from users.models import User
+
+from .db.sqlite3.base import DatabaseWrapper as SQLiteWrapper
+from . import versions
+from .replicas import PIN_COOKIE, ReplicaPinningMiddleware, read_replica, use_primary, use_replica
+
+
+def load_settings(**environ):
+    """Evaluate lms/settings.py afresh with ``environ`` set."""
+    with mock.patch.dict(os.environ, environ):
+        return runpy.run_path(os.path.join(os.path.dirname(__file__), 'settings.py'))
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite(self):
+        settings = load_settings(DB_ENGINE='sqlite3', DB_NAME='/tmp/lms.sqlite3', DB_SQLITE_TIMEOUT='3')
+        database = settings['DATABASES']['default']
+        self.assertEqual(database['ENGINE'], 'lms.db.sqlite3')
+        self.assertEqual(database['NAME'], '/tmp/lms.sqlite3')
+        self.assertEqual(database['OPTIONS'], {
+            'timeout': 3.0, 'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'immediate': True})
+        self.assertEqual(settings['READ_REPLICAS'], [])
+
+    def test_postgresql_with_replicas(self):
+        settings = load_settings(
+            DB_ENGINE='postgresql', DB_NAME='school', DB_HOST='primary', DB_POOLER='1',
+            DB_CONN_MAX_AGE='0', DB_REPLICA_HOSTS='replica-a, replica-b,')
+        databases = settings['DATABASES']
+        self.assertEqual(databases['default']['ENGINE'], 'lms.db.postgresql')
+        self.assertEqual(databases['default']['NAME'], 'school')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 0)
+        self.assertTrue(databases['default']['CONN_HEALTH_CHECKS'])
+        self.assertTrue(databases['default']['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(settings['READ_REPLICAS'], ['replica_0', 'replica_1'])
+        self.assertEqual(
+            [(databases[alias]['HOST'], databases[alias]['NAME'], databases[alias]['TEST'])
+             for alias in settings['READ_REPLICAS']],
+            [('replica-a', 'school', {'MIRROR': 'default'}), ('replica-b', 'school', {'MIRROR': 'default'})])
+
+    def test_stateless_auth_needs_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(
+                JWT_STATELESS_AUTH='1', SHARED_CACHE='', CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache')
+        for environ in ({'SHARED_CACHE': '1'},
+                        {'CACHE_BACKEND': 'django.core.cache.backends.redis.RedisCache'}):
+            settings = load_settings(JWT_STATELESS_AUTH='1', **environ)
+            self.assertEqual(settings['REST_FRAMEWORK']['DEFAULT_AUTHENTICATION_CLASSES'],
+                             ('users.authentication.ClaimsJWTAuthentication',))
+
+    def test_unsupported_engine(self):
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(DB_ENGINE='oracle')
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = {
+            **connection.settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'OPTIONS': {'timeout': 0, 'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'immediate': True},
+        }
+
+    def connect(self, **options):
+        wrapper = SQLiteWrapper({**self.settings_dict, 'OPTIONS': {**self.settings_dict['OPTIONS'], **options}})
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        wrapper = self.connect()
+        self.assertNotIn('journal_mode', wrapper.get_connection_params())
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+
+    def test_defaults_without_options(self):
+        wrapper = self.connect(journal_mode=None, synchronous=None)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 2)  # FULL
+
+    def test_immediate_transactions_take_the_write_lock(self):
+        first, second = self.connect(), self.connect()
+        first._start_transaction_under_autocommit()
+        self.addCleanup(first.connection.rollback)
+        # No write yet, but the second writer can't start.
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            second._start_transaction_under_autocommit()
+
+    def test_deferred_transactions(self):
+        first, second = self.connect(immediate=False), self.connect(immediate=False)
+        first._start_transaction_under_autocommit()
+        self.addCleanup(first.connection.rollback)
+        second._start_transaction_under_autocommit()
+        second.connection.rollback()
+
+
+@read_replica
+def read_alias(request):
+    return HttpResponse(User.objects.all().db)
+
+
+@override_settings(READ_REPLICAS=['replica_0', 'replica_1'], READ_REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    def test_reads_go_to_the_primary_by_default(self):
+        self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_use_replica(self):
+        with use_replica():
+            self.assertIn(router.db_for_read(User), ['replica_0', 'replica_1'])
+            self.assertIn(User.objects.all().db, ['replica_0', 'replica_1'])
+            self.assertEqual(router.db_for_write(User), 'default')
+            with use_primary():
+                self.assertEqual(router.db_for_read(User), 'default')
+            self.assertIn(router.db_for_read(User), ['replica_0', 'replica_1'])
+
+    def test_one_replica_per_block(self):
+        with self.settings(READ_REPLICAS=[f'replica_{index}' for index in range(20)]), use_replica():
+            replica = router.db_for_read(User)
+            self.assertEqual({router.db_for_read(User) for _ in range(20)}, {replica})
+            with use_replica():
+                self.assertEqual(router.db_for_read(User), replica)
+
+    def test_no_replicas(self):
+        with self.settings(READ_REPLICAS=[]), use_replica():
+            self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_migrations_skip_replicas(self):
+        self.assertFalse(router.allow_migrate('replica_0', 'users'))
+        self.assertTrue(router.allow_migrate('default', 'users'))
+
+    def test_read_replica_view(self):
+        factory = RequestFactory()
+        self.assertIn(read_alias(factory.get('/')).content, [b'replica_0', b'replica_1'])
+        self.assertEqual(read_alias(factory.post('/')).content, b'default')
+
+        pinned = factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(read_alias(pinned).content, b'default')
+
+        with self.settings(READ_REPLICAS=[]):
+            self.assertEqual(read_alias(factory.get('/')).content, b'default')
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        factory = RequestFactory()
+
+        def respond(status):
+            return ReplicaPinningMiddleware(lambda request: HttpResponse(status=status))
+
+        response = respond(201)(factory.post('/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        self.assertNotIn(PIN_COOKIE, respond(400)(factory.post('/')).cookies)
+        self.assertNotIn(PIN_COOKIE, respond(200)(factory.get('/')).cookies)
+        with self.settings(READ_REPLICAS=[]):
+            self.assertNotIn(PIN_COOKIE, respond(201)(factory.post('/')).cookies)
+
+
+@override_settings(SHARED_CACHE=True, VERSION_TIMEOUT=60)
+class VersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counters_expire(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            [version] = versions.get_versions(['scope'])
+        self.assertEqual(add.call_args.kwargs['timeout'], 60)
+
+        with mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            with self.captureOnCommitCallbacks(execute=True):
+                versions.bump(['scope'])
+        self.assertEqual(set_many.call_args.kwargs['timeout'], 60)
+        self.assertGreater(versions.get_versions(['scope'])[0], version)
+
+
+class GenerateInstitutionTests(TestCase):
+    def generate(self, **options):
+        call_command('generate_institution', scale=0.01, stdout=io.StringIO(), **options)
+
+    def test_generate(self):
+        self.generate()
+        # The denormalized post fields match the comments.
+        self.assertEqual(reconcile(), 0)
+        self.assertFalse(User.objects.get(enrollment_number='A0000000').has_usable_password())
+
+    def test_admin_password(self):
+        self.generate(admin_password='chosen')
+        self.assertTrue(User.objects.get(enrollment_number='A0000000').check_password('chosen'))
+
+    def test_needs_an_empty_database(self):
+        User.objects.create_superuser('ADMIN', 'Admin', 'secret')
+        with self.assertRaisesMessage(CommandError, 'already has users'):
+            self.generate()
+        self.assertEqual(User.objects.count(), 1)
+        self.generate(force=True)
+        with self.assertRaisesMessage(CommandError, 'already holds a generated institution'):
+            self.generate(force=True)
@@ -0,0 +1,123 @@
+"""
+Per-request tracing: query count, SQL time, view time and named spans such as
+serialization, collected by ``RequestTracingMiddleware``.
+
+Traces are logged as JSON on the ``lms.tracing`` logger and kept in a bounded
+in-memory ring buffer. When ``REQUEST_TRACING['ENABLED']`` is false the
+middleware removes itself at startup and ``span``/``annotate`` reduce to a
+context variable lookup.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('lms.tracing')
+
+_current = ContextVar('lms_trace', default=None)
+_buffer = deque(maxlen=settings.REQUEST_TRACING['BUFFER_SIZE'])
+_buffer_lock = threading.Lock()
+
+
+class Trace:
+    __slots__ = ('method', 'path', 'view', 'status', 'queries', 'sql_ms', 'total_ms', 'spans', 'tags')
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.view = None
+        self.status = None
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.total_ms = 0.0
+        self.spans = {}
+        self.tags = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed as a database execute wrapper for the traced request.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_ms += (time.perf_counter() - start) * 1000
+
+    def as_dict(self):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'view': self.view,
+            'status': self.status,
+            'queries': self.queries,
+            'sql_ms': round(self.sql_ms, 3),
+            'total_ms': round(self.total_ms, 3),
+            'spans': {name: round(ms, 3) for name, ms in self.spans.items()},
+            'tags': self.tags,
+        }
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block into the current trace, if there is one."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans[name] = trace.spans.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def annotate(**tags):
+    """Attach key/value pairs to the current trace, if there is one."""
+    trace = _current.get()
+    if trace is not None:
+        trace.tags.update(tags)
+
+
+def recent_traces():
+    with _buffer_lock:
+        return [trace.as_dict() for trace in _buffer]
+
+
+class RequestTracingMiddleware:
+    def __init__(self, get_response):
+        config = settings.REQUEST_TRACING
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        trace = Trace(request.method, request.path)
+        token = _current.set(trace)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(trace))
+                response = self.get_response(request)
+        finally:
+            trace.total_ms = (time.perf_counter() - start) * 1000
+            _current.reset(token)
+
+        match = getattr(request, 'resolver_match', None)
+        trace.view = match.view_name if match else None
+        trace.status = response.status_code
+        with _buffer_lock:
+            _buffer.append(trace)
+        logger.info(json.dumps(trace.as_dict(), default=str))
+        return response
@@ -0,0 +1,118 @@
+"""
+Version counters for conditional GETs.
+
+A scope (a whole model, or a slice of one such as a batch's timetable or a
+user's inbox) has a version in the cache: the time, in microseconds, of the
+last change to anything in it. Model signals ``bump`` the scopes a write
+touches once it commits. A view hands ``versioned_response`` the scopes its
+payload depends on; their versions are read with one cache round trip and
+become the response's ETag and Last-Modified, so a client polling with
+If-None-Match or If-Modified-Since gets a 304 without the view touching its
+tables or serializers.
+
+A version missing from the cache (evicted, expired after ``VERSION_TIMEOUT``,
+or the cache was cleared) restarts at the current time, which at worst makes
+clients fetch once more. Every scope read creates a counter, so scopes built
+from request input must only name rows that exist (see
+``courses.cache.batch_exists``). A version kept in a per-process cache would
+never see the bumps of writes handled by other workers and answer 304 for
+stale data indefinitely, so without
+``SHARED_CACHE`` nothing is versioned: the payload is built for every GET
+and its ETag is a hash of it, which still spares clients the download.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .replicas import use_primary
+
+PREFIX = 'version:'
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def model_scope(model, *parts):
+    """``'app.model'``, narrowed by ``parts``: ``model_scope(Receipt, 'user', 1)``."""
+    return ':'.join([model._meta.label_lower, *map(str, parts)])
+
+
+def bump(scopes):
+    """Move ``scopes`` to a new version once the surrounding transaction (if any) has committed."""
+    keys = [PREFIX + scope for scope in scopes]
+    if not keys or not settings.SHARED_CACHE:
+        return
+
+    def apply():
+        current = cache.get_many(keys)
+        now = _now()
+        # Never repeat a version, even if the clock steps back.
+        cache.set_many({key: max(now, current.get(key, 0) + 1) for key in keys}, timeout=settings.VERSION_TIMEOUT)
+    transaction.on_commit(apply)
+
+
+def get_versions(scopes):
+    keys = [PREFIX + scope for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    now = _now()
+    if missing:
+        for key in missing:
+            cache.add(key, now, timeout=settings.VERSION_TIMEOUT)
+        versions.update(cache.get_many(missing))
+    # A cache that keeps nothing (DummyCache) gives every response a new tag.
+    return [versions.get(key, now) for key in keys]
+
+
+def versioned_response(request, scopes, build):
+    """
+    Answer a GET whose payload only changes along with ``scopes``: a 304
+    when the client's validators are current, otherwise ``build()`` tagged
+    with ETag and Last-Modified.
+
+    The versions are read before ``build`` runs, so a change that lands
+    meanwhile is fetched again on the next poll rather than missed. The
+    payload is built on the primary, since a lagging replica could tag stale
+    rows with a current version.
+    """
+    if not settings.SHARED_CACHE:
+        return hashed_response(request, build())
+    versions = get_versions(scopes)
+    etag = _etag(request, '-'.join(map(str, versions)))
+    # Whole seconds; clients that must see every change send If-None-Match.
+    last_modified = max(versions) // 1_000_000
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        with use_primary():
+            response = Response(build())
+    response['Last-Modified'] = http_date(last_modified)
+    return _tag(response, etag)
+
+
+def hashed_response(request, data):
+    """``data``, or a 304 if the client's If-None-Match is a hash of it."""
+    digest = hashlib.md5(json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+    etag = _etag(request, digest)
+    return _tag(get_conditional_response(request, etag=etag) or Response(data), etag)
+
+
+def _etag(request, value):
+    # Each representation (JSON, MessagePack, the browsable API) gets its own tag.
+    return quote_etag(f'{request.accepted_renderer.format}-{value}')
+
+
+def _tag(response, etag):
+    response['ETag'] = etag
+    # Without this, browsers may reuse a response with a Last-Modified for a
+    # while without asking; revalidating every time is what makes polls cheap.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,7 +1,17 @@
-from django.contrib import admin
+import csv
+import io
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
 from .models import User, Student, Teacher
+from .roster import RosterImporter, read_rows
 
 
 class CustomUserAdmin(UserAdmin):
@@ -20,7 +30,65 @@ class CustomUserAdmin(UserAdmin):
     )
     search_fields = ('enrollment_number',)
     ordering = ('enrollment_number',)
+    change_list_template = 'admin/users/user/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='users_user_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:users_user_changelist')
+        max_rows = settings.ROSTER_ADMIN_MAX_ROWS
+        error = None
+        if request.method == 'POST' and request.FILES.get('file'):
+            stream = io.TextIOWrapper(request.FILES['file'].file, encoding='utf-8', newline='')
+            try:
+                rows = list(itertools.islice(read_rows(stream), max_rows + 1))
+            except (UnicodeDecodeError, csv.Error) as e:
+                error = f'The file could not be read as UTF-8 CSV: {e}'
+            else:
+                if len(rows) > max_rows:
+                    error = f'The file has more than {max_rows} rows; import it with "python manage.py import_roster".'
+                else:
+                    return self.import_rows(request, rows)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import roster',
+            'max_rows': max_rows,
+            'error': error,
+        }
+        return TemplateResponse(request, 'admin/users/user/import_form.html', context)
+
+    def import_rows(self, request, rows):
+        # A few threads, like logins get (hashlib releases the GIL), rather
+        # than a process per core inside a web request.
+        with ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING['WORKERS']) as pool:
+            importer = RosterImporter(
+                update_passwords=bool(request.POST.get('update_passwords')), pool=pool,
+                # Updating existing accounts is a change, and only a superuser
+                # may touch staff and superuser accounts.
+                allow_updates=self.has_change_permission(request),
+                allow_privileged=request.user.is_superuser)
+            summary = importer.run(rows)
+        for error in summary['errors'][:50]:
+            messages.error(request, error)
+        messages.success(
+            request,
+            f'Imported {summary["rows"] - len(summary["errors"])} of {summary["rows"]} rows in '
+            f'{summary["seconds"]:.1f}s: {summary["created"]} users created, {summary["updated"]} updated, '
+            f'{summary["enrollments"]} enrollments.')
+        return redirect('admin:users_user_changelist')
 
 admin.site.register(User, CustomUserAdmin)
-admin.site.register(Student)
-admin.site.register(Teacher)
\ No newline at end of file
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    # Students and teachers are named after their user.
+    list_select_related = ('user',)
+
+
+admin.site.register(Student, ProfileAdmin)
+admin.site.register(Teacher, ProfileAdmin)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import time
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+# Claims copied onto ClaimsUser; everything else is read from the database.
+CLAIMS = ('enrollment_number', 'first_name', 'user_type')
+
+
+def _not_before_key(user_id):
+    return f'auth:not-before:{user_id}'
+
+
+def revoke_tokens(user_id):
+    """
+    Reject access tokens issued to ``user_id`` up to now. Refreshed access
+    tokens keep the refresh token's ``iat``, so the record has to outlive
+    refresh tokens too; after that nothing it would reject can still exist.
+    """
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME).total_seconds()
+    cache.set(_not_before_key(user_id), int(time.time()) + 1, timeout=int(lifetime) + 1)
+
+
+def is_revoked(user_id, issued_at):
+    """Whether a token for ``user_id`` issued at ``issued_at`` was revoked since."""
+    not_before = cache.get(_not_before_key(user_id))
+    return not_before is not None and (issued_at or 0) < not_before
+
+
+class ClaimsUser:
+    """
+    Stand-in for ``User`` built from access token claims.
+
+    ``pk``, ``enrollment_number``, ``first_name``, ``user_type`` and the
+    student's ``batch_name`` are answered without a query. Reading any other
+    attribute loads the real user once and delegates to it.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        self.token = token
+        # Newer simplejwt versions put the id in the token as a string.
+        self.id = self.pk = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        for claim in CLAIMS:
+            if claim in token:
+                setattr(self, claim, token[claim])
+        if 'batch' in token:
+            self.batch_name = token['batch']
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set from the claims above.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if '_user' not in self.__dict__:
+            self._user = User.objects.get(pk=self.pk)
+        return getattr(self._user, name)
+
+    def __eq__(self, other):
+        return isinstance(other, (ClaimsUser, User)) and other.pk == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return getattr(self, 'enrollment_number', str(self.pk))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's claims instead of loading the
+    user row on every request. Tokens issued before a user's last revocation
+    (password change, deactivation, deletion) are rejected via the cache.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if is_revoked(user_id, validated_token.get('iat')):
+            raise InvalidToken(_('Token has been revoked'))
+
+        return ClaimsUser(validated_token)
@@ -0,0 +1,138 @@
+"""
+Password hashing policy.
+
+``PBKDF2PasswordHasher`` takes its work factor from
+``PASSWORD_HASHING['PBKDF2_ITERATIONS']`` so the cost of a login can be tuned
+to the deployment hardware (see the ``bench_hashers`` command). Django rehashes
+a stored password whenever its hasher or parameters differ from the preferred
+hasher's, so lowering or raising the setting upgrades or downgrades each hash
+on that user's next successful login.
+
+``check_password`` runs the comparison on a small bounded pool so a burst of
+logins occupies at most ``WORKERS`` cores, and gives up with ``HashingBusy``
+once ``QUEUE_SIZE`` more logins are already waiting. Bulk work such as a
+roster import instead hashes with ``hash_passwords`` on a process pool, which
+uses every core.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from lms import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING['PBKDF2_ITERATIONS'] or hashers.PBKDF2PasswordHasher.iterations
+
+
+class HashingBusy(Exception):
+    """Raised when too many password checks are already queued."""
+
+
+class HashingPool:
+    def __init__(self, workers, queue_size, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        # Slots for work that is running or queued; hashlib releases the GIL
+        # while hashing, so the workers really run in parallel.
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = settings.PASSWORD_HASHING
+            _pool = HashingPool(config['WORKERS'], config['QUEUE_SIZE'], config['QUEUE_TIMEOUT'])
+    return _pool
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    global _pool
+    if setting == 'PASSWORD_HASHING':
+        with _pool_lock:
+            _pool = None
+
+
+def _verify(raw_password, encoded):
+    # Runs on the pool: no database access here, only hashing.
+    rehashed = []
+    valid = hashers.check_password(
+        raw_password, encoded, setter=lambda raw: rehashed.append(hashers.make_password(raw)))
+    return valid, rehashed[0] if rehashed else None
+
+
+def check_password(user, raw_password):
+    """
+    ``user.check_password`` with the hashing done on the pool. A correct
+    password stored under an outdated policy is rehashed and saved. Raises
+    ``HashingBusy`` when the pool is saturated.
+    """
+    started = time.perf_counter()
+    with tracing.span('password_hash'):
+        valid, rehashed = get_pool().run(_verify, raw_password, user.password)
+    elapsed = (time.perf_counter() - started) * 1000
+    tracing.annotate(hash_ms=round(elapsed, 3))
+
+    budget = settings.PASSWORD_HASHING['BUDGET_MS']
+    if budget and elapsed > budget:
+        logger.warning('Password check took %.0fms, over the %.0fms budget', elapsed, budget)
+
+    if rehashed is not None:
+        user.password = rehashed
+        # Same password, new hash: not a credential change, so existing
+        # tokens are not revoked (see users/signals.py).
+        user._password_rehashed = True
+        user.save(update_fields=['password'])
+    return valid
+
+
+def _init_process():
+    # Workers started with "spawn" (macOS, Windows) import nothing up front.
+    if not apps.ready:
+        django.setup()
+
+
+def process_pool(workers=None):
+    """A process pool for ``hash_passwords``; ``workers`` defaults to the CPU count."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_process)
+
+
+def hash_passwords(raw_passwords, pool=None):
+    """
+    ``make_password`` for each of ``raw_passwords`` (``None`` gives an unusable
+    password), spread over ``pool`` if one is given.
+    """
+    if pool is None:
+        return [hashers.make_password(raw) for raw in raw_passwords]
+    # Each hash takes long enough that sending them one at a time costs
+    # nothing and keeps every worker busy to the end.
+    return list(pool.map(hashers.make_password, raw_passwords))
@@ -0,0 +1,45 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from users.hashers import PBKDF2PasswordHasher
+
+
+class Command(BaseCommand):
+    help = ('Time one password hash with each configured hasher on this machine and, '
+            'given --budget-ms, suggest PASSWORD_PBKDF2_ITERATIONS to fit the budget.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--budget-ms', type=float, default=settings.PASSWORD_HASHING['BUDGET_MS'],
+                            help='Target CPU time per login; defaults to PASSWORD_BUDGET_MS.')
+
+    def handle(self, rounds=5, budget_ms=0, **options):
+        for hasher in get_hashers():
+            try:
+                salt = hasher.salt()
+                samples = []
+                for _ in range(rounds):
+                    started = time.perf_counter()
+                    hasher.encode('bench-hashers-password', salt)
+                    samples.append((time.perf_counter() - started) * 1000)
+            except (ValueError, ImportError) as e:
+                # e.g. argon2/bcrypt hashers without their library installed
+                self.stdout.write(f'{hasher.algorithm:<16} unavailable: {e}')
+                continue
+            ms = statistics.median(samples)
+            preferred = ' (preferred)' if hasher is get_hashers()[0] else ''
+            self.stdout.write(f'{hasher.algorithm:<16} {ms:8.1f}ms  {1000 / ms:7.1f} hashes/s per core{preferred}')
+
+            if budget_ms and isinstance(hasher, PBKDF2PasswordHasher):
+                suggested = int(hasher.iterations * budget_ms / ms) // 1000 * 1000
+                self.stdout.write(
+                    f'{"":<16} {hasher.iterations} iterations now; '
+                    f'PASSWORD_PBKDF2_ITERATIONS={suggested} fits {budget_ms:.0f}ms')
+
+        config = settings.PASSWORD_HASHING
+        self.stdout.write(
+            f'Login hashing runs on {config["WORKERS"]} worker(s) with up to {config["QUEUE_SIZE"]} queued.')
@@ -0,0 +1,92 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from base.models import Batch
+from users.models import Student, User
+from users.views import MyTokenObtainPairView
+
+PASSWORD = 'bench-login-password'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Measure token issuance: logins per second and database queries per login. '
+            'Runs against throwaway students inside a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Times each user logs in.')
+        parser.add_argument('--json', action='store_true', dest='as_json', help='Print the report as JSON.')
+
+    def handle(self, users=20, rounds=3, as_json=False, **options):
+        try:
+            with transaction.atomic():
+                report = self.run(users, rounds)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f'{report["logins"]} logins in {report["seconds"]:.2f}s ({report["logins_per_second"]:.1f}/s), '
+            f'p50 {report["p50_ms"]:.1f}ms, p95 {report["p95_ms"]:.1f}ms')
+        self.stdout.write(
+            f'queries per login: {report["queries_per_login"]} '
+            f'({report["reads_per_login"]} reads, {report["writes_per_login"]} writes)')
+
+    def run(self, users, rounds):
+        batch = Batch.objects.create(name='BNCH')
+        # Hash once; every throwaway account shares the password.
+        password = make_password(PASSWORD)
+        accounts = User.objects.bulk_create(
+            User(enrollment_number=f'BL{i:07d}', first_name='Bench', user_type=User.STUDENT, password=password)
+            for i in range(users)
+        )
+        Student.objects.bulk_create(Student(user=user, batch=batch) for user in accounts)
+
+        view = MyTokenObtainPairView.as_view()
+        factory = APIRequestFactory()
+        timings, queries = [], []
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for user in accounts:
+                request = factory.post('/api/users/token/', {
+                    'enrollment_number': user.enrollment_number,
+                    'password': PASSWORD,
+                }, format='json')
+                with CaptureQueriesContext(connection) as captured:
+                    login_started = time.perf_counter()
+                    response = view(request)
+                    timings.append((time.perf_counter() - login_started) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f'Login failed: {response.status_code} {response.data}')
+                queries.append([query['sql'] for query in captured.captured_queries])
+        elapsed = time.perf_counter() - started
+
+        per_login = queries[-1]
+        reads = sum(1 for sql in per_login if sql.lstrip().upper().startswith('SELECT'))
+        quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+        return {
+            'logins': len(timings),
+            'seconds': round(elapsed, 3),
+            'logins_per_second': round(len(timings) / max(elapsed, 1e-9), 1),
+            'p50_ms': round(quantiles[49], 2),
+            'p95_ms': round(quantiles[94], 2),
+            'queries_per_login': len(per_login),
+            'reads_per_login': reads,
+            'writes_per_login': len(per_login) - reads,
+            'queries': per_login,
+        }
@@ -0,0 +1,39 @@
+import os
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+
+from users.hashers import process_pool
+from users.roster import RosterImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Create or update students and teachers from a roster CSV '
+            '(enrollment_number, first_name, last_name, user_type, batch, courses, password).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows hashed and written together.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Password hashing processes; 0 hashes in this process.')
+        parser.add_argument('--update-passwords', action='store_true',
+                            help='Also reset the passwords of existing users whose row has one.')
+
+    def handle(self, path, chunk_size=1000, workers=None, update_passwords=False, **options):
+        def progress(summary):
+            self.stdout.write(
+                f'{summary["rows"]:>9,} rows  {summary["created"]:>9,} created  {summary["updated"]:>9,} updated  '
+                f'{summary["rows"] / max(summary["seconds"], 1e-9):8.0f} rows/s')
+
+        with process_pool(workers) if workers else nullcontext() as pool:
+            importer = RosterImporter(chunk_size=chunk_size, update_passwords=update_passwords, pool=pool)
+            with open(path, newline='', encoding='utf-8') as stream:
+                summary = importer.run(read_rows(stream), progress=progress)
+
+        for error in summary['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {summary["rows"] - len(summary["errors"])} of {summary["rows"]} rows in '
+            f'{summary["seconds"]:.2f}s ({summary["rows"] / max(summary["seconds"], 1e-9):.0f} rows/s): '
+            f'{summary["created"]} users created, {summary["updated"]} updated, '
+            f'{summary["enrollments"]} enrollments.'))
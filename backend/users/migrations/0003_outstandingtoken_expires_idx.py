@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index token_blacklist's expires_at for compact_tokens. The table belongs to
+    simplejwt, so the index is created with SQL understood by SQLite and
+    PostgreSQL alike.
+    """
+
+    dependencies = [
+        ('users', '0002_alter_student_options_alter_teacher_options_and_more'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS users_outstandingtoken_expires_idx '
+            'ON token_blacklist_outstandingtoken (expires_at)',
+            'DROP INDEX IF EXISTS users_outstandingtoken_expires_idx',
+        ),
+    ]
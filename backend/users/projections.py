@@ -0,0 +1,24 @@
+from operator import attrgetter
+
+from lms.projections import ProjectionSerializer
+
+
+def user_columns(path):
+    """The ``UserSerializer`` columns of the user at ``path``."""
+    return tuple(f'{path}__{field}' for field in ('id', 'enrollment_number', 'first_name', 'last_name'))
+
+
+def represent_user(user_id, enrollment_number, first_name, last_name):
+    return {'id': user_id, 'enrollment_number': enrollment_number, 'first_name': first_name, 'last_name': last_name}
+
+
+class StudentProjection(ProjectionSerializer):
+    """``StudentSerializer`` output."""
+    columns = user_columns('user') + ('batch_id', 'batch__name')
+    user = attrgetter(*user_columns('user'))
+
+    def to_representation(self, row):
+        return {
+            'user': represent_user(*self.user(row)),
+            'batch': None if row.batch_id is None else {'id': row.batch_id, 'name': row.batch__name},
+        }
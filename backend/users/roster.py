@@ -0,0 +1,264 @@
+"""
+Bulk roster import.
+
+Rows describe one person each::
+
+    enrollment_number,first_name,last_name,user_type,batch,courses,password
+    S00000001,Asha,Rao,S,A1,CS101;MA102,changeme
+    T00000001,Ravi,Iyer,T,,,changeme
+
+``user_type`` is ``S``/``student`` or ``T``/``teacher``, ``batch`` a batch name
+(created if missing; students only) and ``courses`` a ``;`` separated list of
+course codes to enrol a student in. A blank ``password`` gives an unusable
+password until one is set.
+
+The file is read and written ``chunk_size`` rows at a time: passwords are
+hashed on a pool, then the chunk's users, profiles and enrollments are written
+with a few bulk queries in one transaction. Importing the same file again
+updates names, types and batches and adds missing enrollments, but keeps
+existing passwords unless ``update_passwords`` is set and the row gives one.
+A user whose type changes loses the other type's profile: a former student's
+enrollments go with it, a former teacher's timetable rows are left without a
+teacher.
+Invalid rows are skipped and reported; the rest of the file is still imported,
+and so are rows for existing users when ``allow_updates`` is unset and rows for
+staff and superuser accounts when ``allow_privileged`` is unset.
+"""
+import csv
+import itertools
+import time
+
+from django.db import transaction
+
+from base import inbox
+from base.models import Batch
+from courses.cache import BATCH_NAMES, invalidate, keys_for_timetables, keys_for_users
+from courses.models import Course, TimeTable
+
+from .authentication import revoke_tokens
+from .hashers import hash_passwords
+from .models import Student, Teacher, User
+from .tokens import blacklist_users
+
+FIELDS = ['enrollment_number', 'first_name', 'last_name', 'user_type', 'batch', 'courses', 'password']
+
+USER_TYPES = {
+    'S': User.STUDENT, 'STUDENT': User.STUDENT,
+    'T': User.TEACHER, 'TEACHER': User.TEACHER,
+}
+
+ENROLLMENT_NUMBER_LENGTH = User._meta.get_field('enrollment_number').max_length
+FIRST_NAME_LENGTH = User._meta.get_field('first_name').max_length
+LAST_NAME_LENGTH = User._meta.get_field('last_name').max_length
+BATCH_NAME_LENGTH = Batch._meta.get_field('name').max_length
+
+
+def read_rows(stream):
+    """Yield row dicts from a CSV text stream without loading it whole."""
+    for row in csv.DictReader(stream):
+        row['courses'] = [code.strip() for code in (row.get('courses') or '').split(';') if code.strip()]
+        yield row
+
+
+class RosterImporter:
+    def __init__(self, chunk_size=1000, update_passwords=False, pool=None, allow_updates=True,
+                 allow_privileged=True):
+        self.chunk_size = chunk_size
+        self.update_passwords = update_passwords
+        # The admin clears these for staff who may only add users, or who
+        # are not superusers themselves.
+        self.allow_updates = allow_updates
+        self.allow_privileged = allow_privileged
+        # An executor to hash passwords on (users.hashers.process_pool, say);
+        # hashes in-process without one.
+        self.pool = pool
+        self.courses = dict(Course.objects.values_list('code', 'pk'))
+        self.batches = dict(Batch.objects.values_list('name', 'pk'))
+        self.seen = set()
+
+    def build(self, row):
+        number = (row.get('enrollment_number') or '').strip()
+        if not number:
+            raise ValueError('enrollment_number is required')
+        if len(number) > ENROLLMENT_NUMBER_LENGTH:
+            raise ValueError(f'enrollment_number {number!r} is longer than {ENROLLMENT_NUMBER_LENGTH}')
+        if number in self.seen:
+            raise ValueError(f'{number} appears more than once')
+
+        first_name = (row.get('first_name') or '').strip()
+        if not first_name:
+            raise ValueError('first_name is required')
+        if len(first_name) > FIRST_NAME_LENGTH:
+            raise ValueError(f'first_name is longer than {FIRST_NAME_LENGTH}')
+        last_name = (row.get('last_name') or '').strip()
+        if len(last_name) > LAST_NAME_LENGTH:
+            raise ValueError(f'last_name is longer than {LAST_NAME_LENGTH}')
+
+        user_type = USER_TYPES.get((row.get('user_type') or 'S').strip().upper())
+        if user_type is None:
+            raise ValueError(f'invalid user_type {row.get("user_type")!r}')
+
+        batch = (row.get('batch') or '').strip()
+        if len(batch) > BATCH_NAME_LENGTH:
+            raise ValueError(f'batch {batch!r} is longer than {BATCH_NAME_LENGTH}')
+        courses = row.get('courses') or []
+        unknown = [code for code in courses if code not in self.courses]
+        if unknown:
+            raise ValueError(f'unknown courses {", ".join(unknown)}')
+        if user_type == User.TEACHER and (batch or courses):
+            raise ValueError('teachers have no batch or courses')
+
+        self.seen.add(number)
+        user = User(
+            enrollment_number=number,
+            first_name=first_name,
+            last_name=last_name,
+            user_type=user_type,
+        )
+        return user, batch or None, courses, row.get('password') or None
+
+    def screen(self, built):
+        """
+        Split ``(line, entry)`` pairs into the entries this import may write and
+        ``(line, message)`` errors for the existing users it may not touch.
+        """
+        if self.allow_updates and self.allow_privileged:
+            return [entry for _, entry in built], []
+        existing = {
+            number: is_staff or is_superuser for number, is_staff, is_superuser in User.objects.filter(
+                enrollment_number__in=[user.enrollment_number for _, (user, _, _, _) in built]
+            ).values_list('enrollment_number', 'is_staff', 'is_superuser')
+        }
+        entries, errors = [], []
+        for line, entry in built:
+            number = entry[0].enrollment_number
+            if number not in existing:
+                entries.append(entry)
+            elif not self.allow_updates:
+                errors.append((line, f'{number} already exists and may not be changed'))
+            elif existing[number] and not self.allow_privileged:
+                errors.append((line, f'{number} is a staff account and may only be changed by a superuser'))
+            else:
+                entries.append(entry)
+        return entries, errors
+
+    def write(self, entries):
+        """Upsert one chunk of built rows; returns (created, updated, enrolled)."""
+        numbers = [user.enrollment_number for user, _, _, _ in entries]
+        existing = {
+            number: (pk, user_type) for number, pk, user_type in User.objects.filter(
+                enrollment_number__in=numbers).values_list('enrollment_number', 'pk', 'user_type')
+        }
+
+        new_users, old_users, retyped_users, reset_users, raw_passwords = [], [], [], [], []
+        for user, _, _, password in entries:
+            if user.enrollment_number in existing:
+                user.pk, previous_type = existing[user.enrollment_number]
+                old_users.append(user)
+                if user.user_type != previous_type:
+                    retyped_users.append(user)
+                if self.update_passwords and password:
+                    reset_users.append(user)
+                    raw_passwords.append((user, password))
+            else:
+                new_users.append(user)
+                raw_passwords.append((user, password))
+        # Hashed before the transaction so it only holds locks while writing.
+        hashed = hash_passwords((password for _, password in raw_passwords), self.pool)
+        for (user, _), encoded in zip(raw_passwords, hashed):
+            user.password = encoded
+
+        missing = {batch for _, batch, _, _ in entries if batch and batch not in self.batches}
+        with transaction.atomic():
+            if missing:
+                Batch.objects.bulk_create([Batch(name=name) for name in sorted(missing)])
+                self.batches.update(Batch.objects.filter(name__in=missing).values_list('name', 'pk'))
+                invalidate([BATCH_NAMES])
+
+            User.objects.bulk_create(new_users, batch_size=self.chunk_size)
+            User.objects.bulk_update(old_users, ['first_name', 'last_name', 'user_type'], batch_size=self.chunk_size)
+            # Timetables show their teacher's name; bulk_update skips the
+            # post_save handler that drops them when a teacher is renamed.
+            teachers = [user.pk for user in old_users if user.user_type == User.TEACHER]
+            if teachers:
+                invalidate(keys_for_timetables(TimeTable.objects.filter(teacher_id__in=teachers)))
+            User.objects.bulk_update(reset_users, ['password'], batch_size=self.chunk_size)
+            former_students = [user.pk for user in retyped_users if user.user_type != User.STUDENT]
+            if retyped_users:
+                # Through the ORM, so the delete signals drop cached timetables.
+                Student.objects.filter(pk__in=former_students).delete()
+                Teacher.objects.filter(
+                    pk__in=[user.pk for user in retyped_users if user.user_type != User.TEACHER]).delete()
+            # Not every backend returns primary keys from bulk inserts.
+            ids = dict(User.objects.filter(enrollment_number__in=numbers).values_list('enrollment_number', 'pk'))
+
+            students = [
+                Student(user_id=ids[user.enrollment_number], batch_id=self.batches.get(batch))
+                for user, batch, _, _ in entries if user.user_type == User.STUDENT
+            ]
+            has_profile = set(Student.objects.filter(pk__in=[s.pk for s in students]).values_list('pk', flat=True))
+            Student.objects.bulk_create(
+                [s for s in students if s.pk not in has_profile], batch_size=self.chunk_size)
+            Student.objects.bulk_update(
+                [s for s in students if s.pk in has_profile], ['batch'], batch_size=self.chunk_size)
+            Teacher.objects.bulk_create([
+                Teacher(user_id=ids[user.enrollment_number])
+                for user, _, _, _ in entries if user.user_type == User.TEACHER
+            ], batch_size=self.chunk_size, ignore_conflicts=True)
+
+            Enrollment = Course.student.through
+            enrollments = [
+                Enrollment(course_id=self.courses[code], student_id=ids[user.enrollment_number])
+                for user, _, courses, _ in entries
+                for code in courses
+            ]
+            Enrollment.objects.bulk_create(enrollments, batch_size=self.chunk_size, ignore_conflicts=True)
+            # Bulk writes send no signals; drop the cached course lists and
+            # bring the students' notification inboxes in line.
+            invalidate(keys_for_users(ids.values()))
+            inbox.sync_users([student.pk for student in students] + former_students)
+
+            if reset_users:
+                # bulk_update skips the signal that revokes tokens on a
+                # password change.
+                revoked = [user.pk for user in reset_users]
+                blacklist_users(revoked)
+
+                def revoke():
+                    for user_id in revoked:
+                        revoke_tokens(user_id)
+                transaction.on_commit(revoke)
+        return len(new_users), len(old_users), len(enrollments)
+
+    def run(self, rows, progress=None):
+        """
+        Import ``rows``, calling ``progress(summary)`` after each chunk.
+        Returns a summary dict: rows read, users created and updated,
+        enrollments written (including ones that already existed), error
+        messages and elapsed seconds.
+        """
+        summary = {'rows': 0, 'created': 0, 'updated': 0, 'enrollments': 0, 'errors': [], 'seconds': 0.0}
+        started = time.perf_counter()
+        rows = enumerate(rows, start=1)
+        while True:
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            built, failed = [], []
+            for line, row in chunk:
+                try:
+                    built.append((line, self.build(row)))
+                except (ValueError, TypeError) as e:
+                    failed.append((line, e))
+            entries, refused = self.screen(built)
+            summary['errors'].extend(f'row {line}: {e}' for line, e in sorted(failed + refused))
+            if entries:
+                created, updated, enrolled = self.write(entries)
+                summary['created'] += created
+                summary['updated'] += updated
+                summary['enrollments'] += enrolled
+            summary['rows'] += len(chunk)
+            summary['seconds'] = time.perf_counter() - started
+            if progress:
+                progress(summary)
+        return summary
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import revoke_tokens
+from .models import User
+from .tokens import blacklist_users
+
+
+@receiver(pre_save, sender=User)
+def remember_credentials(sender, instance, **kwargs):
+    instance._previous_credentials = None
+    if instance.pk:
+        instance._previous_credentials = sender.objects.filter(
+            pk=instance.pk).values_list('password', 'is_active').first()
+
+
+@receiver(post_save, sender=User)
+def revoke_on_credentials_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_credentials', None)
+    if getattr(instance, '_password_rehashed', False):
+        instance._password_rehashed = False
+        return
+    if previous is not None and previous != (instance.password, instance.is_active):
+        revoke_tokens(instance.pk)
+        blacklist_users([instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def blacklist_on_delete(sender, instance, **kwargs):
+    # Before the delete detaches the outstanding tokens from the user.
+    blacklist_users([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def revoke_on_delete(sender, instance, **kwargs):
+    revoke_tokens(instance.pk)
@@ -1,3 +1,486 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from base.models import Batch
+from courses.models import Course, TimeTable
+from lms.synthetic import PASSWORD
+from lms.testing import BudgetTestCase
+
+from . import hashers
+from .authentication import ClaimsJWTAuthentication, is_revoked, revoke_tokens
+from .models import Student, Teacher, User
+from .projections import StudentProjection
+from .roster import RosterImporter
+from .serializers import StudentSerializer
+from . import tokens
+from .management.commands.compact_tokens import compact
+from .tokens import RefreshToken
+from .views import MyTokenObtainPairSerializer
+
+
+class EndpointBudgetTests(BudgetTestCase):
+    def test_login(self):
+        student = self.data.student
+        self.assertBudget('POST', '/api/users/token/', queries=2, size=1_000,
+                          data={'enrollment_number': student.enrollment_number, 'password': PASSWORD})
+
+    def test_refresh(self):
+        token = RefreshToken.for_user(self.data.student)
+        # The blacklist check is a query unless the cache is shared.
+        self.assertBudget('POST', '/api/users/token/refresh/', queries=6, size=1_000, data={'refresh': str(token)})
+
+    @override_settings(SHARED_CACHE=True)
+    def test_refresh_shared_cache(self):
+        token = RefreshToken.for_user(self.data.student)
+        self.assertBudget('POST', '/api/users/token/refresh/', queries=5, size=1_000, data={'refresh': str(token)})
+
+    def test_user_detail(self):
+        student = self.data.student
+        self.assertBudget('GET', f'/api/users/{student.enrollment_number}', queries=3, size=500, user=student)
+
+    def test_projections(self):
+        Student.objects.filter(pk=self.data.student.pk).update(batch=None)
+        students = Student.objects.order_by('pk')
+        self.assertSameRepresentation(
+            StudentProjection(students, many=True),
+            StudentSerializer(students.select_related('user', 'batch'), many=True))
+
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('S1', 'First', 'secret', last_name='Last')
+        Student.objects.create(user=cls.user, batch=Batch.objects.create(name='A1'))
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return ClaimsJWTAuthentication().authenticate(request)
+
+    def access_token(self):
+        return MyTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def test_claims_need_no_query(self):
+        token = self.access_token()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+            self.assertEqual(
+                (user.pk, user.enrollment_number, user.first_name, user.user_type, user.batch_name),
+                (self.user.pk, 'S1', 'First', User.STUDENT, 'A1'))
+            self.assertEqual(user, self.user)
+        # Anything else loads the user, once.
+        with self.assertNumQueries(1):
+            self.assertEqual(user.last_name, 'Last')
+            self.assertTrue(user.check_password('secret'))
+
+        # simplejwt 5.3 and later put the id in the token as a string.
+        token[api_settings.USER_ID_CLAIM] = str(self.user.pk)
+        user, _ = self.authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_password_change_revokes(self):
+        token = self.access_token()
+        self.authenticate(token)
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertTrue(is_revoked(self.user.pk, token['iat']))
+        with self.assertRaises(InvalidToken):
+            self.authenticate(token)
+        # Tokens issued from the next second on are accepted.
+        self.assertFalse(is_revoked(self.user.pk, int(time.time()) + 2))
+
+    def test_other_changes_do_not_revoke(self):
+        token = self.access_token()
+        self.user.last_name = 'Renamed'
+        self.user.save()
+        self.assertFalse(is_revoked(self.user.pk, token['iat']))
+        self.authenticate(token)
+
+    def test_deactivation_and_deletion_revoke(self):
+        token = self.access_token()
+        self.user.is_active = False
+        self.user.save()
+        self.assertTrue(is_revoked(self.user.pk, token['iat']))
+
+        cache.clear()
+        self.assertFalse(is_revoked(self.user.pk, token['iat']))
+        self.user.delete()
+        self.assertTrue(is_revoked(token['user_id'], token['iat']))
+
+    def test_revoke_tokens(self):
+        self.assertFalse(is_revoked(self.user.pk, int(time.time())))
+        revoke_tokens(self.user.pk)
+        self.assertTrue(is_revoked(self.user.pk, int(time.time())))
+        self.assertTrue(is_revoked(self.user.pk, None))
+
+
+def hashing(**config):
+    return override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING, **config})
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with hashing(PBKDF2_ITERATIONS=1000):
+            self.user = User.objects.create_user('T1', 'First', 'secret', user_type=User.TEACHER)
+
+    def login(self, password='secret'):
+        return self.client.post(
+            reverse('token_obtain_pair'),
+            {'enrollment_number': 'T1', 'password': password},
+            content_type='application/json')
+
+    def test_login_rehashes_outdated_hash(self):
+        self.assertIn('$1000$', self.user.password)
+        token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        with hashing(PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+            self.user.refresh_from_db()
+            self.assertIn('$2000$', self.user.password)
+            self.assertTrue(self.user.check_password('secret'))
+        # A rehash is not a credential change.
+        self.assertFalse(is_revoked(self.user.pk, token['iat']))
+
+    def test_wrong_password_keeps_hash(self):
+        encoded = self.user.password
+        with hashing(PBKDF2_ITERATIONS=2000):
+            self.assertNotEqual(self.login('wrong').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, encoded)
+
+    def test_current_hash_is_not_saved_again(self):
+        with hashing(PBKDF2_ITERATIONS=1000), self.assertNumQueries(0):
+            self.assertTrue(hashers.check_password(self.user, 'secret'))
+
+    def test_busy_pool(self):
+        pool = hashers.HashingPool(workers=1, queue_size=1, timeout=0)
+        release = threading.Event()
+        running = [threading.Thread(target=pool.run, args=(release.wait,)) for _ in range(2)]
+        for thread in running:
+            thread.start()
+        try:
+            while pool._slots._value:
+                time.sleep(0.01)
+            with self.assertRaises(hashers.HashingBusy):
+                pool.run(int)
+        finally:
+            release.set()
+            for thread in running:
+                thread.join()
+        self.assertEqual(pool.run(int, '1'), 1)
+
+    def test_busy_pool_rejects_login(self):
+        release = threading.Event()
+        with hashing(WORKERS=1, QUEUE_SIZE=0, QUEUE_TIMEOUT=0):
+            busy = threading.Thread(target=hashers.get_pool().run, args=(release.wait,))
+            busy.start()
+            try:
+                while hashers.get_pool()._slots._value:
+                    time.sleep(0.01)
+                with self.assertLogs('users.views', 'WARNING'):
+                    response = self.login()
+            finally:
+                release.set()
+                busy.join()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class RefreshTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('T1', 'First', 'secret', user_type=User.TEACHER)
+
+    def setUp(self):
+        cache.clear()
+        tokens.blacklisted.clear()
+
+    def refresh(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(token)}, content_type='application/json')
+
+    def another_worker(self):
+        # What a worker that saw none of this process's writes has to go on.
+        cache.clear()
+        tokens.blacklisted.clear()
+
+    def test_rotation_blacklists_the_old_token(self):
+        old = RefreshToken.for_user(self.user)
+        response = self.refresh(old)
+        self.assertEqual(response.status_code, 200)
+        new = response.json()['refresh']
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=old['jti']).exists())
+        self.assertTrue(OutstandingToken.objects.filter(jti=RefreshToken(new)['jti']).exists())
+
+        self.assertEqual(self.refresh(old).status_code, 401)
+        self.another_worker()
+        self.assertEqual(self.refresh(old).status_code, 401)
+        self.assertEqual(self.refresh(new).status_code, 200)
+
+    def test_logout_on_another_worker(self):
+        token = RefreshToken.for_user(self.user)
+        # This worker has checked the token and found it outstanding...
+        self.assertFalse(tokens.is_blacklisted(token['jti'], token['exp']))
+        # ...then another one blacklists it, writing only to its own cache.
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        self.assertTrue(tokens.is_blacklisted(token['jti'], token['exp']))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_logout(self):
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()
+        with self.assertNumQueries(0):
+            self.assertTrue(tokens.is_blacklisted(token['jti'], token['exp']))
+        self.another_worker()
+        self.assertTrue(tokens.is_blacklisted(token['jti'], token['exp']))
+        # Found in the database, and remembered from then on.
+        with self.assertNumQueries(0):
+            self.assertTrue(tokens.is_blacklisted(token['jti'], token['exp']))
+
+    def test_credential_changes_blacklist_refresh_tokens(self):
+        for change in ('password', 'deactivation'):
+            with self.subTest(change=change):
+                token = RefreshToken.for_user(self.user)
+                if change == 'password':
+                    self.user.set_password('changed')
+                else:
+                    self.user.is_active = False
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.user.save()
+                # Rejected even where the revocation marker never reached.
+                self.another_worker()
+                self.assertEqual(self.refresh(token).status_code, 401)
+                self.assertTrue(BlacklistedToken.objects.filter(token__jti=token['jti']).exists())
+
+    def test_deletion_blacklists_refresh_tokens(self):
+        token = RefreshToken.for_user(self.user)
+        self.user.delete()
+        self.another_worker()
+        self.assertTrue(tokens.is_blacklisted(token['jti'], token['exp']))
+
+    @override_settings(SHARED_CACHE=True)
+    def test_shared_cache(self):
+        token = RefreshToken.for_user(self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(tokens.is_blacklisted(token['jti'], token['exp']))
+        token.blacklist()
+        tokens.blacklisted.clear()
+        with self.assertNumQueries(0):
+            self.assertTrue(tokens.is_blacklisted(token['jti'], token['exp']))
+        # An outstanding state read from the database never overwrites it.
+        tokens.remember(token['jti'], token['exp'], tokens.OUTSTANDING)
+        self.assertTrue(tokens.is_blacklisted(token['jti'], token['exp']))
+
+    def test_compact(self):
+        live, blacklisted_live, expired, blacklisted_expired = (RefreshToken.for_user(self.user) for _ in range(4))
+        for token in (blacklisted_live, blacklisted_expired):
+            token.blacklist()
+        OutstandingToken.objects.filter(jti__in=[expired['jti'], blacklisted_expired['jti']]).update(
+            expires_at=aware_utcnow() - timedelta(minutes=1))
+
+        self.assertEqual(compact(batch_size=1), 2)
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)),
+            {live['jti'], blacklisted_live['jti']})
+        self.assertEqual(
+            list(BlacklistedToken.objects.values_list('token__jti', flat=True)), [blacklisted_live['jti']])
+        self.assertEqual(compact(), 0)
+
+
+def roster_row(enrollment_number, first_name='First', user_type='S', batch='', courses=(), password='', **row):
+    return {'enrollment_number': enrollment_number, 'first_name': first_name, 'last_name': '',
+            'user_type': user_type, 'batch': batch, 'courses': list(courses), 'password': password, **row}
+
+
+@hashing(PBKDF2_ITERATIONS=1000)
+class RosterImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = [Course.objects.create(name=code, code=code) for code in ('CS101', 'MA102')]
+
+    def setUp(self):
+        cache.clear()
+
+    def run_import(self, *rows, **options):
+        return RosterImporter(chunk_size=2, **options).run(rows)
+
+    def test_upsert(self):
+        summary = self.run_import(
+            roster_row('S1', batch='A1', courses=['CS101']),
+            roster_row('S2', batch='A1'),
+            roster_row('T1', user_type='teacher'),
+        )
+        self.assertEqual((summary['rows'], summary['created'], summary['updated'], summary['errors']), (3, 3, 0, []))
+        self.assertEqual(Student.objects.get(pk=User.objects.get(enrollment_number='S1')).batch.name, 'A1')
+        self.assertTrue(Teacher.objects.filter(user__enrollment_number='T1').exists())
+
+        summary = self.run_import(
+            roster_row('S1', first_name='Renamed', batch='B2', courses=['CS101', 'MA102']),
+            roster_row('S3'),
+        )
+        self.assertEqual((summary['created'], summary['updated']), (1, 1))
+        student = Student.objects.select_related('user', 'batch').get(user__enrollment_number='S1')
+        self.assertEqual((student.user.first_name, student.batch.name), ('Renamed', 'B2'))
+        self.assertEqual(sorted(student.course_set.values_list('code', flat=True)), ['CS101', 'MA102'])
+        self.assertEqual(Course.student.through.objects.count(), 2)
+        self.assertEqual(Batch.objects.filter(name__in=['A1', 'B2']).count(), 2)
+
+    def test_passwords(self):
+        self.run_import(roster_row('S1', password='first'), roster_row('S2'))
+        user = User.objects.get(enrollment_number='S1')
+        self.assertTrue(user.check_password('first'))
+        self.assertFalse(User.objects.get(enrollment_number='S2').has_usable_password())
+        refresh = MyTokenObtainPairSerializer.get_token(user)
+        token = refresh.access_token
+
+        # Kept unless asked to reset, and then only where the row has one.
+        self.run_import(roster_row('S1', password='second'), roster_row('S2'))
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('first'))
+        self.assertFalse(is_revoked(user.pk, token['iat']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(roster_row('S1', password='second'), roster_row('S2'), update_passwords=True)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('second'))
+        self.assertFalse(User.objects.get(enrollment_number='S2').has_usable_password())
+        self.assertTrue(is_revoked(user.pk, token['iat']))
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=refresh['jti']).exists())
+
+    def test_bad_rows(self):
+        summary = self.run_import(
+            roster_row(''),
+            roster_row('S1'),
+            roster_row('S1'),
+            roster_row('S2', first_name=''),
+            roster_row('S3', user_type='X'),
+            roster_row('S4', courses=['XX999']),
+            roster_row('T1', user_type='T', batch='A1'),
+            roster_row('S123456789'),
+            roster_row('S5', batch='BATCH'),
+            roster_row('S6'),
+            roster_row('S7', first_name='F' * 51),
+            roster_row('S8', last_name='L' * 51),
+        )
+        self.assertEqual((summary['rows'], summary['created']), (12, 2))
+        self.assertEqual(summary['errors'], [
+            'row 1: enrollment_number is required',
+            'row 3: S1 appears more than once',
+            'row 4: first_name is required',
+            "row 5: invalid user_type 'X'",
+            'row 6: unknown courses XX999',
+            'row 7: teachers have no batch or courses',
+            "row 8: enrollment_number 'S123456789' is longer than 9",
+            "row 9: batch 'BATCH' is longer than 4",
+            'row 11: first_name is longer than 50',
+            'row 12: last_name is longer than 50',
+        ])
+        self.assertEqual(sorted(User.objects.values_list('enrollment_number', flat=True)), ['S1', 'S6'])
+
+    @override_settings(SHARED_CACHE=True)
+    def test_renaming_a_teacher_drops_cached_timetables(self):
+        self.run_import(roster_row('T1', first_name='Old', user_type='T'), roster_row('S1', batch='A1'))
+        TimeTable.objects.create(
+            course=self.courses[0], teacher_id=User.objects.get(enrollment_number='T1').pk, day=1,
+            start_time='09:00', end_time='10:00').batch.add(Batch.objects.get(name='A1'))
+        url = '/api/courses/time-table/A1/?day=1'
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]['teacher']['user']['first_name'], 'Old')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(roster_row('T1', first_name='New', user_type='T'))
+        renamed = self.client.get(url)
+        self.assertEqual(renamed.data[0]['teacher']['user']['first_name'], 'New')
+        self.assertNotEqual(renamed['ETag'], response['ETag'])
+
+    def test_type_change_drops_the_old_profile(self):
+        self.run_import(roster_row('S1', batch='A1', courses=['CS101']), roster_row('T1', user_type='T'))
+        teacher = User.objects.get(enrollment_number='T1')
+        timetable = TimeTable.objects.create(
+            course=self.courses[0], teacher_id=teacher.pk, day=1, start_time='09:00', end_time='10:00')
+
+        self.run_import(roster_row('S1', user_type='T'), roster_row('T1', user_type='S', courses=['MA102']))
+        former_student = User.objects.get(enrollment_number='S1')
+        self.assertFalse(Student.objects.filter(pk=former_student.pk).exists())
+        self.assertTrue(Teacher.objects.filter(pk=former_student.pk).exists())
+        self.assertFalse(Course.student.through.objects.filter(student_id=former_student.pk).exists())
+
+        self.assertFalse(Teacher.objects.filter(pk=teacher.pk).exists())
+        self.assertEqual(list(Student.objects.get(pk=teacher.pk).course_set.all()), [self.courses[1]])
+        timetable.refresh_from_db()
+        self.assertIsNone(timetable.teacher_id)
+
+    @override_settings(ROSTER_ADMIN_MAX_ROWS=2)
+    def test_admin_import(self):
+        self.client.force_login(User.objects.create_superuser('ADMIN', 'Admin', 'secret'))
+
+        def upload(*numbers):
+            lines = ['enrollment_number,first_name,last_name,user_type,batch,courses,password']
+            lines += [f'{number},First,,S,A1,CS101,' for number in numbers]
+            return self.client.post('/admin/users/user/import/', {
+                'file': SimpleUploadedFile('roster.csv', '\n'.join(lines).encode()),
+            }, follow=True)
+
+        response = upload('S1', 'S2', 'S3')
+        self.assertContains(response, 'more than 2 rows')
+        self.assertFalse(Student.objects.exists())
+
+        response = upload('S1', 'S2')
+        self.assertRedirects(response, '/admin/users/user/')
+        self.assertEqual(Student.objects.count(), 2)
+
+        response = self.client.post('/admin/users/user/import/', {
+            'file': SimpleUploadedFile('roster.csv', b'enrollment_number,first_name\n\xff\xfe,First\n'),
+        })
+        self.assertContains(response, 'could not be read as UTF-8 CSV')
+
+    def test_admin_import_permissions(self):
+        User.objects.create_superuser('ADMIN', 'Admin', 'secret')
+        self.run_import(roster_row('S1'))
+        staff = User.objects.create_user('STAFF', 'Staff', 'secret', is_staff=True)
+        staff.user_permissions.add(*Permission.objects.filter(codename__in=['add_user', 'view_user']))
+        self.client.force_login(staff)
+
+        def upload(*numbers):
+            lines = ['enrollment_number,first_name,last_name,user_type,batch,courses,password']
+            lines += [f'{number},Renamed,,S,,,reset' for number in numbers]
+            return self.client.post('/admin/users/user/import/', {
+                'file': SimpleUploadedFile('roster.csv', '\n'.join(lines).encode()),
+                'update_passwords': 'on',
+            }, follow=True)
+
+        def errors(response):
+            return [str(m) for m in response.context['messages'] if m.level_tag == 'error']
+
+        # Adding only: existing users, staff or not, are left alone.
+        self.assertEqual(errors(upload('S1', 'ADMIN', 'S2')), [
+            'row 1: S1 already exists and may not be changed',
+            'row 2: ADMIN already exists and may not be changed',
+        ])
+        self.assertEqual(User.objects.get(enrollment_number='S1').first_name, 'First')
+        self.assertTrue(User.objects.get(enrollment_number='ADMIN').check_password('secret'))
+        self.assertTrue(User.objects.filter(enrollment_number='S2').exists())
+
+        # Changing: students, but still not staff unless a superuser imports.
+        staff.user_permissions.add(Permission.objects.get(codename='change_user'))
+        self.assertEqual(errors(upload('S1', 'ADMIN')), [
+            'row 2: ADMIN is a staff account and may only be changed by a superuser',
+        ])
+        self.assertEqual(User.objects.get(enrollment_number='S1').first_name, 'Renamed')
+        admin = User.objects.get(enrollment_number='ADMIN')
+        self.assertEqual(admin.first_name, 'Admin')
+        self.assertTrue(admin.check_password('secret'))
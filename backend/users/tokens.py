@@ -0,0 +1,153 @@
+"""
+Refresh tokens with a cached blacklist check.
+
+Every refresh rotates the token and blacklists the old one, so
+``BlacklistedToken`` grows with every session and simplejwt checks it with a
+database query on each refresh. ``RefreshToken`` answers that check from, in
+order, a per-process LRU of tokens known to be blacklisted, the cache, and
+only then the database. Blacklisting is permanent, so a token cached as
+blacklisted stays so until it expires, in any cache. A token cached as still
+outstanding can be blacklisted by another worker at any moment, so that state
+is only cached when ``SHARED_CACHE`` says every worker would see the change;
+with a per-process cache such tokens are checked in the database every time.
+An in-process bloom filter was not used because it would miss tokens
+blacklisted by other workers.
+
+Rotated tokens are recorded as outstanding when issued, so blacklisting one
+later is a lookup by the indexed ``jti`` plus one insert, and ``blacklist_users``
+can blacklist every live refresh token of a user whose credentials changed.
+Expired rows are removed by ``manage.py compact_tokens``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+BLACKLISTED = 'blacklisted'
+OUTSTANDING = 'outstanding'
+
+
+def _cache_key(jti):
+    return f'auth:refresh:{jti}'
+
+
+class LRUSet:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self._items:
+                return False
+            self._items.move_to_end(key)
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._items[key] = None
+            self._items.move_to_end(key)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+blacklisted = LRUSet(settings.TOKEN_BLACKLIST_LRU_SIZE)
+
+
+def remember(jti, exp, state):
+    """
+    Cache ``jti``'s blacklist state until the token expires. Outstanding is
+    only cached in a shared cache, and never over a blacklisted entry.
+    """
+    timeout = int(exp - time.time()) + 1
+    if state == BLACKLISTED:
+        blacklisted.add(jti)
+        if timeout > 0:
+            cache.set(_cache_key(jti), state, timeout)
+    elif settings.SHARED_CACHE and timeout > 0:
+        cache.add(_cache_key(jti), state, timeout)
+
+
+def is_blacklisted(jti, exp):
+    if jti in blacklisted:
+        return True
+    state = cache.get(_cache_key(jti))
+    if state is None:
+        # Unknown to the cache: evicted, or issued before it was in use.
+        exists = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        state = BLACKLISTED if exists else OUTSTANDING
+        remember(jti, exp, state)
+    return state == BLACKLISTED
+
+
+def blacklist_users(user_ids):
+    """
+    Blacklist every unexpired refresh token of ``user_ids``. Unlike the
+    revocation marker of ``users.authentication.revoke_tokens``, this is
+    recorded in the database, so every worker rejects the tokens whatever
+    its cache holds.
+    """
+    rows = list(OutstandingToken.objects.filter(
+        user_id__in=list(user_ids), expires_at__gt=aware_utcnow()).values_list('pk', 'jti', 'expires_at'))
+    if not rows:
+        return
+    BlacklistedToken.objects.bulk_create(
+        [BlacklistedToken(token_id=pk) for pk, jti, expires_at in rows], ignore_conflicts=True)
+
+    def apply():
+        for pk, jti, expires_at in rows:
+            remember(jti, expires_at.timestamp(), BLACKLISTED)
+    transaction.on_commit(apply)
+
+
+class RefreshToken(tokens.RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.remember(OUTSTANDING)
+        return token
+
+    def remember(self, state):
+        remember(self.payload[api_settings.JTI_CLAIM], self.payload['exp'], state)
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        # Same as simplejwt's, minus a SELECT and savepoint on the blacklist
+        # insert; the row is normally already outstanding (see rotate()).
+        token, _ = OutstandingToken.objects.get_or_create(
+            jti=self.payload[api_settings.JTI_CLAIM],
+            defaults={'token': str(self), 'expires_at': datetime_from_epoch(self.payload['exp'])},
+        )
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token)], ignore_conflicts=True)
+        self.remember(BLACKLISTED)
+
+    def rotate(self):
+        """Turn this token into its successor and record it as outstanding."""
+        self.set_jti()
+        self.set_exp()
+        self.set_iat()
+        OutstandingToken.objects.create(
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            jti=self.payload[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        )
+        self.remember(OUTSTANDING)
@@ -1,11 +1,9 @@
 from django.urls import path
 
-from rest_framework_simplejwt.views import TokenRefreshView
-
-from .views import MyTokenObtainPairView, userDetail
+from .views import MyTokenObtainPairView, MyTokenRefreshView, userDetail
 
 urlpatterns = [
     path('token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', MyTokenRefreshView.as_view(), name='token_refresh'),
     path('<enrollment_number>', userDetail),
 ]
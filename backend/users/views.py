@@ -1,16 +1,34 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.views import TokenObtainPairView
+import logging
+
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.signals import user_login_failed
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
+from lms import tracing
+
+from . import hashers
+from .authentication import is_revoked
+from .tokens import RefreshToken
+
 from .models import User, Student
-from .serializers import UserSerializer, StudentSerializer
+from .projections import StudentProjection
+from .serializers import UserSerializer
+
+logger = logging.getLogger(__name__)
 
 # users/views.py
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'enrollment_number'
+    token_class = RefreshToken
 
     @classmethod
     def get_token(cls, user):
@@ -23,52 +41,53 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
             token['batch'] = user.student.batch.name if user.student.batch else None
         return token
 
-class MyTokenObtainPairView(TokenObtainPairView):
-    serializer_class = MyTokenObtainPairSerializer
+    def validate(self, attrs):
+        user = self.context.get('user')
+        if user is None:
+            return super().validate(attrs)
 
-    def post(self, request, *args, **kwargs):
-        print("Login attempt with:", request.data)  # Debug print
-        try:
-            response = super().post(request, *args, **kwargs)
-            print("Login successful")  # Debug print
-            return response
-        except Exception as e:
-            print("Login failed:", str(e))  # Debug print
-            return Response(
-                {"detail": str(e)},
-                status=status.HTTP_400_BAD_REQUEST
+        # The view already loaded the user with its profile; check the
+        # password against that instance rather than have authenticate()
+        # fetch it again.
+        if not (user.is_active and hashers.check_password(user, attrs['password'])):
+            user_login_failed.send(
+                sender=__name__,
+                credentials={self.username_field: attrs[self.username_field]},
+                request=self.context.get('request'),
             )
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
 
-class MyTokenObtainPairView(TokenObtainPairView):
-    serializer_class = MyTokenObtainPairSerializer
+        self.user = user
+        refresh = self.get_token(user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
 
-    def post(self, request, *args, **kwargs):
-        try:
-            # Add these print statements
-            print("Request Data:", request.data)
-            print("Enrollment Number:", request.data.get('enrollment_number'))
-            print("Password:", request.data.get('password'))
-            
-            response = super().post(request, *args, **kwargs)
-            return response
-        except Exception as e:
-            print("Error details:", str(e))  # Add this to see the actual error
-            return Response(
-                {"detail": str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+
+def login_user(enrollment_number):
+    """Load a user with everything token issuance needs in a single query."""
+    try:
+        return User.objects.select_related('student__batch', 'teacher').get(
+            enrollment_number=enrollment_number)
+    except User.DoesNotExist:
+        return None
+
+
+class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'user': getattr(self, 'login_user', None)}
 
     def post(self, request, *args, **kwargs):
         try:
             # Get the enrollment number from request
             enrollment_number = request.data.get('enrollment_number')
-            
+            tracing.annotate(enrollment_number=enrollment_number)
+
             # Check if user exists
-            try:
-                user = User.objects.get(enrollment_number=enrollment_number)
-            except User.DoesNotExist:
+            self.login_user = user = login_user(enrollment_number)
+            if user is None:
                 return Response(
                     {"detail": "No account found with this enrollment number."},
                     status=status.HTTP_401_UNAUTHORIZED
@@ -85,12 +104,44 @@ class MyTokenObtainPairView(TokenObtainPairView):
             response = super().post(request, *args, **kwargs)
             return response
 
+        except hashers.HashingBusy:
+            logger.warning("Password hashing pool saturated, rejecting login")
+            return Response(
+                {"detail": "Too many logins in progress. Please try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
         except Exception as e:
+            logger.info("Login failed for %s: %s", request.data.get('enrollment_number'), e)
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        # Refresh tokens outlive a password change or deactivation; don't
+        # let them mint new access tokens afterwards.
+        if is_revoked(refresh[jwt_settings.USER_ID_CLAIM], refresh.get('iat')):
+            raise TokenError('Token has been revoked')
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            with transaction.atomic():
+                if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                    refresh.blacklist()
+                refresh.rotate()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class MyTokenRefreshView(TokenRefreshView):
+    serializer_class = MyTokenRefreshSerializer
+
+
 @api_view(['GET'])
 def userDetail(request, enrollment_number):
     try:
@@ -103,8 +154,8 @@ def userDetail(request, enrollment_number):
 
         if user.user_type == 'S':
             try:
-                student = Student.objects.get(user=user)
-                serializer = StudentSerializer(student)
+                student = StudentProjection.project(Student.objects).get(user=user)
+                serializer = StudentProjection(student)
                 return Response(serializer.data)
             except Student.DoesNotExist:
                 return Response(
@@ -22,7 +22,7 @@ const CourseList = () => {
     const fetchCourses = async () => {
       try {
         setIsLoading(true);
-        const res = await axios.get("/api/courses", {
+        const res = await axios.get("/api/courses/mine/", {
           headers: {
             'Content-Type': 'application/json',
             'Authorization': 'Bearer ' + String(authTokens.access)
@@ -69,7 +69,7 @@ const StyledMenu = styled(Menu)(({ theme }) => ({
 }));
 
 const Navbar = () => {
-  const { user, logoutUser } = useContext(AuthContext);
+  const { user, authTokens, logoutUser } = useContext(AuthContext);
   const [notifications, setNotifications] = useState([]);
   const [unreadNotifications, setUnreadNotifications] = useState(0);
   const [anchorEl, setAnchorEl] = useState(null);
@@ -83,22 +83,28 @@ const Navbar = () => {
     const fetchNotifications = async () => {
       try {
         const res = await axios.get("/api/notifications");
-        setNotifications(res.data);
-        const unreadCount = res.data.filter(notif => !notif.is_seen).length;
+        setNotifications(res.data.results);
+        const unreadCount = res.data.unread_count;
         setUnreadNotifications(unreadCount);
       } catch (err) {
         setError("Failed to fetch notifications");
         console.error("Failed to fetch notifications:", err);
       }
     };
-    
-    if (user) {
+
+    if (user && authTokens?.access) {
       fetchNotifications();
-      // Set up polling for new notifications
-      const interval = setInterval(fetchNotifications, 30000); // Poll every 30 seconds
-      return () => clearInterval(interval);
+      // New notifications are pushed by the server instead of polled
+      const events = new EventSource(`/api/events/?token=${authTokens.access}`);
+      events.addEventListener("notification", (e) => {
+        const notification = JSON.parse(e.data);
+        setNotifications((prev) => [notification, ...prev]);
+        setUnreadNotifications((count) => count + 1);
+      });
+      events.addEventListener("resync", fetchNotifications);
+      return () => events.close();
     }
-  }, [user]);
+  }, [user, authTokens]);
 
   const handleProfileClick = (event) => {
     setAnchorEl(event.currentTarget);
@@ -117,7 +123,7 @@ const Navbar = () => {
     try {
       await axios.post("/api/notifications/mark-all-read");
       setNotifications(prevNotifications =>
-        prevNotifications.map(notif => ({ ...notif, is_seen: true }))
+        prevNotifications.map(notif => ({ ...notif, isSeen: true }))
       );
       setUnreadNotifications(0);
     } catch (err) {
@@ -145,7 +151,7 @@ const Navbar = () => {
         py: 1.5,
         px: 2,
         borderBottom: `1px solid ${theme.palette.divider}`,
-        bgcolor: !notif.is_seen ? alpha(theme.palette.primary.main, 0.08) : 'transparent',
+        bgcolor: !notif.isSeen ? alpha(theme.palette.primary.main, 0.08) : 'transparent',
         '&:hover': {
           bgcolor: alpha(theme.palette.primary.main, 0.04),
         },
@@ -161,7 +167,7 @@ const Navbar = () => {
           <Typography 
             variant="subtitle2" 
             sx={{ 
-              fontWeight: !notif.is_seen ? 600 : 400,
+              fontWeight: !notif.isSeen ? 600 : 400,
             }}
           >
             {notif.title || 'New Notification'}
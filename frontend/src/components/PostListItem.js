@@ -1,4 +1,5 @@
-import React from 'react';
+import React, { useState } from 'react';
+import axios from 'axios';
 import { Link } from 'react-router-dom';
 import { formatDistanceToNow } from 'date-fns';
 import {
@@ -12,7 +13,21 @@ import {
 import { ThumbsUp, MessageCircle } from 'lucide-react';
 
 const PostListItem = ({ post }) => {
-  const { id, title, text, date_posted, user, likes } = post;
+  const { id, title, text, date_posted, user } = post;
+  const [likes, setLikes] = useState(post.likes);
+  const [liked, setLiked] = useState(Boolean(post.liked));
+
+  const toggleLike = async () => {
+    try {
+      const res = liked
+        ? await axios.delete(`/api/forum/${id}/like`)
+        : await axios.post(`/api/forum/${id}/like`);
+      setLiked(res.data.liked);
+      setLikes(res.data.likes);
+    } catch (error) {
+      console.error('Error updating like:', error);
+    }
+  };
 
   const formatDate = (date) => {
     try {
@@ -116,10 +131,10 @@ const PostListItem = ({ post }) => {
             onClick={(e) => {
               e.preventDefault();
               e.stopPropagation();
-              // Handle like action
+              toggleLike();
             }}
             sx={{
-              color: 'text.secondary',
+              color: liked ? 'primary.main' : 'text.secondary',
               '&:hover': {
                 color: 'primary.main',
               },
@@ -144,6 +159,9 @@ const PostListItem = ({ post }) => {
           >
             <MessageCircle size={20} />
           </IconButton>
+          <Typography variant="body2" color="text.secondary">
+            {post.comment_count}
+          </Typography>
         </Box>
       </Box>
     </Card>
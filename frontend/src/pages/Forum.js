@@ -19,6 +19,8 @@ import PostListItem from "../components/PostListItem";
 
 const Forum = () => {
   const [posts, setPosts] = useState([]);
+  const [nextPosts, setNextPosts] = useState(null);
+  const [isLoadingPosts, setIsLoadingPosts] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
   const navigate = useNavigate();
@@ -27,7 +29,8 @@ const Forum = () => {
     try {
       setIsLoading(true);
       const res = await axios.get("/api/forum");
-      setPosts(res.data);
+      setPosts(res.data.results);
+      setNextPosts(res.data.next);
     } catch (err) {
       setError("Failed to load forum posts");
       console.error("Error fetching posts:", err);
@@ -36,6 +39,24 @@ const Forum = () => {
     }
   };
 
+  const loadMorePosts = async () => {
+    try {
+      setIsLoadingPosts(true);
+      // Request the next page relative to our own origin (the API proxy).
+      const next = new URL(nextPosts);
+      const res = await axios.get(next.pathname + next.search);
+      setPosts((prevPosts) => {
+        const seen = new Set(prevPosts.map((p) => p.id));
+        return [...prevPosts, ...res.data.results.filter((p) => !seen.has(p.id))];
+      });
+      setNextPosts(res.data.next);
+    } catch (err) {
+      console.error("Error loading posts:", err);
+    } finally {
+      setIsLoadingPosts(false);
+    }
+  };
+
   useEffect(() => {
     getAllPosts();
   }, []);
@@ -176,6 +197,15 @@ const Forum = () => {
                   {posts.map((post) => (
                     <PostListItem key={post.id} post={post} />
                   ))}
+                  {nextPosts && (
+                    <Button
+                      onClick={loadMorePosts}
+                      disabled={isLoadingPosts}
+                      sx={{ alignSelf: "center" }}
+                    >
+                      Load more posts
+                    </Button>
+                  )}
                 </Box>
               </Fade>
             )}
@@ -27,9 +27,12 @@ import { capitalize } from "../utils/helpers";
 const Post = () => {
   const [post, setPost] = useState(null);
   const [comments, setComments] = useState([]);
+  const [nextComments, setNextComments] = useState(null);
+  const [isLoadingComments, setIsLoadingComments] = useState(false);
   const [comment, setComment] = useState("");
   const [isLoading, setIsLoading] = useState(true);
   const [menuAnchorEl, setMenuAnchorEl] = useState(null);
+  const [liked, setLiked] = useState(false);
 
   const { user } = useContext(AuthContext);
   const params = useParams();
@@ -42,6 +45,18 @@ const Post = () => {
     setMenuAnchorEl(null);
   };
 
+  const toggleLike = async () => {
+    try {
+      const res = liked
+        ? await axios.delete(`/api/forum/${params.id}/like`)
+        : await axios.post(`/api/forum/${params.id}/like`);
+      setLiked(res.data.liked);
+      setPost((prevPost) => ({ ...prevPost, likes: res.data.likes }));
+    } catch (err) {
+      console.error("Error updating like:", err);
+    }
+  };
+
   const addComment = async (e) => {
     e.preventDefault();
     try {
@@ -50,19 +65,40 @@ const Post = () => {
         user: user.user_id,
       });
       setComment("");
-      setComments((prevComments) => [res.data, ...prevComments]);
+      setComments((prevComments) => [...prevComments, res.data]);
     } catch (err) {
       console.error("Error adding comment:", err);
     }
   };
 
+  const loadMoreComments = async () => {
+    try {
+      setIsLoadingComments(true);
+      // Request the next page relative to our own origin (the API proxy).
+      const next = new URL(nextComments);
+      const res = await axios.get(next.pathname + next.search);
+      setComments((prevComments) => {
+        // A comment added here may also come back in a later page.
+        const seen = new Set(prevComments.map((c) => c.id));
+        return [...prevComments, ...res.data.results.filter((c) => !seen.has(c.id))];
+      });
+      setNextComments(res.data.next);
+    } catch (err) {
+      console.error("Error loading comments:", err);
+    } finally {
+      setIsLoadingComments(false);
+    }
+  };
+
   useEffect(() => {
     const fetchPostDetails = async () => {
       try {
         setIsLoading(true);
         const res = await axios.get(`/api/forum/${params.id}`);
         setPost(res.data);
-        setComments(res.data.comment_set);
+        setLiked(Boolean(res.data.liked));
+        setComments(res.data.comments.results);
+        setNextComments(res.data.comments.next);
       } catch (err) {
         console.error("Error fetching post:", err);
       } finally {
@@ -153,7 +189,11 @@ const Post = () => {
           </Typography>
 
           <Box sx={{ display: "flex", alignItems: "center", gap: 1 }}>
-            <IconButton size="small">
+            <IconButton
+              size="small"
+              onClick={toggleLike}
+              color={liked ? "primary" : "default"}
+            >
               <ThumbsUp size={20} />
             </IconButton>
             <Typography variant="body2" color="text.secondary">
@@ -198,6 +238,15 @@ const Post = () => {
                 <Comment key={comment.id} comment={comment} />
               ))}
             </Box>
+            {nextComments && (
+              <Button
+                onClick={loadMoreComments}
+                disabled={isLoadingComments}
+                sx={{ mt: 2 }}
+              >
+                Load more comments
+              </Button>
+            )}
           </Card>
         )}
       </Box>